@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import math
+import random
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from .question_bank import QuestionBank
+from .results import QuestionStats
+
+SCALING = 1.7
+THETA_MIN = -4.0
+THETA_MAX = 4.0
+SELECTION_STEP = 0.25
+QUADRATURE_POINTS = 81
+DEFAULT_TARGET_SE = 0.35
+DEFAULT_MIN_ITEMS = 5
+DEFAULT_MAX_ITEMS = 30
+DEFAULT_RANDOMESQUE = 3
+MIN_CALIBRATION_ATTEMPTS = 30
+DIFFICULTY_LIMIT = 3.5
+
+
+@dataclass(frozen=True)
+class ItemParameters:
+    discrimination: float
+    difficulty: float
+    guessing: float
+
+    def probability(self, theta: float) -> float:
+        logistic = 1.0 / (1.0 + math.exp(-SCALING * self.discrimination * (theta - self.difficulty)))
+        return self.guessing + (1.0 - self.guessing) * logistic
+
+    def information(self, theta: float) -> float:
+        p = self.probability(theta)
+        if p <= 0.0 or p >= 1.0:
+            return 0.0
+        scaled = (p - self.guessing) / (1.0 - self.guessing)
+        return (SCALING * self.discrimination) ** 2 * ((1.0 - p) / p) * scaled * scaled
+
+
+class AdaptivePool:
+    def __init__(self, question_ids: Sequence[str], parameters: Sequence[ItemParameters]) -> None:
+        self._question_ids = list(question_ids)
+        self._parameters = list(parameters)
+        self._positions: Dict[str, int] = {question_id: index for index, question_id in enumerate(self._question_ids)}
+        steps = int(round((THETA_MAX - THETA_MIN) / SELECTION_STEP))
+        self._grid = [THETA_MIN + step * SELECTION_STEP for step in range(steps + 1)]
+        # For every grid point, item indices ordered by information at that
+        # ability level; selection walks this list instead of scoring items.
+        self._tables: List[array] = []
+        for theta in self._grid:
+            information = [item.information(theta) for item in self._parameters]
+            order = sorted(range(len(information)), key=information.__getitem__, reverse=True)
+            self._tables.append(array("I", order))
+
+    @classmethod
+    def from_bank(cls, bank: QuestionBank, stats: Optional[Iterable[QuestionStats]] = None) -> "AdaptivePool":
+        observed = {item.question_id: item for item in stats or ()}
+        question_ids: List[str] = []
+        parameters: List[ItemParameters] = []
+        for question in bank:
+            guessing = 1.0 / len(question.options) if question.options else 0.0
+            difficulty = question.difficulty
+            item_stats = observed.get(question.id)
+            if item_stats is not None and item_stats.attempts >= MIN_CALIBRATION_ATTEMPTS:
+                difficulty = estimate_difficulty(item_stats.accuracy, question.discrimination, guessing)
+            question_ids.append(question.id)
+            parameters.append(ItemParameters(question.discrimination, difficulty, guessing))
+        return cls(question_ids, parameters)
+
+    def __len__(self) -> int:
+        return len(self._question_ids)
+
+    def parameters(self, question_id: str) -> ItemParameters:
+        return self._parameters[self._positions[question_id]]
+
+    def select(
+        self,
+        theta: float,
+        administered: Set[str],
+        rng: random.Random,
+        *,
+        randomesque: int = DEFAULT_RANDOMESQUE,
+    ) -> Optional[str]:
+        index = int(round((min(max(theta, THETA_MIN), THETA_MAX) - THETA_MIN) / SELECTION_STEP))
+        candidates: List[str] = []
+        for position in self._tables[index]:
+            question_id = self._question_ids[position]
+            if question_id in administered:
+                continue
+            candidates.append(question_id)
+            if len(candidates) >= randomesque:
+                break
+        if not candidates:
+            return None
+        # Picking among the few most informative items keeps the best items
+        # from being shown to every candidate.
+        return rng.choice(candidates)
+
+
+class AdaptiveSession:
+    def __init__(
+        self,
+        pool: AdaptivePool,
+        *,
+        target_se: float = DEFAULT_TARGET_SE,
+        min_items: int = DEFAULT_MIN_ITEMS,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self._pool = pool
+        self._target_se = target_se
+        self._min_items = min_items
+        self._max_items = max_items
+        self._rng = rng or random.Random()
+        step = (THETA_MAX - THETA_MIN) / (QUADRATURE_POINTS - 1)
+        self._nodes = [THETA_MIN + index * step for index in range(QUADRATURE_POINTS)]
+        self._posterior = [math.exp(-0.5 * node * node) for node in self._nodes]
+        self._administered: Set[str] = set()
+        self._theta = 0.0
+        self._standard_error = 1.0
+        self._update_estimate()
+
+    @property
+    def theta(self) -> float:
+        return self._theta
+
+    @property
+    def standard_error(self) -> float:
+        return self._standard_error
+
+    @property
+    def max_items(self) -> int:
+        return min(self._max_items, len(self._pool))
+
+    @property
+    def administered(self) -> int:
+        return len(self._administered)
+
+    @property
+    def finished(self) -> bool:
+        if len(self._administered) >= self.max_items:
+            return True
+        return len(self._administered) >= self._min_items and self._standard_error <= self._target_se
+
+    def next_question_id(self) -> Optional[str]:
+        if self.finished:
+            return None
+        return self._pool.select(self._theta, self._administered, self._rng)
+
+    def record(self, question_id: str, correct: bool) -> None:
+        self._administered.add(question_id)
+        item = self._pool.parameters(question_id)
+        for index, node in enumerate(self._nodes):
+            p = item.probability(node)
+            self._posterior[index] *= p if correct else 1.0 - p
+        self._update_estimate()
+
+    def _update_estimate(self) -> None:
+        total = sum(self._posterior)
+        if total <= 0.0:
+            return
+        # Renormalise so long tests do not underflow.
+        self._posterior = [weight / total for weight in self._posterior]
+        mean = sum(node * weight for node, weight in zip(self._nodes, self._posterior))
+        variance = sum((node - mean) ** 2 * weight for node, weight in zip(self._nodes, self._posterior))
+        self._theta = mean
+        self._standard_error = math.sqrt(variance)
+
+
+def estimate_difficulty(accuracy: float, discrimination: float, guessing: float) -> float:
+    adjusted = (accuracy - guessing) / (1.0 - guessing) if guessing < 1.0 else accuracy
+    adjusted = min(max(adjusted, 0.01), 0.99)
+    difficulty = -math.log(adjusted / (1.0 - adjusted)) / (SCALING * max(discrimination, 0.1))
+    return min(max(difficulty, -DIFFICULTY_LIMIT), DIFFICULTY_LIMIT)
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import csv
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, List, Sequence, Tuple, Union
+
+from .exam import OPTION_NUMBERS
+from .results import ResultStore
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAX_OPTIONS = len(OPTION_NUMBERS)
+
+
+@dataclass
+class ResponseData:
+    session_ids: "np.ndarray"
+    question_ids: "np.ndarray"
+    question_categories: "np.ndarray"
+    correct_options: "np.ndarray"
+    rows: "np.ndarray"
+    columns: "np.ndarray"
+    selected: "np.ndarray"
+    correct: "np.ndarray"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.session_ids), len(self.question_ids)
+
+    def matrix(self) -> "np.ndarray":
+        np = _require_numpy()
+        scores = np.full(self.shape, np.nan)
+        scores[self.rows, self.columns] = self.correct
+        return scores
+
+
+@dataclass
+class ItemStatistics:
+    question_id: str
+    category: str
+    attempts: int
+    difficulty: float
+    discrimination: float
+    correct_option: int
+    option_rates: Tuple[float, ...]
+    omitted_rate: float
+
+
+@dataclass
+class CategoryStatistics:
+    category: str
+    items: int
+    complete_candidates: int
+    alpha: float
+
+
+@dataclass
+class ItemAnalysis:
+    candidates: int
+    responses: int
+    items: List[ItemStatistics]
+    categories: List[CategoryStatistics]
+
+
+def load_responses(store: ResultStore) -> ResponseData:
+    return responses_from_chunks(store.iter_answer_rows())
+
+
+def responses_from_chunks(chunks: Iterable[Sequence[Sequence[Any]]]) -> ResponseData:
+    np = _require_numpy()
+    columns: List[List[Any]] = [[] for _ in range(7)]
+    for chunk in chunks:
+        if not chunk:
+            continue
+        for target, values in zip(columns, zip(*chunk)):
+            target.extend(values)
+    session_column, _, question_column, category_column, selected_column, key_column, correct_column = columns
+    selected = np.asarray(selected_column, dtype=np.float64)
+    selected[np.isnan(selected)] = -1
+    session_ids, row_index = np.unique(np.asarray(session_column, dtype=np.int64), return_inverse=True)
+    question_ids, first_seen, column_index = np.unique(
+        np.asarray(question_column, dtype=str),
+        return_index=True,
+        return_inverse=True,
+    )
+    return ResponseData(
+        session_ids=session_ids,
+        question_ids=question_ids,
+        question_categories=np.asarray(category_column, dtype=str)[first_seen],
+        correct_options=np.asarray(key_column, dtype=np.int64)[first_seen],
+        rows=row_index,
+        columns=column_index,
+        selected=selected.astype(np.int64),
+        correct=np.asarray(correct_column, dtype=np.float64),
+    )
+
+
+def analyze(data: ResponseData) -> ItemAnalysis:
+    np = _require_numpy()
+    candidates, questions = data.shape
+    rows, columns, correct = data.rows, data.columns, data.correct
+    if not len(rows):
+        return ItemAnalysis(candidates=0, responses=0, items=[], categories=[])
+
+    attempts = np.bincount(columns, minlength=questions).astype(np.float64)
+    right = np.bincount(columns, weights=correct, minlength=questions)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        difficulty = right / attempts
+
+    # Corrected item-total correlation: each answer is compared with the
+    # candidate's proportion correct on the *other* items they were given.
+    administered = np.bincount(rows, minlength=candidates).astype(np.float64)
+    totals = np.bincount(rows, weights=correct, minlength=candidates)
+    others = administered[rows] - 1
+    usable = others > 0
+    rest = np.zeros_like(correct)
+    rest[usable] = (totals[rows][usable] - correct[usable]) / others[usable]
+    discrimination = _masked_correlation(np, columns[usable], correct[usable], rest[usable], questions)
+
+    answered = data.selected >= 0
+    option_counts = np.bincount(
+        columns[answered] * MAX_OPTIONS + data.selected[answered],
+        minlength=questions * MAX_OPTIONS,
+    ).reshape(questions, MAX_OPTIONS)
+    omitted = attempts - option_counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        option_rates = option_counts / attempts[:, None]
+        omitted_rates = omitted / attempts
+
+    items = [
+        ItemStatistics(
+            question_id=str(data.question_ids[index]),
+            category=str(data.question_categories[index]),
+            attempts=int(attempts[index]),
+            difficulty=float(difficulty[index]),
+            discrimination=float(discrimination[index]),
+            correct_option=int(data.correct_options[index]),
+            option_rates=tuple(float(rate) for rate in option_rates[index]),
+            omitted_rate=float(omitted_rates[index]),
+        )
+        for index in range(questions)
+    ]
+    return ItemAnalysis(
+        candidates=candidates,
+        responses=len(rows),
+        items=items,
+        categories=_category_alphas(np, data),
+    )
+
+
+def write_item_csv(analysis: ItemAnalysis, path: Union[str, Path]) -> None:
+    with Path(path).open("w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "question_id",
+                "category",
+                "attempts",
+                "difficulty",
+                "discrimination",
+                "correct_option",
+                *(f"option_{label}" for label in OPTION_NUMBERS),
+                "omitted",
+            ]
+        )
+        for item in analysis.items:
+            writer.writerow(
+                [
+                    item.question_id,
+                    item.category,
+                    item.attempts,
+                    _format_number(item.difficulty),
+                    _format_number(item.discrimination),
+                    item.correct_option + 1,
+                    *(_format_number(rate) for rate in item.option_rates),
+                    _format_number(item.omitted_rate),
+                ]
+            )
+
+
+def write_category_csv(analysis: ItemAnalysis, path: Union[str, Path]) -> None:
+    with Path(path).open("w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["category", "items", "complete_candidates", "cronbach_alpha"])
+        for category in analysis.categories:
+            writer.writerow(
+                [category.category, category.items, category.complete_candidates, _format_number(category.alpha)]
+            )
+
+
+def _masked_correlation(np: Any, columns: "np.ndarray", x: "np.ndarray", y: "np.ndarray", size: int) -> "np.ndarray":
+    n = np.bincount(columns, minlength=size).astype(np.float64)
+    sx = np.bincount(columns, weights=x, minlength=size)
+    sy = np.bincount(columns, weights=y, minlength=size)
+    sxx = np.bincount(columns, weights=x * x, minlength=size)
+    syy = np.bincount(columns, weights=y * y, minlength=size)
+    sxy = np.bincount(columns, weights=x * y, minlength=size)
+    covariance = n * sxy - sx * sy
+    spread = (n * sxx - sx * sx) * (n * syy - sy * sy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.sqrt(spread)
+    correlation[~(spread > 0)] = np.nan
+    return correlation
+
+
+def _category_alphas(np: Any, data: ResponseData) -> List[CategoryStatistics]:
+    candidates, questions = data.shape
+    categories, question_category = np.unique(data.question_categories, return_inverse=True)
+    items_per_category = np.bincount(question_category, minlength=len(categories))
+    answer_category = question_category[data.columns]
+    # Only candidates who were given every item of a category contribute to
+    # its alpha; practice sessions with a random subset are left out.
+    pair = data.rows * len(categories) + answer_category
+    seen = np.bincount(pair, minlength=candidates * len(categories))
+    complete = seen == items_per_category[np.arange(seen.size) % len(categories)]
+    statistics: List[CategoryStatistics] = []
+    for code, name in enumerate(categories):
+        item_count = int(items_per_category[code])
+        mask = (answer_category == code) & complete[pair]
+        takers = np.unique(data.rows[mask])
+        alpha = math.nan
+        if item_count > 1 and takers.size > 1:
+            item_columns = data.columns[mask]
+            scores = data.correct[mask]
+            n = np.bincount(item_columns, minlength=questions).astype(np.float64)
+            sums = np.bincount(item_columns, weights=scores, minlength=questions)
+            squares = np.bincount(item_columns, weights=scores * scores, minlength=questions)
+            in_category = n > 0
+            item_variance = (squares[in_category] - sums[in_category] ** 2 / n[in_category]) / (n[in_category] - 1)
+            totals = np.bincount(data.rows[mask], weights=scores, minlength=candidates)[takers]
+            total_variance = totals.var(ddof=1)
+            if total_variance > 0:
+                alpha = item_count / (item_count - 1) * (1 - item_variance.sum() / total_variance)
+        statistics.append(
+            CategoryStatistics(
+                category=str(name),
+                items=item_count,
+                complete_candidates=int(takers.size),
+                alpha=float(alpha),
+            )
+        )
+    return statistics
+
+
+def _format_number(value: float) -> str:
+    if math.isnan(value):
+        return ""
+    return f"{value:.4f}"
+
+
+def _require_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise RuntimeError("题目统计分析需要安装 numpy 库：pip install numpy") from None
+    return numpy
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "audio_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILE_NAME = "index.json"
+AUDIO_SUFFIX = ".wav"
+
+AudioPlayer = Callable[[Path], None]
+
+
+class AudioCache:
+    def __init__(
+        self,
+        directory: Union[str, Path] = DEFAULT_CACHE_DIR,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self._directory = Path(directory)
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    @staticmethod
+    def make_key(text: str, voice: Optional[str], rate: float, volume: float) -> str:
+        payload = json.dumps([text, voice or "", rate, volume], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self._directory / f"{key}{AUDIO_SUFFIX}"
+
+    def staging_path(self, key: str) -> Path:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        return self._directory / f"{key}.partial{AUDIO_SUFFIX}"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            path = self.path_for(key)
+            if not path.exists():
+                self._total_bytes -= self._entries.pop(key)
+                self._dirty = True
+                return None
+            self._entries.move_to_end(key)
+            self._dirty = True
+            return path
+
+    def commit(self, key: str) -> Optional[Path]:
+        staged = self.staging_path(key)
+        try:
+            size = staged.stat().st_size
+        except OSError:
+            return None
+        if size == 0 or size > self._max_bytes:
+            staged.unlink(missing_ok=True)
+            return None
+        path = self.path_for(key)
+        os.replace(staged, path)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._dirty = True
+            self._evict()
+        return path
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self._entries.items())
+            self._dirty = False
+        self._directory.mkdir(parents=True, exist_ok=True)
+        index_path = self._directory / INDEX_FILE_NAME
+        temporary = index_path.with_suffix(".tmp")
+        try:
+            temporary.write_text(json.dumps(entries), encoding="utf-8")
+            os.replace(temporary, index_path)
+        except OSError:
+            with self._lock:
+                self._dirty = True
+
+    def _evict(self) -> None:
+        while self._total_bytes > self._max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.path_for(key).unlink(missing_ok=True)
+
+    def _load_index(self) -> None:
+        index_path = self._directory / INDEX_FILE_NAME
+        try:
+            entries = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for item in entries:
+            try:
+                key, size = str(item[0]), int(item[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+
+def find_audio_player() -> Optional[AudioPlayer]:
+    if sys.platform.startswith("win"):
+        try:
+            import winsound
+
+            return lambda path: winsound.PlaySound(str(path), winsound.SND_FILENAME)
+        except ImportError:
+            pass
+    try:
+        import simpleaudio  # type: ignore
+
+        return lambda path: simpleaudio.WaveObject.from_wave_file(str(path)).play().wait_done()
+    except ImportError:
+        pass
+    for command in ("afplay", "paplay", "aplay"):
+        executable = shutil.which(command)
+        if executable:
+            return _command_player(executable)
+    return None
+
+
+def _command_player(executable: str) -> AudioPlayer:
+    def play(path: Path) -> None:
+        subprocess.run(
+            [executable, str(path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+
+    return play
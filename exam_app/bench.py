@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .console import ScriptedIO
+from .exam import OPTION_NUMBERS, ExamEngine, ExamSummary
+from .journal import JournalStore
+from .question_bank import QuestionBank, load_bank
+from .questions import QUESTION_BANK
+from .results import ResultStore
+from .tts import FakeTextToSpeech, TextToSpeech, build_tts
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_REPEAT = 3
+ANSWER_PROMPT = "您的选择："
+BENCH_CANDIDATE = "基准测试"
+DEFAULT_STARTUP_REPEAT = 5
+STARTUP_SHUTDOWN_TIMEOUT = 2.0
+# Runs in a fresh interpreter so module import cost is measured cold.
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import exam_app.main
+imported = time.perf_counter()
+from exam_app.bench import probe_startup
+init_delay = None if sys.argv[1] == "real" else float(sys.argv[1])
+print(json.dumps(probe_startup(started, imported, init_delay)))
+"""
+
+
+@dataclass
+class BenchmarkResult:
+    bank_size: int
+    speech_delay: float
+    questions: int
+    turnaround_p50_ms: float
+    turnaround_p95_ms: float
+    turnaround_p99_ms: float
+    turnaround_max_ms: float
+    summary_ms: float
+    save_ms: float
+    spoken: int
+
+
+@dataclass
+class StartupResult:
+    engine: str
+    import_ms: float
+    speaker_ms: float
+    first_output_ms: float
+    engine_ready_ms: float
+
+
+class TimedIO(ScriptedIO):
+    def __init__(self, inputs: Iterator[str]) -> None:
+        super().__init__(inputs)
+        self.reads: List[Tuple[str, float]] = []
+
+    def read(self, prompt: str) -> str:
+        self.reads.append((prompt, time.perf_counter()))
+        return super().read(prompt)
+
+
+class FirstOutputIO(ScriptedIO):
+    def __init__(self) -> None:
+        super().__init__(())
+        self.first_output: Optional[float] = None
+
+    def write(self, text: str) -> None:
+        if self.first_output is None:
+            self.first_output = time.perf_counter()
+
+
+class TimedExamEngine(ExamEngine):
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)
+        self.summary_seconds: List[float] = []
+        self.save_seconds: List[float] = []
+
+    def _present_summary(self, summary: ExamSummary) -> None:
+        started = time.perf_counter()
+        super()._present_summary(summary)
+        self.summary_seconds.append(time.perf_counter() - started)
+
+    def _save_summary(self, summary: ExamSummary) -> bool:
+        started = time.perf_counter()
+        saved = super()._save_summary(summary)
+        self.save_seconds.append(time.perf_counter() - started)
+        return saved
+
+
+def synthetic_bank(size: int, *, seed: int = 0) -> QuestionBank:
+    rng = random.Random(seed)
+    questions = []
+    for index in range(size):
+        template = QUESTION_BANK[index % len(QUESTION_BANK)]
+        questions.append(
+            replace(
+                template,
+                id=f"bench-{index}",
+                prompt=f"{template.prompt}（{index + 1}）",
+                difficulty=round(rng.gauss(0.0, 1.0), 3),
+            )
+        )
+    return QuestionBank.from_questions(questions, source="synthetic")
+
+
+def full_exam_script(bank: QuestionBank, *, seed: int = 0) -> Iterator[str]:
+    rng = random.Random(seed)
+    choices = OPTION_NUMBERS[: min(len(question.options) for question in bank)]
+    yield BENCH_CANDIDATE
+    yield "1"
+    for _ in range(len(bank)):
+        yield rng.choice(choices)
+    yield "Q"
+
+
+def run_benchmark(
+    bank: QuestionBank,
+    *,
+    speech_delay: float = 0.0,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = 0,
+) -> BenchmarkResult:
+    turnaround: List[float] = []
+    summary_seconds: List[float] = []
+    save_seconds: List[float] = []
+    spoken = 0
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultStore(Path(directory) / "bench.sqlite3")
+        journals = JournalStore(Path(directory) / "journals")
+        try:
+            for run in range(max(1, repeat)):
+                speaker = FakeTextToSpeech(speech_delay)
+                io = TimedIO(full_exam_script(bank, seed=seed + run))
+                engine = TimedExamEngine(bank, speaker, io, store, journals=journals)
+                try:
+                    engine.run()
+                finally:
+                    speaker.close()
+                turnaround.extend(_answer_intervals(io.reads))
+                summary_seconds.extend(engine.summary_seconds)
+                save_seconds.extend(engine.save_seconds)
+                spoken += len(speaker.spoken)
+        finally:
+            store.close()
+    return BenchmarkResult(
+        bank_size=len(bank),
+        speech_delay=speech_delay,
+        questions=len(bank) * max(1, repeat),
+        turnaround_p50_ms=percentile(turnaround, 0.50) * 1000,
+        turnaround_p95_ms=percentile(turnaround, 0.95) * 1000,
+        turnaround_p99_ms=percentile(turnaround, 0.99) * 1000,
+        turnaround_max_ms=max(turnaround, default=0.0) * 1000,
+        summary_ms=percentile(summary_seconds, 0.50) * 1000,
+        save_ms=percentile(save_seconds, 0.50) * 1000,
+        spoken=spoken,
+    )
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    *,
+    speech_delay: float = 0.0,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = 0,
+) -> List[BenchmarkResult]:
+    return [
+        run_benchmark(synthetic_bank(size, seed=seed), speech_delay=speech_delay, repeat=repeat, seed=seed)
+        for size in sizes
+    ]
+
+
+def probe_startup(started: float, imported: float, init_delay: Optional[float]) -> Dict[str, float]:
+    speaker: TextToSpeech = build_tts() if init_delay is None else FakeTextToSpeech(init_delay=init_delay)
+    constructed = time.perf_counter()
+    io = FirstOutputIO()
+    try:
+        # The empty script ends the run at the name prompt, right after the
+        # banner has been written.
+        ExamEngine(load_bank(), speaker, io).run()
+    except EOFError:
+        pass
+    speaker.wait_ready()
+    ready = time.perf_counter()
+    speaker.close(timeout=STARTUP_SHUTDOWN_TIMEOUT)
+    first_output = io.first_output if io.first_output is not None else ready
+    return {
+        "import_ms": (imported - started) * 1000,
+        "speaker_ms": (constructed - imported) * 1000,
+        "first_output_ms": (first_output - started) * 1000,
+        "engine_ready_ms": (ready - started) * 1000,
+    }
+
+
+def run_startup_benchmark(
+    *,
+    init_delay: Optional[float] = None,
+    repeat: int = DEFAULT_STARTUP_REPEAT,
+) -> StartupResult:
+    samples: Dict[str, List[float]] = {}
+    argument = "real" if init_delay is None else repr(init_delay)
+    for _ in range(max(1, repeat)):
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE, argument],
+            cwd=str(Path(__file__).resolve().parent.parent),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for key, value in json.loads(completed.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(key, []).append(value)
+    return StartupResult(
+        engine="pyttsx3" if init_delay is None else f"fake ({init_delay:g}s init)",
+        **{key: percentile(values, 0.50) for key, values in samples.items()},
+    )
+
+
+def format_startup_report(result: StartupResult) -> str:
+    return "\n".join(
+        [
+            f"engine          {result.engine}",
+            f"import          {result.import_ms:9.1f} ms",
+            f"speaker         {result.speaker_ms:9.1f} ms",
+            f"first output    {result.first_output_ms:9.1f} ms",
+            f"engine ready    {result.engine_ready_ms:9.1f} ms",
+        ]
+    )
+
+
+def format_report(results: Sequence[BenchmarkResult]) -> str:
+    lines = [
+        f"{'bank':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'summary ms':>11} {'save ms':>9}",
+    ]
+    for result in results:
+        lines.append(
+            f"{result.bank_size:>8} {result.turnaround_p50_ms:>9.3f} {result.turnaround_p95_ms:>9.3f}"
+            f" {result.turnaround_p99_ms:>9.3f} {result.turnaround_max_ms:>9.3f}"
+            f" {result.summary_ms:>11.3f} {result.save_ms:>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+def _answer_intervals(reads: Sequence[Tuple[str, float]]) -> List[float]:
+    # Input is instantaneous, so the gap between two answer prompts is the
+    # time the engine spent grading one question and presenting the next.
+    intervals: List[float] = []
+    previous: Optional[float] = None
+    for prompt, timestamp in reads:
+        if prompt != ANSWER_PROMPT:
+            previous = None
+            continue
+        if previous is not None:
+            intervals.append(timestamp - previous)
+        previous = timestamp
+    return intervals
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Tuple, Union
+
+from .questions import Category, Question
+
+COLUMNAR_SUFFIX = ".qcol"
+COLUMNAR_MAGIC = b"QCOL"
+COLUMNAR_VERSION = 1
+# magic, version, questions, strings, options, tags, blob bytes
+_HEADER = struct.Struct("<4sIQQQQQ")
+_ALIGNMENT = 8
+_CATEGORIES = tuple(Category)
+_CATEGORY_CODES = {category: code for code, category in enumerate(_CATEGORIES)}
+
+
+class ColumnarError(ValueError):
+    pass
+
+
+class ColumnarQuestion:
+    """Read-only view of one row with the attributes of a Question. Text is
+    decoded from the shared mapping on access, so a view costs a few bytes
+    of private memory however long the question is."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "ColumnarTable", row: int) -> None:
+        self._table = table
+        self._row = row
+
+    @property
+    def id(self) -> str:
+        return self._table.question_id(self._row)
+
+    @property
+    def category(self) -> Category:
+        return _CATEGORIES[self._table.categories[self._row]]
+
+    @property
+    def prompt(self) -> str:
+        return self._table.string(self._table.prompts[self._row])
+
+    @property
+    def options(self) -> List[str]:
+        return self._table.options(self._row)
+
+    @property
+    def correct_option(self) -> int:
+        return self._table.correct_options[self._row]
+
+    @property
+    def explanation(self) -> str:
+        return self._table.string(self._table.explanations[self._row])
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return self._table.tags(self._row)
+
+    @property
+    def difficulty(self) -> float:
+        return self._table.difficulties[self._row]
+
+    @property
+    def discrimination(self) -> float:
+        return self._table.discriminations[self._row]
+
+    def to_question(self) -> Question:
+        return Question(
+            id=self.id,
+            category=self.category,
+            prompt=self.prompt,
+            options=self.options,
+            correct_option=self.correct_option,
+            explanation=self.explanation,
+            tags=self.tags,
+            difficulty=self.difficulty,
+            discrimination=self.discrimination,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ColumnarQuestion):
+            other = other.to_question()
+        if not isinstance(other, Question):
+            return NotImplemented
+        return self.to_question() == other
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"ColumnarQuestion(id={self.id!r}, category={self.category!r}, prompt={self.prompt!r})"
+
+
+class ColumnarTable:
+    """A question bank file mapped into memory. Every process that opens the
+    same file shares its pages through the OS page cache.
+
+    Strings are interned into one UTF-8 blob addressed by an offsets array;
+    per-question columns hold string numbers, the category code, the correct
+    option and the IRT parameters. Options and tags are runs of string
+    numbers delimited by per-question offsets."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as error:
+                raise ColumnarError(f"题库文件为空：{path}") from error
+        if len(self._map) < _HEADER.size:
+            raise ColumnarError(f"题库文件已损坏：{path}")
+        magic, version, count, strings, options, tags, blob = _HEADER.unpack_from(self._map, 0)
+        if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+            raise ColumnarError(f"无法识别的列式题库文件：{path}")
+        view = memoryview(self._map)
+        layout = _layout(count, strings, options, tags, blob)
+        if layout["end"] > len(self._map):
+            raise ColumnarError(f"题库文件已损坏：{path}")
+
+        def column(name: str, code: str) -> memoryview:
+            start, length = layout[name]
+            return view[start : start + length].cast(code)
+
+        self._string_offsets = column("string_offsets", "Q")
+        self._blob = column("blob", "B")
+        self._ids = column("ids", "I")
+        self.prompts = column("prompts", "I")
+        self.explanations = column("explanations", "I")
+        self._option_offsets = column("option_offsets", "I")
+        self._options = column("options", "I")
+        self._tag_offsets = column("tag_offsets", "I")
+        self._tags = column("tags", "I")
+        self.correct_options = column("correct_options", "h")
+        self.categories = column("categories", "B")
+        self.difficulties = column("difficulties", "d")
+        self.discriminations = column("discriminations", "d")
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def fingerprint(self) -> str:
+        # String 0 records what the file was compiled from.
+        return self.string(0)
+
+    def string(self, number: int) -> str:
+        return str(self._blob[self._string_offsets[number] : self._string_offsets[number + 1]], "utf-8")
+
+    def question_id(self, row: int) -> str:
+        return self.string(self._ids[row])
+
+    def options(self, row: int) -> List[str]:
+        string = self.string
+        return [string(number) for number in self._options[self._option_offsets[row] : self._option_offsets[row + 1]]]
+
+    def tags(self, row: int) -> Tuple[str, ...]:
+        string = self.string
+        return tuple(string(number) for number in self._tags[self._tag_offsets[row] : self._tag_offsets[row + 1]])
+
+    def question(self, row: int) -> ColumnarQuestion:
+        if not 0 <= row < self._count:
+            raise IndexError(row)
+        return ColumnarQuestion(self, row)
+
+
+def write_columnar(questions: Iterable[Question], path: Union[str, Path], *, fingerprint: str = "") -> int:
+    """Write the questions as a columnar file, atomically. Returns the number
+    of questions written."""
+    strings: Dict[str, int] = {fingerprint: 0}
+    blob = bytearray(fingerprint.encode("utf-8"))
+    string_offsets = array("Q", [0, len(blob)])
+
+    def intern(text: str) -> int:
+        number = strings.get(text)
+        if number is None:
+            number = strings[text] = len(string_offsets) - 1
+            blob.extend(text.encode("utf-8"))
+            string_offsets.append(len(blob))
+        return number
+
+    ids, prompts, explanations = array("I"), array("I"), array("I")
+    option_offsets, options = array("I", [0]), array("I")
+    tag_offsets, tags = array("I", [0]), array("I")
+    correct_options, categories = array("h"), array("B")
+    difficulties, discriminations = array("d"), array("d")
+    for question in questions:
+        ids.append(intern(question.id))
+        prompts.append(intern(question.prompt))
+        explanations.append(intern(question.explanation))
+        options.extend(intern(option) for option in question.options)
+        option_offsets.append(len(options))
+        tags.extend(intern(tag) for tag in question.tags)
+        tag_offsets.append(len(tags))
+        correct_options.append(question.correct_option)
+        categories.append(_CATEGORY_CODES[question.category])
+        difficulties.append(question.difficulty)
+        discriminations.append(question.discrimination)
+    count = len(ids)
+    layout = _layout(count, len(string_offsets) - 1, len(options), len(tags), len(blob))
+    sections: List[Tuple[str, Any]] = [
+        ("string_offsets", string_offsets),
+        ("ids", ids),
+        ("prompts", prompts),
+        ("explanations", explanations),
+        ("option_offsets", option_offsets),
+        ("options", options),
+        ("tag_offsets", tag_offsets),
+        ("tags", tags),
+        ("correct_options", correct_options),
+        ("categories", categories),
+        ("difficulties", difficulties),
+        ("discriminations", discriminations),
+        ("blob", blob),
+    ]
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with temporary.open("wb") as file:
+            file.write(
+                _HEADER.pack(
+                    COLUMNAR_MAGIC,
+                    COLUMNAR_VERSION,
+                    count,
+                    len(string_offsets) - 1,
+                    len(options),
+                    len(tags),
+                    len(blob),
+                )
+            )
+            for name, data in sections:
+                _pad_to(file, layout[name][0])
+                file.write(data if isinstance(data, bytearray) else data.tobytes())
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return count
+
+
+def _layout(count: int, strings: int, options: int, tags: int, blob: int) -> Dict[str, Any]:
+    # Byte offset and length of every section; each starts on an 8-byte
+    # boundary so the typed views are aligned.
+    sizes = [
+        ("string_offsets", 8 * (strings + 1)),
+        ("ids", 4 * count),
+        ("prompts", 4 * count),
+        ("explanations", 4 * count),
+        ("option_offsets", 4 * (count + 1)),
+        ("options", 4 * options),
+        ("tag_offsets", 4 * (count + 1)),
+        ("tags", 4 * tags),
+        ("correct_options", 2 * count),
+        ("categories", count),
+        ("difficulties", 8 * count),
+        ("discriminations", 8 * count),
+        ("blob", blob),
+    ]
+    layout: Dict[str, Any] = {}
+    offset = _HEADER.size
+    for name, size in sizes:
+        offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+        layout[name] = (offset, size)
+        offset += size
+    layout["end"] = offset
+    return layout
+
+
+def _pad_to(file: BinaryIO, offset: int) -> None:
+    position = file.tell()
+    if position < offset:
+        file.write(b"\0" * (offset - position))
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Protocol
+
+
+class ExamIO(Protocol):
+    def write(self, text: str) -> None:
+        ...
+
+    def read(self, prompt: str) -> str:
+        ...
+
+
+class ConsoleIO:
+    def write(self, text: str) -> None:
+        print(text)
+
+    def read(self, prompt: str) -> str:
+        return input(prompt)
+
+
+class ScriptedIO:
+    def __init__(self, inputs: Iterable[str], *, keep_output: bool = False) -> None:
+        self._inputs = iter(inputs)
+        self._keep_output = keep_output
+        self.output: List[str] = []
+
+    def write(self, text: str) -> None:
+        if self._keep_output:
+            self.output.append(text)
+
+    def read(self, prompt: str) -> str:
+        try:
+            return next(self._inputs)
+        except StopIteration:
+            # Behave like a closed terminal once the script runs out.
+            raise EOFError from None
@@ -2,16 +2,52 @@ from __future__ import annotations
 
 import random
 import textwrap
+import time
 from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
-from typing import List, Optional, Sequence
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from .questions import QUESTION_BANK, Category, Question
-from .tts import TextToSpeech
+from .adaptive import AdaptivePool, AdaptiveSession
+from .console import ConsoleIO, ExamIO
+from .journal import KIND_ADAPTIVE, KIND_FIXED, InterruptedSession, JournalStore, SessionJournal
+from .metrics import DISPLAY_SECONDS, INPUT_SYSTEM_SECONDS, INPUT_THINK_SECONDS, SAVE_FAILURES, SAVE_SECONDS
+from .papers import Paper
+from .question_bank import QuestionBank, load_bank
+from .questions import Category, Question
+from .render import QuestionRenderer, TextBlock, renderer_for
+from .results import ResultStore, SessionRecord
+from .schedule import ReviewSchedule
+from .search import SearchIndex, search_index_for
+from .tts import SpeechPriority, TextToSpeech
 
 OPTION_NUMBERS = ("1", "2", "3", "4", "5", "6")
-SCORE_RECORD_FILE = Path(__file__).resolve().parent / "score_records.txt"
+BANNER_TEXT = "盲人大学生计算机基础无障碍考试系统"
+MISSING_TTS_HINT = "提示：未检测到pyttsx3语音库，将仅以文字形式呈现内容。"
+WELCOME_LINES = (
+    "系统支持键盘操作，并可在安装 pyttsx3 库后提供语音播报。",
+    "菜单中可以选择完整考试、针对某个科目的练习或回顾上次成绩。",
+)
+MAIN_MENU_LINES = (
+    "主菜单：",
+    "1. 开始完整考试（包含四个科目）",
+    "2. 针对指定科目练习",
+    "3. 回顾答题成绩（最近一次及历史记录）",
+    "4. 收听操作指南",
+    "5. 开始自适应考试（根据作答自动调整题目与题量）",
+    "6. 检索题目（按关键词查找题目）",
+    "Q. 退出系统",
+)
+INSTRUCTION_LINES = (
+    "操作指南：系统以键盘输入为主，按数字选择菜单，答案输入数字即可。",
+    "在题目界面可以输入R重新朗读题干（需要安装语音库），输入Q返回主菜单。",
+    "练习模式会立即告知正误，完整考试则在结束后统一反馈。",
+    "自适应考试会根据您的作答挑选题目，能力估计足够准确时自动结束。",
+    "检索题目时输入关键词即可，可以逐题收听详情，或直接练习找到的题目。",
+)
+ANSWER_HINT = "请输入答案对应的数字。输入R重复朗读题干，输入Q返回主菜单。"
+DISPLAY_WIDTH = 70
+HISTORY_PAGE_SIZE = 5
+SEARCH_RESULT_LIMIT = 10
 
 
 @dataclass
@@ -40,34 +76,48 @@ class ExamSummary:
 
 
 class ExamEngine:
-    def __init__(self, questions: Sequence[Question], speaker: Optional[TextToSpeech] = None) -> None:
-        self._questions = list(questions)
+    def __init__(
+        self,
+        questions: Union[QuestionBank, Sequence[Question]],
+        speaker: Optional[TextToSpeech] = None,
+        io: Optional[ExamIO] = None,
+        store: Optional[ResultStore] = None,
+        adaptive_pool: Optional[AdaptivePool] = None,
+        journals: Optional[JournalStore] = None,
+    ) -> None:
+        if not isinstance(questions, QuestionBank):
+            questions = QuestionBank.from_questions(questions)
+        self._bank = questions
         self._speaker = speaker
+        self._io: ExamIO = io if io is not None else ConsoleIO()
+        self._store = store
+        self._adaptive_pool = adaptive_pool
+        self._journals = journals
+        self._renderer = renderer_for(questions, DISPLAY_WIDTH, OPTION_NUMBERS)
         self._rng = random.Random()
         self._candidate_name = "考生"
         self._last_summary: Optional[ExamSummary] = None
+        self._last_input_at: Optional[float] = None
+        self._speech_status_reported = False
+        self._search_index: Optional[SearchIndex] = None
+        self._schedule: Optional[ReviewSchedule] = None
 
     def run(self) -> None:
         self._show_banner()
         self._candidate_name = self._ask_candidate_name()
+        self._report_speech_status()
         self._display(
             "您好，{}同学。欢迎来到计算机基础无障碍考试系统。".format(self._candidate_name),
         )
-        self._display(
-            "系统支持键盘操作，并可在安装 pyttsx3 库后提供语音播报。",
-        )
-        self._display(
-            "菜单中可以选择完整考试、针对某个科目的练习或回顾上次成绩。"
-        )
+        for line in WELCOME_LINES:
+            self._display(line)
+        self._offer_resume()
         while True:
             self._separator()
-            self._display("主菜单：")
-            self._display("1. 开始完整考试（包含四个科目）")
-            self._display("2. 针对指定科目练习")
-            self._display("3. 回顾最近一次答题成绩")
-            self._display("4. 收听操作指南")
-            self._display("Q. 退出系统")
-            choice = self._get_input("请输入选项（1/2/3/4/Q）：", upper=True)
+            self._report_speech_status()
+            for line in MAIN_MENU_LINES:
+                self._display(line)
+            choice = self._get_input("请输入选项（1/2/3/4/5/6/Q）：", upper=True)
             if choice == "1":
                 self._start_full_exam()
             elif choice == "2":
@@ -76,20 +126,81 @@ class ExamEngine:
                 self._review_last_summary()
             elif choice == "4":
                 self._speak_instructions()
+            elif choice == "5":
+                self._start_adaptive_exam()
+            elif choice == "6":
+                self._search_questions()
             elif choice == "Q":
                 self._display("感谢使用，祝学习顺利！再见。")
+                self._wait_for_speech()
                 break
             else:
                 self._display("未识别的选项，请重试。")
 
+    def run_paper(self, paper: Paper) -> None:
+        self._show_banner()
+        self._candidate_name = self._ask_candidate_name()
+        self._report_speech_status()
+        self._display(f"您好，{self._candidate_name}同学。本场考试使用第{paper.number}号试卷。")
+        if not self._offer_resume():
+            questions = self._bank.questions(paper.question_ids)
+            summary = self._conduct_session(f"综合考试（第{paper.number}号试卷）", questions, immediate_feedback=False)
+            if summary:
+                self._last_summary = summary
+        self._display("考试结束，感谢参与。")
+        self._wait_for_speech()
+
     def _start_full_exam(self) -> None:
-        questions = self._questions.copy()
-        self._rng.shuffle(questions)
+        question_ids = list(self._bank.ids)
+        self._rng.shuffle(question_ids)
+        questions = self._bank.questions(question_ids)
         title = "综合考试"
         summary = self._conduct_session(title, questions, immediate_feedback=False)
         if summary:
             self._last_summary = summary
 
+    def _start_adaptive_exam(self, resume: Optional[InterruptedSession] = None) -> None:
+        if self._adaptive_pool is None:
+            stats = self._store.question_stats() if self._store is not None else None
+            self._adaptive_pool = AdaptivePool.from_bank(self._bank, stats)
+        if not len(self._adaptive_pool):
+            self._display("没有可用题目。")
+            return
+        session = AdaptiveSession(self._adaptive_pool, rng=self._rng)
+        title = "自适应考试"
+        if resume is None:
+            self._display(f"现在开始“{title}”，系统会根据您的作答挑选难度合适的题目，最多{session.max_items}题。")
+            started = datetime.now()
+            results: List[QuestionResult] = []
+            journal = self._start_journal(title, KIND_ADAPTIVE, (), immediate_feedback=False, started=started)
+        else:
+            started, results, journal = self._resume_journal(resume)
+            for result in results:
+                session.record(result.question.id, result.is_correct)
+            self._display(f"继续“{title}”，已作答{len(results)}题。")
+        completed = False
+        try:
+            while True:
+                question_id = session.next_question_id()
+                if question_id is None:
+                    break
+                question = self._bank.get(question_id)
+                answer = self._ask_question(question, len(results) + 1, None)
+                if answer is None:
+                    self._display("已提前结束本轮答题。")
+                    break
+                result = self._record_answer(question, answer, immediate_feedback=False)
+                results.append(result)
+                self._journal_answer(journal, len(results), result)
+                session.record(question.id, result.is_correct)
+            if results:
+                self._display(f"能力估计值为{session.theta:.2f}，估计标准误为{session.standard_error:.2f}。")
+            self._last_summary = self._finish_session(title, len(results), started, results)
+            completed = True
+        finally:
+            if journal is not None:
+                journal.close(remove=completed)
+
     def _start_practice(self) -> None:
         self._display("请输入要练习的科目编号：")
         for index, category in enumerate(Category, start=1):
@@ -106,12 +217,12 @@ class ExamEngine:
         except IndexError:
             self._display("编号超出范围。")
             return
-        questions = [q for q in self._questions if q.category == category]
-        if not questions:
+        available = self._bank.count_for_category(category)
+        if not available:
             self._display("暂未找到该科目的题目。")
             return
         self._display(
-            "共找到{}道题。若需随机抽取，请输入数量；直接回车表示全部答题。".format(len(questions)),
+            "共找到{}道题。若需随机抽取，请输入数量；直接回车表示全部答题。".format(available),
         )
         amount_text = self._get_input("请输入需要练习的题目数量：")
         selected_questions: List[Question]
@@ -120,9 +231,12 @@ class ExamEngine:
                 self._display("请输入数字或直接回车。")
                 return
             amount = max(1, int(amount_text))
-            selected_questions = self._rng.sample(questions, k=min(amount, len(questions)))
+            selected_ids, due_count = self._review_schedule().select(self._bank, category, amount, self._rng)
+            selected_questions = self._bank.questions(selected_ids)
+            if due_count:
+                self._display(f"其中{due_count}道是到了复习时间的题目，将优先安排。")
         else:
-            selected_questions = questions
+            selected_questions = self._bank.questions(self._bank.ids_for_category(category))
         title = f"{category.value}练习"
         summary = self._conduct_session(title, selected_questions, immediate_feedback=True)
         if summary:
@@ -134,29 +248,180 @@ class ExamEngine:
         questions: Sequence[Question],
         *,
         immediate_feedback: bool,
+        resume: Optional[InterruptedSession] = None,
     ) -> Optional[ExamSummary]:
         if not questions:
             self._display("没有可用题目。")
             return None
         total = len(questions)
-        self._display(f"现在开始“{title}”，共{total}题。")
-        started = datetime.now()
-        results: List[QuestionResult] = []
-        for position, question in enumerate(questions, start=1):
-            answer = self._ask_question(question, position, total)
-            if answer is None:
-                self._display("已提前结束本轮答题。")
-                break
-            is_correct = answer == question.correct_option
-            results.append(QuestionResult(question=question, selected_option=answer, is_correct=is_correct))
-            if immediate_feedback:
-                if is_correct:
-                    self._display("回答正确。")
-                else:
-                    self._display("回答错误。")
-                    correct_number = question.correct_option + 1
-                    self._display(f"正确答案是选项{correct_number}：{question.options[question.correct_option]}")
-                    self._display(question.explanation)
+        if resume is None:
+            self._display(f"现在开始“{title}”，共{total}题。")
+            started = datetime.now()
+            results: List[QuestionResult] = []
+            journal = self._start_journal(
+                title,
+                KIND_FIXED,
+                [question.id for question in questions],
+                immediate_feedback=immediate_feedback,
+                started=started,
+            )
+        else:
+            started, results, journal = self._resume_journal(resume)
+            self._display(f"继续“{title}”，共{total}题，从第{len(results) + 1}题开始。")
+        completed = False
+        try:
+            for position in range(len(results) + 1, total + 1):
+                question = questions[position - 1]
+                answer = self._ask_question(question, position, total)
+                if answer is None:
+                    self._display("已提前结束本轮答题。")
+                    break
+                result = self._record_answer(question, answer, immediate_feedback=immediate_feedback)
+                results.append(result)
+                self._journal_answer(journal, position, result)
+            summary = self._finish_session(title, total, started, results)
+            completed = True
+        finally:
+            # An interrupted session keeps its journal so it can be resumed.
+            if journal is not None:
+                journal.close(remove=completed)
+        return summary
+
+    def _offer_resume(self) -> bool:
+        if self._journals is None:
+            return False
+        for found in self._journals.interrupted(self._candidate_name):
+            try:
+                # Claimed before it is offered, so a concurrent session of a
+                # candidate with the same name cannot resume it as well.
+                interrupted = self._journals.claim(found)
+            except (OSError, ValueError, RuntimeError):
+                continue
+            try:
+                choice = self._ask_resume(interrupted)
+            except BaseException:
+                interrupted.journal.close()
+                raise
+            if choice == "N":
+                interrupted.journal.close(remove=True)
+                self._display("已放弃该答题记录。")
+                continue
+            return self._resume_session(interrupted)
+        return False
+
+    def _ask_resume(self, interrupted: InterruptedSession) -> str:
+        header = interrupted.header
+        total = f"共{len(header.question_ids)}题，" if header.kind == KIND_FIXED else ""
+        self._display(
+            f"检测到您于{header.started_at:%m月%d日%H:%M}开始的“{header.title}”尚未完成，"
+            f"{total}已作答{len(interrupted.entries)}题。"
+        )
+        choice = self._get_input("输入Y继续作答，输入N放弃该记录：", upper=True)
+        while choice not in ("Y", "N"):
+            self._display("请输入Y或N。")
+            choice = self._get_input("输入Y继续作答，输入N放弃该记录：", upper=True)
+        return choice
+
+    def _resume_session(self, interrupted: InterruptedSession) -> bool:
+        header = interrupted.header
+        needed = [entry.question_id for entry in interrupted.entries]
+        if header.kind == KIND_FIXED:
+            needed.extend(header.question_ids)
+        if any(question_id not in self._bank for question_id in needed):
+            self._display("题库已发生变化，无法继续该答题记录。")
+            interrupted.journal.close(remove=True)
+            return False
+        if header.kind == KIND_ADAPTIVE:
+            self._start_adaptive_exam(resume=interrupted)
+            return True
+        summary = self._conduct_session(
+            header.title,
+            self._bank.questions(header.question_ids),
+            immediate_feedback=header.immediate_feedback,
+            resume=interrupted,
+        )
+        if summary:
+            self._last_summary = summary
+        return True
+
+    def _start_journal(
+        self,
+        title: str,
+        kind: str,
+        question_ids: Sequence[str],
+        *,
+        immediate_feedback: bool,
+        started: datetime,
+    ) -> Optional[SessionJournal]:
+        if self._journals is None:
+            return None
+        try:
+            return self._journals.start(
+                candidate=self._candidate_name,
+                title=title,
+                kind=kind,
+                immediate_feedback=immediate_feedback,
+                started_at=started,
+                question_ids=question_ids,
+            )
+        except OSError:
+            return None
+
+    def _resume_journal(
+        self,
+        interrupted: InterruptedSession,
+    ) -> Tuple[datetime, List[QuestionResult], Optional[SessionJournal]]:
+        questions = self._bank.questions(entry.question_id for entry in interrupted.entries)
+        results = [
+            QuestionResult(
+                question=question,
+                selected_option=entry.selected_option,
+                is_correct=entry.selected_option == question.correct_option,
+            )
+            for question, entry in zip(questions, interrupted.entries)
+        ]
+        # These answers were given before the interruption and are not in
+        # the result database yet.
+        schedule = self._review_schedule()
+        for result in results:
+            schedule.record_result(result)
+        return interrupted.header.started_at, results, interrupted.journal
+
+    def _journal_answer(self, journal: Optional[SessionJournal], position: int, result: QuestionResult) -> None:
+        if journal is not None and result.selected_option is not None:
+            journal.append(position, result.question.id, result.selected_option)
+
+    def _record_answer(self, question: Question, answer: int, *, immediate_feedback: bool) -> QuestionResult:
+        is_correct = answer == question.correct_option
+        if immediate_feedback:
+            if is_correct:
+                self._display("回答正确。", priority=SpeechPriority.FEEDBACK)
+            else:
+                rendered = self._renderer.render(question)
+                self._display("回答错误。", priority=SpeechPriority.FEEDBACK)
+                self._show(rendered.feedback, priority=SpeechPriority.FEEDBACK)
+                self._show(rendered.explanation, priority=SpeechPriority.FEEDBACK)
+        result = QuestionResult(question=question, selected_option=answer, is_correct=is_correct)
+        self._review_schedule().record_result(result)
+        return result
+
+    def _review_schedule(self) -> ReviewSchedule:
+        # Loaded on first use, before any answer of this run is saved, and
+        # then kept current answer by answer.
+        if self._schedule is None or self._schedule.candidate != self._candidate_name:
+            if self._store is not None:
+                self._schedule = ReviewSchedule.load(self._store, self._candidate_name)
+            else:
+                self._schedule = ReviewSchedule(self._candidate_name)
+        return self._schedule
+
+    def _finish_session(
+        self,
+        title: str,
+        total: int,
+        started: datetime,
+        results: List[QuestionResult],
+    ) -> ExamSummary:
         finished = datetime.now()
         answered = len(results)
         summary = ExamSummary(
@@ -175,20 +440,24 @@ class ExamEngine:
                 self._display("本次成绩已保存。")
         return summary
 
-    def _ask_question(self, question: Question, position: int, total: int) -> Optional[int]:
+    def _ask_question(self, question: Question, position: int, total: Optional[int]) -> Optional[int]:
         self._separator("=")
-        header = f"第{position}题，共{total}题。科目：{question.category.value}"
-        self._display(header)
-        self._display(question.prompt)
-        spoken_parts: List[str] = [header, question.prompt]
-        for idx, option in enumerate(question.options):
-            label = OPTION_NUMBERS[idx]
-            option_line = f"{label}. {option}"
-            self._display(option_line)
-            spoken_parts.append(option_line)
+        if total is None:
+            header = f"第{position}题。科目：{question.category.value}"
+        else:
+            header = f"第{position}题，共{total}题。科目：{question.category.value}"
+        rendered = self._renderer.render(question)
+        if self._speaker and self._speaker.available:
+            # A new question: an echo of the previous answer that has not
+            # been read out yet is no longer worth the candidate's time.
+            self._speaker.advance(keep=SpeechPriority.MESSAGE)
+        # The screen is written silently and then read out once as a whole.
+        self._display(header, speak=False)
+        self._show(rendered.question, speak=False)
         if self._speaker and self._speaker.available:
-            self._speaker.speak("。".join(spoken_parts))
-        self._display("请输入答案对应的数字。输入R重复朗读题干，输入Q返回主菜单。")
+            self._speaker.speak(header, SpeechPriority.QUESTION)
+            self._speaker.speak(rendered.question.utterance, SpeechPriority.QUESTION)
+        self._display(ANSWER_HINT)
         while True:
             raw = self._get_input("您的选择：", upper=True)
             if raw == "":
@@ -198,12 +467,15 @@ class ExamEngine:
                 return None
             if raw == "R":
                 if self._speaker and self._speaker.available:
-                    self._speaker.speak("。".join(spoken_parts))
+                    self._speaker.cancel()
+                    self._speaker.speak(header, SpeechPriority.QUESTION)
+                    self._speaker.speak(rendered.question.utterance, SpeechPriority.QUESTION)
                 else:
                     self._display("当前未启用语音播报。")
                 continue
-            if raw in OPTION_NUMBERS[: len(question.options)]:
-                return OPTION_NUMBERS.index(raw)
+            choice = rendered.choices.get(raw)
+            if choice is not None:
+                return choice
             self._display("无效输入，请输入题目选项数字。")
 
     def _present_summary(self, summary: ExamSummary) -> None:
@@ -220,68 +492,160 @@ class ExamEngine:
         if summary.results:
             self._display("逐题回顾：")
         for result in summary.results:
-            number_label = result.question.correct_option + 1
-            correctness = "正确" if result.is_correct else "错误"
-            self._display(
-                f"[{correctness}] {result.question.prompt}",
-            )
-            self._display(
-                f"正确答案：{number_label}. {result.question.options[result.question.correct_option]}",
-            )
-            if not result.is_correct:
-                self._display(result.question.explanation)
+            self._review_answer(result.question, result.is_correct)
+
+    def _present_record(self, record: SessionRecord) -> None:
+        self._separator()
+        self._display(
+            f"{record.finished_at:%Y年%m月%d日%H:%M}完成的“{record.title}”："
+            f"共计划{record.total_questions}题，实际作答{record.answered_questions}题，"
+            f"答对{record.correct_answers}题，正确率约为{round(record.accuracy * 100)}%。",
+        )
+        # Questions removed from the bank since then can no longer be shown.
+        answers = [answer for answer in record.answers if answer.question_id in self._bank]
+        if answers:
+            self._display("逐题回顾：")
+        for answer in answers:
+            self._review_answer(self._bank.get(answer.question_id), answer.is_correct)
+
+    def _review_answer(self, question: Question, is_correct: bool) -> None:
+        rendered = self._renderer.render(question)
+        if is_correct:
+            self._show(rendered.review_correct)
+            self._show(rendered.answer)
+        else:
+            self._show(rendered.review_incorrect)
+            self._show(rendered.answer)
+            self._show(rendered.explanation)
 
     def _save_summary(self, summary: ExamSummary) -> bool:
-        lines = [
-            "-" * 50,
-            f"时间：{summary.finished_at.strftime('%Y-%m-%d %H:%M:%S')}",
-            f"姓名：{summary.candidate}",
-            f"考试：{summary.title}",
-            f"作答：{summary.answered_questions}/{summary.total_questions}",
-            f"正确：{summary.correct_answers}",
-            f"正确率：{round(summary.accuracy * 100)}%",
-        ]
-        for idx, result in enumerate(summary.results, start=1):
-            choice = result.selected_option + 1 if result.selected_option is not None else "未作答"
-            correctness = "正确" if result.is_correct else "错误"
-            lines.append(
-                f"第{idx}题：选择{choice}，{correctness}；正确答案为{result.question.correct_option + 1}。"
-            )
-        lines.append("")
-        record = "\n".join(lines)
-        try:
-            with SCORE_RECORD_FILE.open("a", encoding="utf-8") as file:
-                file.write(record)
-            return True
-        except OSError:
-            self._display("保存成绩时出现问题，请检查存储位置。")
+        if self._store is None:
+            self._display("未指定成绩数据库，本次成绩未保存。")
             return False
+        started = time.perf_counter()
+        saved = self._store.save(summary)
+        SAVE_SECONDS.observe(time.perf_counter() - started)
+        if saved:
+            return True
+        SAVE_FAILURES.inc()
+        self._display("保存成绩时出现问题，请检查存储位置。")
+        return False
+
+    def _search_questions(self) -> None:
+        if self._search_index is None:
+            self._display("正在准备题目检索……")
+            try:
+                self._search_index = search_index_for(self._bank)
+            except RuntimeError as exc:
+                self._display(str(exc))
+                return
+        while True:
+            query = self._get_input("请输入关键词，直接回车返回主菜单：")
+            if not query:
+                return
+            hits = self._search_index.search(query, SEARCH_RESULT_LIMIT)
+            if not hits:
+                self._display("没有找到相关题目，请换个关键词。")
+                continue
+            questions = self._bank.questions([hit.question_id for hit in hits])
+            self._display(f"找到{len(questions)}道相关题目：")
+            for number, question in enumerate(questions, start=1):
+                self._display(f"{number}. [{question.category.value}] {question.prompt}（{question.id}）")
+            if not self._browse_search_results(query, questions):
+                return
+
+    def _browse_search_results(self, query: str, questions: Sequence[Question]) -> bool:
+        # Returns False once the candidate has practised the results, which
+        # ends the search and goes back to the main menu.
+        while True:
+            choice = self._get_input("输入序号查看详情，输入L练习以上题目，直接回车重新检索：", upper=True)
+            if not choice:
+                return True
+            if choice == "L":
+                summary = self._conduct_session(f"{query}检索练习", questions, immediate_feedback=True)
+                if summary:
+                    self._last_summary = summary
+                return False
+            if not choice.isdigit() or not 1 <= int(choice) <= len(questions):
+                self._display("请输入列表中的序号。")
+                continue
+            question = questions[int(choice) - 1]
+            rendered = self._renderer.render(question)
+            self._display(f"{question.category.value}（{question.id}）")
+            self._show(rendered.question)
+            self._show(rendered.answer)
+            self._show(rendered.explanation)
 
     def _review_last_summary(self) -> None:
-        if not self._last_summary:
-            self._display("当前暂无历史成绩，请先完成一次答题。")
+        if self._last_summary:
+            self._display("为您回顾最近一次成绩：")
+            self._present_summary(self._last_summary)
+        else:
+            # After a restart the latest session comes from the result
+            # database instead of memory.
+            latest = self._store.latest_session(self._candidate_name) if self._store is not None else None
+            if latest is None:
+                self._display("当前暂无历史成绩，请先完成一次答题。")
+                return
+            self._display("为您回顾最近一次成绩：")
+            self._present_record(latest)
+        if self._store is None:
             return
-        self._display("为您回顾最近一次成绩：")
-        self._present_summary(self._last_summary)
+        choice = self._get_input("输入H浏览历史答题记录，直接回车返回主菜单：", upper=True)
+        if choice == "H":
+            self._browse_history()
+
+    def _browse_history(self) -> None:
+        before: Optional[int] = None
+        while True:
+            # One row beyond the page tells whether older sessions remain
+            # without counting them all.
+            page = self._store.sessions(candidate=self._candidate_name, before=before, limit=HISTORY_PAGE_SIZE + 1)
+            has_more = len(page) > HISTORY_PAGE_SIZE
+            page = page[:HISTORY_PAGE_SIZE]
+            if not page:
+                self._display("没有更早的答题记录。")
+                return
+            for number, record in enumerate(page, start=1):
+                self._display(
+                    f"{number}. {record.finished_at:%Y年%m月%d日%H:%M} {record.title}，"
+                    f"答对{record.correct_answers}题，共{record.total_questions}题"
+                )
+            prompt = "输入序号收听详情，直接回车返回主菜单："
+            if has_more:
+                prompt = "输入序号收听详情，输入N查看更早的记录，直接回车返回主菜单："
+            while True:
+                choice = self._get_input(prompt, upper=True)
+                if not choice:
+                    return
+                if choice == "N" and has_more:
+                    before = page[-1].session_id
+                    break
+                if not choice.isdigit() or not 1 <= int(choice) <= len(page):
+                    self._display("请输入列表中的序号。")
+                    continue
+                record = self._store.session(page[int(choice) - 1].session_id)
+                if record is not None:
+                    self._present_record(record)
 
     def _speak_instructions(self) -> None:
-        instructions = (
-            "操作指南：系统以键盘输入为主，按数字选择菜单，答案输入数字即可。",
-            "在题目界面可以输入R重新朗读题干（需要安装语音库），输入Q返回主菜单。",
-            "练习模式会立即告知正误，完整考试则在结束后统一反馈。",
-        )
-        for item in instructions:
+        for item in INSTRUCTION_LINES:
             self._display(item)
 
     def _show_banner(self) -> None:
         self._separator("=")
-        banner = "盲人大学生计算机基础无障碍考试系统"
-        self._display(banner)
+        self._display(BANNER_TEXT)
         self._separator("=")
-        if self._speaker and not self._speaker.available:
-            self._display(
-                "提示：未检测到pyttsx3语音库，将仅以文字形式呈现内容。",
-            )
+        self._report_speech_status()
+
+    def _report_speech_status(self) -> None:
+        # The speech engine starts in the background and may still be loading
+        # when the banner is shown; the hint then waits until the next check.
+        if self._speech_status_reported or not self._speaker or not self._speaker.ready:
+            return
+        self._speech_status_reported = True
+        if not self._speaker.available:
+            self._display(MISSING_TTS_HINT)
 
     def _ask_candidate_name(self) -> str:
         name = self._get_input("请输入您的姓名（可留空）：")
@@ -289,37 +653,114 @@ class ExamEngine:
             return "考生"
         return name
 
-    def _display(self, text: str, *, speak: bool = True) -> None:
+    def _display(
+        self,
+        text: str,
+        *,
+        speak: bool = True,
+        priority: SpeechPriority = SpeechPriority.MESSAGE,
+    ) -> None:
         if not text:
             return
+        started = time.perf_counter()
         for line in text.splitlines():
-            print(textwrap.fill(line, width=70))
+            self._io.write(textwrap.fill(line, width=DISPLAY_WIDTH))
         if speak and self._speaker and self._speaker.available:
-            self._speaker.speak(text.replace("\n", "。"))
+            self._speaker.speak(text.replace("\n", "。"), priority)
+        DISPLAY_SECONDS.observe(time.perf_counter() - started)
+
+    def _show(
+        self,
+        block: TextBlock,
+        *,
+        speak: bool = True,
+        priority: SpeechPriority = SpeechPriority.MESSAGE,
+    ) -> None:
+        if not block.lines:
+            return
+        started = time.perf_counter()
+        for line in block.lines:
+            self._io.write(line)
+        if speak and self._speaker and self._speaker.available:
+            self._speaker.speak(block.utterance, priority)
+        DISPLAY_SECONDS.observe(time.perf_counter() - started)
 
     def _separator(self, char: str = "-") -> None:
-        print(char * 70)
+        self._io.write(char * DISPLAY_WIDTH)
 
     def _get_input(self, prompt: str, *, upper: bool = False) -> str:
-        value = input(prompt)
+        prompted = time.perf_counter()
+        if self._last_input_at is not None:
+            INPUT_SYSTEM_SECONDS.observe(prompted - self._last_input_at)
+        value = self._io.read(prompt)
+        self._last_input_at = time.perf_counter()
+        INPUT_THINK_SECONDS.observe(self._last_input_at - prompted)
         value = value.strip()
         if upper:
             value = value.upper()
+        if self._speaker and self._speaker.available:
+            # The candidate has already answered; anything still queued from
+            # the previous screen is stale.
+            self._speaker.cancel()
         self._echo_user_input(value)
         return value
 
+    def _wait_for_speech(self, timeout: Optional[float] = None) -> None:
+        if self._speaker and self._speaker.available:
+            self._speaker.flush(timeout)
+
     def _echo_user_input(self, value: str) -> None:
-        if not value:
-            spoken_value = "空输入"
-        elif value.isdigit():
-            spoken_value = "数字" + "、".join(value)
-        elif len(value) == 1 and value.isalpha():
-            spoken_value = f"字母{value}"
-        else:
-            spoken_value = value
         if self._speaker and self._speaker.available:
-            self._speaker.speak(f"您输入的是{spoken_value}")
+            self._speaker.speak(echo_utterance(value), SpeechPriority.ECHO)
+
+
+def echo_utterance(value: str) -> str:
+    if not value:
+        spoken_value = "空输入"
+    elif value.isdigit():
+        spoken_value = "数字" + "、".join(value)
+    elif len(value) == 1 and value.isalpha():
+        spoken_value = f"字母{value}"
+    else:
+        spoken_value = value
+    return f"您输入的是{spoken_value}"
+
+
+def spoken_phrases(questions: Iterable[Question]) -> Iterator[str]:
+    yield BANNER_TEXT
+    yield MISSING_TTS_HINT
+    yield from WELCOME_LINES
+    yield from MAIN_MENU_LINES
+    yield from INSTRUCTION_LINES
+    yield ANSWER_HINT
+    yield "请输入要练习的科目编号："
+    for index, category in enumerate(Category, start=1):
+        yield f"{index}. {category.value}"
+    for value in ("", "Q", "R", *OPTION_NUMBERS):
+        yield echo_utterance(value)
+    yield "回答正确。"
+    yield "回答错误。"
+    renderer = QuestionRenderer(DISPLAY_WIDTH, OPTION_NUMBERS)
+    for question in questions:
+        rendered = renderer.render(question)
+        for block in (
+            rendered.question,
+            rendered.feedback,
+            rendered.explanation,
+            rendered.review_correct,
+            rendered.review_incorrect,
+            rendered.answer,
+        ):
+            if block.utterance:
+                yield block.utterance
 
 
-def build_exam_engine(speaker: Optional[TextToSpeech] = None) -> ExamEngine:
-    return ExamEngine(QUESTION_BANK, speaker)
+def build_exam_engine(
+    speaker: Optional[TextToSpeech] = None,
+    io: Optional[ExamIO] = None,
+    bank: Optional[QuestionBank] = None,
+    store: Optional[ResultStore] = None,
+    adaptive_pool: Optional[AdaptivePool] = None,
+    journals: Optional[JournalStore] = None,
+) -> ExamEngine:
+    return ExamEngine(bank if bank is not None else load_bank(), speaker, io, store, adaptive_pool, journals)
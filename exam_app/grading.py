@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import csv
+import json
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from .exam import OPTION_NUMBERS
+from .question_bank import QuestionBank
+from .results import AnswerRecord, RecordRejectedError, ResultStore, SessionRecord
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_GRADING_TITLE = "批量阅卷"
+SHEET_FIELDS = ("candidate", "title", "started_at", "finished_at")
+UNANSWERED = -1
+
+
+class GradingError(ValueError):
+    pass
+
+
+class AnswerKey:
+    """Correct options of the questions seen so far, as arrays indexed by a
+    column number assigned on first use."""
+
+    def __init__(self, bank: QuestionBank) -> None:
+        self._bank = bank
+        self._columns: Dict[str, int] = {}
+        self.question_ids: List[str] = []
+        self.categories: List[str] = []
+        self._correct: List[int] = []
+        self._option_counts: List[int] = []
+        self._arrays: Optional[Tuple["np.ndarray", "np.ndarray"]] = None
+
+    def column(self, question_id: str) -> Optional[int]:
+        column = self._columns.get(question_id)
+        if column is not None or question_id not in self._bank:
+            return column
+        question = self._bank.get(question_id)
+        column = self._columns[question_id] = len(self.question_ids)
+        self.question_ids.append(question_id)
+        self.categories.append(question.category.value)
+        self._correct.append(question.correct_option)
+        self._option_counts.append(len(question.options))
+        self._arrays = None
+        return column
+
+    def arrays(self, np: Any) -> Tuple["np.ndarray", "np.ndarray"]:
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self._correct, dtype=np.int64),
+                np.asarray(self._option_counts, dtype=np.int64),
+            )
+        return self._arrays
+
+
+@dataclass
+class SheetChunk:
+    candidates: List[str] = field(default_factory=list)
+    titles: List[str] = field(default_factory=list)
+    started_at: List[datetime] = field(default_factory=list)
+    finished_at: List[datetime] = field(default_factory=list)
+    rows: List[int] = field(default_factory=list)
+    columns: List[int] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    skipped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+
+@dataclass
+class GradingResult:
+    graded: int
+    skipped: int
+    answers: int
+    correct: int
+
+    @property
+    def accuracy(self) -> float:
+        if self.answers == 0:
+            return 0.0
+        return self.correct / self.answers
+
+
+def grade_file(
+    store: ResultStore,
+    path: Union[str, Path],
+    bank: QuestionBank,
+    *,
+    title: str = DEFAULT_GRADING_TITLE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> GradingResult:
+    np = _require_numpy()
+    key = AnswerKey(bank)
+    result = GradingResult(graded=0, skipped=0, answers=0, correct=0)
+    pending: List[Tuple[SessionRecord, "Future[int]"]] = []
+    for chunk in iter_sheet_chunks(path, key, title=title, chunk_size=chunk_size):
+        records = grade_chunk(np, key, chunk)
+        # Keep at most one chunk in flight so a slow disk bounds memory use
+        # instead of letting graded sheets pile up in the writer's queue.
+        _wait_all(pending, result)
+        pending = [(record, store.submit(record)) for record in records]
+        result.skipped += chunk.skipped
+    _wait_all(pending, result)
+    return result
+
+
+def grade_chunk(np: Any, key: AnswerKey, chunk: SheetChunk) -> List[SessionRecord]:
+    if not len(chunk):
+        return []
+    correct_options, option_counts = key.arrays(np)
+    rows = np.asarray(chunk.rows, dtype=np.int64)
+    columns = np.asarray(chunk.columns, dtype=np.int64)
+    labels = np.asarray(chunk.labels, dtype=str)
+    selected = np.full(len(labels), UNANSWERED, dtype=np.int64)
+    for index, label in enumerate(OPTION_NUMBERS):
+        selected[labels == label] = index
+    # A mark outside the question's options counts as no answer.
+    selected[selected >= option_counts[columns]] = UNANSWERED
+    answered = selected != UNANSWERED
+    is_correct = answered & (selected == correct_options[columns])
+    size = len(chunk)
+    totals = np.bincount(rows, minlength=size)
+    answered_counts = np.bincount(rows, weights=answered, minlength=size).astype(np.int64)
+    correct_counts = np.bincount(rows, weights=is_correct, minlength=size).astype(np.int64)
+    # Answers arrive grouped by sheet, so each sheet owns one slice.
+    bounds = np.concatenate(([0], np.cumsum(totals))).tolist()
+    # Building the records is plain Python, so it works on lists rather than
+    # paying for a NumPy scalar per answer.
+    selected_list = [None if value == UNANSWERED else value for value in selected.tolist()]
+    correct_list = is_correct.tolist()
+    answered_list = answered_counts.tolist()
+    right_list = correct_counts.tolist()
+    keys = correct_options.tolist()
+    question_ids, categories, column_list = key.question_ids, key.categories, chunk.columns
+    records: List[SessionRecord] = []
+    for row in range(size):
+        start, end = bounds[row], bounds[row + 1]
+        records.append(
+            SessionRecord(
+                candidate=chunk.candidates[row],
+                title=chunk.titles[row],
+                total_questions=end - start,
+                answered_questions=answered_list[row],
+                correct_answers=right_list[row],
+                started_at=chunk.started_at[row],
+                finished_at=chunk.finished_at[row],
+                answers=[
+                    AnswerRecord(
+                        position,
+                        question_ids[column],
+                        categories[column],
+                        selected_list[index],
+                        keys[column],
+                        correct_list[index],
+                    )
+                    for position, index, column in zip(
+                        range(1, end - start + 1), range(start, end), column_list[start:end]
+                    )
+                ],
+            )
+        )
+    return records
+
+
+def iter_sheet_chunks(
+    path: Union[str, Path],
+    key: AnswerKey,
+    *,
+    title: str = DEFAULT_GRADING_TITLE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[SheetChunk]:
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".json"):
+        return _iter_jsonl_chunks(path, key, title, max(1, chunk_size))
+    return _iter_csv_chunks(path, key, title, max(1, chunk_size))
+
+
+def _iter_csv_chunks(path: Path, key: AnswerKey, title: str, chunk_size: int) -> Iterator[SheetChunk]:
+    # One row per sheet: the reserved columns describe the candidate and
+    # every other column is a question id holding the chosen option number.
+    with path.open("r", encoding="utf-8-sig", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        if "candidate" not in header:
+            raise GradingError("答题卡文件缺少 candidate 列。")
+        fields = {name: header.index(name) for name in SHEET_FIELDS if name in header}
+        questions = [(index, name) for index, name in enumerate(header) if name not in SHEET_FIELDS]
+        unknown = [name for _, name in questions if key.column(name) is None]
+        if unknown:
+            raise GradingError(f"题库中没有以下题目：{'、'.join(unknown[:5])}")
+        layout = [(index, key.column(name)) for index, name in questions]
+        chunk = SheetChunk()
+        now = datetime.now()
+        for cells in reader:
+            if not any(cell.strip() for cell in cells):
+                continue
+            sheet = {name: cells[index].strip() if index < len(cells) else "" for name, index in fields.items()}
+            if not _add_sheet(chunk, sheet, title, now):
+                continue
+            row = len(chunk) - 1
+            for index, column in layout:
+                chunk.rows.append(row)
+                chunk.columns.append(column)
+                chunk.labels.append(cells[index].strip() if index < len(cells) else "")
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = SheetChunk()
+        if len(chunk) or chunk.skipped:
+            yield chunk
+
+
+def _iter_jsonl_chunks(path: Path, key: AnswerKey, title: str, chunk_size: int) -> Iterator[SheetChunk]:
+    # One object per line: the sheet fields plus "answers", a mapping from
+    # question id to the chosen option number (null when left blank).
+    chunk = SheetChunk()
+    now = datetime.now()
+    with path.open("r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                answers = record["answers"]
+                layout = [(key.column(str(question_id)), label) for question_id, label in answers.items()]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                chunk.skipped += 1
+                continue
+            if any(column is None for column, _ in layout):
+                chunk.skipped += 1
+                continue
+            sheet = {name: str(record[name]).strip() for name in SHEET_FIELDS if record.get(name) is not None}
+            if not _add_sheet(chunk, sheet, title, now):
+                continue
+            row = len(chunk) - 1
+            for column, label in layout:
+                chunk.rows.append(row)
+                chunk.columns.append(column)
+                chunk.labels.append("" if label is None else str(label).strip())
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = SheetChunk()
+    if len(chunk) or chunk.skipped:
+        yield chunk
+
+
+def _add_sheet(chunk: SheetChunk, sheet: Mapping[str, str], title: str, now: datetime) -> bool:
+    candidate = sheet.get("candidate", "")
+    try:
+        finished = datetime.fromisoformat(sheet["finished_at"]) if sheet.get("finished_at") else now
+        started = datetime.fromisoformat(sheet["started_at"]) if sheet.get("started_at") else finished
+    except ValueError:
+        candidate = ""
+    if not candidate:
+        chunk.skipped += 1
+        return False
+    chunk.candidates.append(candidate)
+    chunk.titles.append(sheet.get("title") or title)
+    chunk.started_at.append(started)
+    chunk.finished_at.append(finished)
+    return True
+
+
+def _wait_all(pending: List[Tuple[SessionRecord, "Future[int]"]], result: GradingResult) -> None:
+    # A sheet the store rejects is skipped like an unreadable one; only
+    # saved sheets count towards the totals.
+    for record, future in pending:
+        try:
+            future.result()
+        except RecordRejectedError:
+            result.skipped += 1
+        else:
+            result.graded += 1
+            result.answers += record.total_questions
+            result.correct += record.correct_answers
+    pending.clear()
+
+
+def _require_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise RuntimeError("批量阅卷需要安装 numpy 库：pip install numpy") from None
+    return numpy
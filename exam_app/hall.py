@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from .adaptive import AdaptivePool
+from .journal import DEFAULT_JOURNAL_DIR, JournalStore
+from .question_bank import QuestionBank, compile_columnar, load_bank
+from .results import DEFAULT_RESULT_DB, Checkpoint, ResultStore, SessionRecord
+from .server import DEFAULT_HOST, DEFAULT_PORT, ExamServer
+
+DEFAULT_SESSIONS_PER_WORKER = 32
+DEFAULT_BACKLOG = 512
+MIN_UPTIME = 5.0
+RESTART_DELAY = 1.0
+SHUTDOWN_TIMEOUT = 10.0
+REPLY_POLL_INTERVAL = 0.5
+SUPERVISOR_POLL_INTERVAL = 1.0
+
+Token = Tuple[int, int]
+
+
+class RemoteResultStore(ResultStore):
+    """Result store of a hall worker: reads go straight to the database, while
+    every write is committed by the hall's single writer process."""
+
+    def __init__(self, path: Union[str, Path], channel: Connection) -> None:
+        super().__init__(path)
+        self._channel = channel
+        self._tokens = itertools.count(1)
+        self._waiting: Dict[Token, Future] = {}
+        self._listener = threading.Thread(target=self._reply_loop, name="result-replies", daemon=True)
+        self._listener.start()
+
+    def submit(self, record: SessionRecord, *, checkpoint: Optional[Checkpoint] = None) -> "Future[int]":
+        future: Future = Future()
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("成绩库已关闭。")
+            token = (os.getpid(), next(self._tokens))
+            self._waiting[token] = future
+            self._channel.send((token, record, checkpoint))
+        return future
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._listener.join()
+        with self._writer_lock:
+            waiting, self._waiting = self._waiting, {}
+        for future in waiting.values():
+            future.set_exception(RuntimeError("成绩库已关闭。"))
+        self._close_reader()
+
+    def _reply_loop(self) -> None:
+        while not self._closed:
+            try:
+                if not self._channel.poll(REPLY_POLL_INTERVAL):
+                    continue
+                token, session_id, error = self._channel.recv()
+            except (EOFError, OSError):
+                return
+            with self._writer_lock:
+                # Replies addressed to a crashed predecessor in this slot
+                # carry its pid and match nothing here.
+                future = self._waiting.pop(tuple(token), None)
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(session_id)
+            else:
+                future.set_exception(RuntimeError(error))
+
+
+class ExamHall:
+    def __init__(
+        self,
+        bank_path: Optional[str] = None,
+        *,
+        bank: Optional[QuestionBank] = None,
+        results_path: Union[str, Path] = DEFAULT_RESULT_DB,
+        journal_dir: Union[str, Path] = DEFAULT_JOURNAL_DIR,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        unix_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        sessions_per_worker: int = DEFAULT_SESSIONS_PER_WORKER,
+    ) -> None:
+        self._bank_path = bank_path
+        self._bank = bank
+        self._results_path = str(results_path)
+        self._journal_dir = str(journal_dir)
+        self._host = host
+        self._port = port
+        self._unix_path = unix_path
+        self._worker_count = max(1, workers or os.cpu_count() or 1)
+        self._sessions_per_worker = max(1, sessions_per_worker)
+        self._context = multiprocessing.get_context()
+        # One duplex pipe per worker slot carries scores to the writer and
+        # confirmations back. Nothing is shared between slots, so a worker
+        # killed mid-transfer cannot leave a lock held for the others.
+        channels = [self._context.Pipe() for _ in range(self._worker_count)]
+        self._worker_channels = [worker_end for worker_end, _ in channels]
+        self._writer_channels = [writer_end for _, writer_end in channels]
+        # The control pipe tells the writer to stop and hands it the new pipe
+        # of a restarted worker; it is a socket pair so it can carry handles.
+        self._control, self._writer_control = self._context.Pipe()
+        self._workers: List[Optional[multiprocessing.process.BaseProcess]] = [None] * self._worker_count
+        self._started_at = [0.0] * self._worker_count
+        self._writer: Optional[multiprocessing.process.BaseProcess] = None
+        self.restarts = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._worker_count * self._sessions_per_worker
+
+    def serve_forever(self) -> None:
+        if self._bank_path is not None:
+            # Workers map one columnar copy of the bank and share its pages
+            # instead of each parsing the bank into private objects.
+            self._bank_path = str(compile_columnar(self._bank_path, self._bank))
+        listener = self._bind()
+        try:
+            self._writer = self._start_writer()
+            for slot in range(self._worker_count):
+                self._start_worker(slot, listener)
+            location = self._unix_path or f"{self._host}:{self._port}"
+            print(
+                f"考场已启动：{location}，{self._worker_count}个工作进程，"
+                f"每个进程最多接待{self._sessions_per_worker}名考生。按Ctrl+C停止。"
+            )
+            while True:
+                self._supervise(listener)
+        finally:
+            # A second Ctrl+C or SIGTERM must not cut shutdown short and
+            # leave the writer behind with the results database open.
+            previous = {number: signal.signal(number, signal.SIG_IGN) for number in (signal.SIGINT, signal.SIGTERM)}
+            try:
+                self._stop()
+                listener.close()
+                if self._unix_path:
+                    try:
+                        os.unlink(self._unix_path)
+                    except OSError:
+                        pass
+            finally:
+                for number, handler in previous.items():
+                    signal.signal(number, handler)
+
+    def _supervise(self, listener: socket.socket) -> None:
+        processes = [process for process in self._workers if process is not None]
+        if self._writer is not None:
+            processes.append(self._writer)
+        multiprocessing.connection.wait([process.sentinel for process in processes])
+        if self._writer is not None and not self._writer.is_alive():
+            print(f"成绩写入进程异常退出（退出码{self._writer.exitcode}），正在重启。")
+            self._writer = self._start_writer()
+        for slot, process in enumerate(self._workers):
+            if process is None or process.is_alive():
+                continue
+            print(f"第{slot + 1}号工作进程异常退出（退出码{process.exitcode}），正在重启。")
+            if time.monotonic() - self._started_at[slot] < MIN_UPTIME:
+                # Do not spin when a worker dies right after starting.
+                time.sleep(RESTART_DELAY)
+            self.restarts += 1
+            self._replace_channel(slot)
+            self._start_worker(slot, listener)
+
+    def _bind(self) -> socket.socket:
+        if self._unix_path:
+            if os.path.exists(self._unix_path):
+                os.unlink(self._unix_path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self._unix_path)
+            listener.listen(DEFAULT_BACKLOG)
+            return listener
+        return socket.create_server((self._host, self._port), backlog=DEFAULT_BACKLOG)
+
+    def _start_writer(self) -> multiprocessing.process.BaseProcess:
+        process = self._context.Process(
+            target=_writer_main,
+            args=(self._results_path, self._writer_channels, self._writer_control),
+            name="exam-hall-writer",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _replace_channel(self, slot: int) -> None:
+        # A worker killed while sending may have left half a message in its
+        # pipe, so its successor starts on a fresh one.
+        worker_end, writer_end = self._context.Pipe()
+        self._control.send(slot)
+        multiprocessing.reduction.send_handle(self._control, writer_end.fileno(), self._writer.pid)
+        self._worker_channels[slot].close()
+        self._writer_channels[slot].close()
+        self._worker_channels[slot] = worker_end
+        self._writer_channels[slot] = writer_end
+
+    def _start_worker(self, slot: int, listener: socket.socket) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                listener,
+                self._bank_path,
+                self._results_path,
+                self._journal_dir,
+                self._sessions_per_worker,
+                self._worker_channels[slot],
+            ),
+            name=f"exam-hall-worker-{slot + 1}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[slot] = process
+        self._started_at[slot] = time.monotonic()
+
+    def _stop(self) -> None:
+        workers = [process for process in self._workers if process is not None]
+        self._workers = [None] * self._worker_count
+        # Workers end their sessions and wait for their last scores to be
+        # committed, so the writer is stopped only after they have exited.
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        for process in workers:
+            process.join(SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if self._writer is not None:
+            self._control.send(None)
+            self._writer.join(SHUTDOWN_TIMEOUT)
+            if self._writer.is_alive():
+                self._writer.kill()
+                self._writer.join()
+            self._writer = None
+
+
+def _writer_main(results_path: str, channels: List[Connection], control: Connection) -> None:
+    # The writer stops when the supervisor says so, after the workers have
+    # handed in their last scores, or when the supervisor is gone.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    supervisor = os.getppid()
+    slots: List[Optional[Connection]] = list(channels)
+    store = ResultStore(results_path)
+    try:
+        while os.getppid() == supervisor:
+            ready = multiprocessing.connection.wait(
+                [*(channel for channel in slots if channel is not None), control],
+                SUPERVISOR_POLL_INTERVAL,
+            )
+            for channel in ready:
+                if channel is control:
+                    slot = control.recv()
+                    if slot is None:
+                        return
+                    if slots[slot] is not None:
+                        slots[slot].close()
+                    slots[slot] = Connection(multiprocessing.reduction.recv_handle(control))
+                    continue
+                if channel not in slots:
+                    # Replaced by a restarted worker's pipe in this round.
+                    continue
+                try:
+                    token, record, checkpoint = channel.recv()
+                except Exception:
+                    # A worker died mid-message or the pipe is otherwise
+                    # unreadable; it is dropped until the slot gets a new one.
+                    slots[slots.index(channel)] = None
+                    channel.close()
+                    continue
+                # ResultStore group-commits whatever queues up while the
+                # previous transaction is running.
+                future = store.submit(record, checkpoint=checkpoint)
+                future.add_done_callback(lambda done, channel=channel, token=token: _reply(channel, token, done))
+    finally:
+        store.close()
+
+
+def _reply(channel: Connection, token: Token, future: "Future[int]") -> None:
+    error = future.exception()
+    try:
+        if error is None:
+            channel.send((token, future.result(), None))
+        else:
+            channel.send((token, None, str(error)))
+    except OSError:
+        pass
+
+
+def _worker_main(
+    listener: socket.socket,
+    bank_path: Optional[str],
+    results_path: str,
+    journal_dir: str,
+    max_sessions: int,
+    channel: Connection,
+) -> None:
+    # Ctrl+C reaches the whole process group; only the supervisor acts on it
+    # and stops the workers with SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    bank = load_bank(bank_path)
+    store = RemoteResultStore(results_path, channel)
+    try:
+        adaptive_pool = AdaptivePool.from_bank(bank, store.question_stats())
+        exam_server = ExamServer(bank, store, adaptive_pool, JournalStore(journal_dir), max_sessions=max_sessions)
+        asyncio.run(_serve_worker(exam_server, listener, max_sessions))
+    finally:
+        store.close()
+
+
+async def _serve_worker(exam_server: ExamServer, listener: socket.socket, max_sessions: int) -> None:
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, AttributeError):
+        pass
+    listener.setblocking(False)
+    connections: Set["asyncio.Task[None]"] = set()
+    accepting = asyncio.create_task(_accept_loop(exam_server, listener, max_sessions, connections))
+    supervisor = os.getppid()
+    try:
+        # Without its supervisor nobody would restart or stop this worker.
+        while not stopped.is_set() and os.getppid() == supervisor:
+            try:
+                await asyncio.wait_for(stopped.wait(), SUPERVISOR_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        accepting.cancel()
+        await asyncio.gather(accepting, return_exceptions=True)
+        await exam_server.shutdown()
+        if connections:
+            await asyncio.gather(*connections, return_exceptions=True)
+
+
+async def _accept_loop(
+    exam_server: ExamServer,
+    listener: socket.socket,
+    max_sessions: int,
+    connections: Set["asyncio.Task[None]"],
+) -> None:
+    # A full worker stops accepting, so the connection stays in the shared
+    # backlog for a worker with a free seat instead of being turned away.
+    loop = asyncio.get_running_loop()
+    seats = asyncio.Semaphore(max_sessions)
+
+    def release(task: "asyncio.Task[None]") -> None:
+        connections.discard(task)
+        seats.release()
+
+    while True:
+        await seats.acquire()
+        try:
+            connection, _ = await loop.sock_accept(listener)
+        except OSError:
+            # The client gave up before it was accepted.
+            seats.release()
+            continue
+        task = asyncio.create_task(_handle_socket(exam_server, connection))
+        connections.add(task)
+        task.add_done_callback(release)
+
+
+async def _handle_socket(exam_server: ExamServer, connection: socket.socket) -> None:
+    try:
+        reader, writer = await asyncio.open_connection(sock=connection)
+    except OSError:
+        connection.close()
+        return
+    await exam_server.handle_connection(reader, writer)
+
+
+def run_hall(
+    bank_path: Optional[str] = None,
+    *,
+    bank: Optional[QuestionBank] = None,
+    results_path: Union[str, Path] = DEFAULT_RESULT_DB,
+    journal_dir: Union[str, Path] = DEFAULT_JOURNAL_DIR,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    sessions_per_worker: int = DEFAULT_SESSIONS_PER_WORKER,
+) -> None:
+    hall = ExamHall(
+        bank_path,
+        bank=bank,
+        results_path=results_path,
+        journal_dir=journal_dir,
+        host=host,
+        port=port,
+        unix_path=unix_path,
+        workers=workers,
+        sessions_per_worker=sessions_per_worker,
+    )
+    previous = signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        hall.serve_forever()
+    except KeyboardInterrupt:
+        print("\n考场已关闭。")
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def _interrupt(signum: int, frame: object) -> None:
+    raise KeyboardInterrupt
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Callable, List, Optional, Sequence, Set, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the owner's pid guards a journal.
+    fcntl = None  # type: ignore[assignment]
+
+DEFAULT_JOURNAL_DIR = Path(__file__).resolve().parent / "journals"
+JOURNAL_SUFFIX = ".journal"
+DEFAULT_SYNC_EVERY = 8
+DEFAULT_SYNC_INTERVAL = 2.0
+KIND_FIXED = "fixed"
+KIND_ADAPTIVE = "adaptive"
+
+
+@dataclass
+class JournalHeader:
+    candidate: str
+    title: str
+    kind: str
+    immediate_feedback: bool
+    started_at: datetime
+    question_ids: List[str] = field(default_factory=list)
+    pid: int = 0
+
+    def to_record(self) -> dict:
+        return {
+            "candidate": self.candidate,
+            "title": self.title,
+            "kind": self.kind,
+            "immediate_feedback": self.immediate_feedback,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "question_ids": self.question_ids,
+            "pid": self.pid,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "JournalHeader":
+        return cls(
+            candidate=str(record["candidate"]),
+            title=str(record["title"]),
+            kind=str(record.get("kind", KIND_FIXED)),
+            immediate_feedback=bool(record.get("immediate_feedback", False)),
+            started_at=datetime.fromisoformat(record["started_at"]),
+            question_ids=[str(question_id) for question_id in record.get("question_ids", ())],
+            pid=int(record.get("pid", 0)),
+        )
+
+
+@dataclass
+class JournalEntry:
+    position: int
+    question_id: str
+    selected_option: int
+
+
+@dataclass
+class InterruptedSession:
+    path: Path
+    header: JournalHeader
+    entries: List[JournalEntry]
+    valid_length: int
+    # Set once the session is claimed: the journal, open and locked, that
+    # the resumed session appends to.
+    journal: Optional["SessionJournal"] = None
+
+
+class SessionJournal:
+    def __init__(
+        self,
+        path: Path,
+        file: IO[bytes],
+        *,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        on_close: Optional[Callable[[Path], None]] = None,
+    ) -> None:
+        self._path = path
+        self._file: Optional[IO[bytes]] = file
+        self._sync_every = max(1, sync_every)
+        self._sync_interval = sync_interval
+        self._on_close = on_close
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def append(self, position: int, question_id: str, selected_option: int) -> None:
+        if self._file is None:
+            return
+        line = json.dumps({"p": position, "q": question_id, "s": selected_option}, ensure_ascii=False)
+        try:
+            # A flush per answer survives the process dying; the fsync that
+            # also survives power loss is batched.
+            self._file.write(line.encode("utf-8") + b"\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self._sync_every or time.monotonic() - self._last_sync >= self._sync_interval:
+                self.sync()
+        except OSError:
+            self._abandon()
+
+    def sync(self) -> None:
+        if self._file is None or not self._unsynced:
+            return
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, *, remove: bool = False) -> None:
+        file, self._file = self._file, None
+        if remove:
+            # Unlinked while still locked, so nobody can claim it in between.
+            try:
+                self._path.unlink()
+            except FileNotFoundError:
+                pass
+        if file is not None:
+            try:
+                if not remove and self._unsynced:
+                    file.flush()
+                    os.fsync(file.fileno())
+            except OSError:
+                pass
+            file.close()
+        if self._on_close is not None:
+            self._on_close(self._path)
+            self._on_close = None
+
+    def _abandon(self) -> None:
+        # Journaling is a safety net; a full disk must not end the exam.
+        try:
+            self.close()
+        except OSError:
+            pass
+
+
+class JournalStore:
+    def __init__(
+        self,
+        directory: Union[str, Path] = DEFAULT_JOURNAL_DIR,
+        *,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+    ) -> None:
+        self._directory = Path(directory)
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._active: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def start(
+        self,
+        *,
+        candidate: str,
+        title: str,
+        kind: str,
+        immediate_feedback: bool,
+        started_at: datetime,
+        question_ids: Sequence[str] = (),
+    ) -> SessionJournal:
+        header = JournalHeader(
+            candidate=candidate,
+            title=title,
+            kind=kind,
+            immediate_feedback=immediate_feedback,
+            started_at=started_at,
+            question_ids=list(question_ids),
+            pid=os.getpid(),
+        )
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            name = f"{started_at:%Y%m%d-%H%M%S}-{os.getpid()}-{next(self._counter)}{JOURNAL_SUFFIX}"
+            path = self._directory / name
+            self._active.add(path)
+        try:
+            file = path.open("xb")
+            _lock(file)
+            file.write(json.dumps(header.to_record(), ensure_ascii=False).encode("utf-8") + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        except OSError:
+            self._release(path)
+            raise
+        return self._open(path, file)
+
+    def interrupted(self, candidate: str) -> List[InterruptedSession]:
+        sessions: List[InterruptedSession] = []
+        try:
+            paths = sorted(self._directory.glob(f"*{JOURNAL_SUFFIX}"), reverse=True)
+        except OSError:
+            return sessions
+        for path in paths:
+            with self._lock:
+                if path in self._active:
+                    continue
+            try:
+                header = read_header(path)
+                # With file locks, claim() is what tells a live session apart.
+                if header.candidate != candidate or (fcntl is None and _owner_alive(header.pid)):
+                    continue
+                sessions.append(read_journal(path))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return sessions
+
+    def claim(self, session: InterruptedSession) -> InterruptedSession:
+        """Take over an interrupted session before offering it: the journal
+        is locked for this session alone and read again under the lock.
+        Raises RuntimeError when another session, in this process or in
+        another worker, got to it first."""
+        with self._lock:
+            if session.path in self._active:
+                raise RuntimeError("该答题记录正在被其他会话使用。")
+            self._active.add(session.path)
+        try:
+            file = session.path.open("r+b")
+        except OSError:
+            self._release(session.path)
+            raise
+        try:
+            if not _lock(file) or os.fstat(file.fileno()).st_ino != os.stat(session.path).st_ino:
+                raise RuntimeError("该答题记录正在被其他会话使用。")
+            claimed = read_journal(session.path)
+            # Drop a half-written final line before appending after it.
+            file.truncate(claimed.valid_length)
+            file.seek(claimed.valid_length)
+        except BaseException:
+            file.close()
+            self._release(session.path)
+            raise
+        claimed.journal = self._open(session.path, file)
+        return claimed
+
+    def _open(self, path: Path, file: IO[bytes]) -> SessionJournal:
+        return SessionJournal(
+            path,
+            file,
+            sync_every=self._sync_every,
+            sync_interval=self._sync_interval,
+            on_close=self._release,
+        )
+
+    def _release(self, path: Path) -> None:
+        with self._lock:
+            self._active.discard(path)
+
+
+def read_header(path: Union[str, Path]) -> JournalHeader:
+    with Path(path).open("rb") as file:
+        return JournalHeader.from_record(json.loads(file.readline()))
+
+
+def read_journal(path: Union[str, Path]) -> InterruptedSession:
+    path = Path(path)
+    with path.open("rb") as file:
+        header = JournalHeader.from_record(json.loads(file.readline()))
+        valid_length = file.tell()
+        entries: List[JournalEntry] = []
+        for raw in file:
+            entry = _parse_entry(raw)
+            if entry is None:
+                break
+            entries.append(entry)
+            valid_length += len(raw)
+    return InterruptedSession(path=path, header=header, entries=entries, valid_length=valid_length)
+
+
+def _parse_entry(raw: bytes) -> Optional[JournalEntry]:
+    if not raw.endswith(b"\n"):
+        return None
+    try:
+        record = json.loads(raw)
+        return JournalEntry(position=int(record["p"]), question_id=str(record["q"]), selected_option=int(record["s"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _lock(file: IO[bytes]) -> bool:
+    # The lock lives as long as the file is open, so a crashed session
+    # leaves nothing behind to clean up.
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _owner_alive(pid: int) -> bool:
+    # Sessions of this process are tracked in JournalStore._active. Probing
+    # other processes is only safe on POSIX: os.kill on Windows terminates.
+    if pid == os.getpid() or pid <= 0 or os.name != "posix":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import re
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from .results import AnswerRecord, RecordRejectedError, ResultStore, SessionRecord
+
+LEGACY_RECORD_FILE = Path(__file__).resolve().parent / "score_records.txt"
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+SEPARATOR = "-" * 50
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_COMMIT_EVERY = 1000
+
+_ANSWER_PATTERN = re.compile(r"^第(\d+)题：选择(\d+|未作答)，(正确|错误)；正确答案为(\d+)。$")
+_PROGRESS_PATTERN = re.compile(r"^(\d+)/(\d+)$")
+
+
+@dataclass
+class LegacyRecord:
+    start_offset: int
+    end_offset: int
+    finished_at: Optional[datetime] = None
+    candidate: str = "考生"
+    title: str = ""
+    answered_questions: int = 0
+    total_questions: int = 0
+    correct_answers: int = 0
+    answers: List[AnswerRecord] = field(default_factory=list)
+
+    def to_session(self) -> SessionRecord:
+        finished = self.finished_at or datetime.fromtimestamp(0)
+        return SessionRecord(
+            candidate=self.candidate,
+            title=self.title,
+            total_questions=self.total_questions,
+            answered_questions=self.answered_questions,
+            correct_answers=self.correct_answers,
+            started_at=finished,
+            finished_at=finished,
+            answers=self.answers,
+        )
+
+
+@dataclass
+class ImportResult:
+    imported: int
+    skipped: int
+    offset: int
+    rejected: List[str] = field(default_factory=list)
+
+
+def iter_legacy_records(path: Union[str, Path], start_offset: int = 0) -> Iterator[LegacyRecord]:
+    with Path(path).open("rb") as file:
+        file.seek(start_offset)
+        offset = start_offset
+        record: Optional[LegacyRecord] = None
+        for raw in file:
+            line_start = offset
+            offset += len(raw)
+            if not raw.endswith(b"\n"):
+                # A writer is still appending this line; leave it for next time.
+                return
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line == SEPARATOR:
+                if record is not None:
+                    record.end_offset = line_start
+                    yield record
+                record = LegacyRecord(start_offset=line_start, end_offset=offset)
+                continue
+            if record is None or not line:
+                continue
+            _apply_line(record, line)
+            record.end_offset = offset
+        if record is not None:
+            yield record
+
+
+def import_legacy(
+    store: ResultStore,
+    path: Union[str, Path] = LEGACY_RECORD_FILE,
+    checkpoint_name: Optional[str] = None,
+    *,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+) -> ImportResult:
+    # The byte offset reached is saved with each record, in the transaction
+    # that commits it, so an interrupted import resumes exactly after the last
+    # committed record. Blocks that cannot be stored are skipped and reported
+    # instead of stopping the import at the same place on every run.
+    path = Path(path)
+    name = checkpoint_name or f"legacy:{path.resolve()}"
+    offset = read_checkpoint(store, name, path)
+    result = ImportResult(imported=0, skipped=0, offset=offset)
+    pending: List[Tuple[LegacyRecord, "Future[int]"]] = []
+    for record in iter_legacy_records(path, offset):
+        offset = record.end_offset
+        problem = validate_record(record)
+        if problem is not None:
+            result.skipped += 1
+            result.rejected.append(f"偏移{record.start_offset}处的记录{problem}")
+            continue
+        pending.append((record, store.submit(record.to_session(), checkpoint=(name, offset))))
+        if len(pending) >= commit_every:
+            _wait_all(pending, result)
+    _wait_all(pending, result)
+    store.save_checkpoint(name, offset).result()
+    result.offset = offset
+    return result
+
+
+def validate_record(record: LegacyRecord) -> Optional[str]:
+    if record.finished_at is None:
+        return "缺少答题时间"
+    positions = set()
+    for answer in record.answers:
+        if answer.position in positions:
+            return f"第{answer.position}题重复出现"
+        positions.add(answer.position)
+    return None
+
+
+def read_checkpoint(store: ResultStore, name: str, path: Path) -> int:
+    offset = store.checkpoint(name)
+    if offset is None:
+        offset = _read_checkpoint_file(path.with_name(path.name + CHECKPOINT_SUFFIX), path)
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return 0
+    if offset > size:
+        # The record file was replaced or truncated; start over.
+        return 0
+    return offset
+
+
+def _read_checkpoint_file(checkpoint: Path, path: Path) -> int:
+    # Progress files written before checkpoints moved into the results
+    # database are still honoured once.
+    try:
+        data = json.loads(checkpoint.read_text(encoding="utf-8"))
+        offset = int(data["offset"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+    if data.get("path") != str(path.resolve()):
+        return 0
+    return offset
+
+
+def _wait_all(pending: List[Tuple[LegacyRecord, "Future[int]"]], result: ImportResult) -> None:
+    for record, future in pending:
+        try:
+            future.result()
+        except RecordRejectedError as error:
+            result.skipped += 1
+            result.rejected.append(f"偏移{record.start_offset}处的记录无法写入：{error}")
+        else:
+            result.imported += 1
+    pending.clear()
+
+
+def _apply_line(record: LegacyRecord, line: str) -> None:
+    key, separator, value = line.partition("：")
+    if not separator:
+        return
+    if key == "时间":
+        try:
+            record.finished_at = datetime.strptime(value, TIME_FORMAT)
+        except ValueError:
+            pass
+    elif key == "姓名":
+        record.candidate = value
+    elif key == "考试":
+        record.title = value
+    elif key == "作答":
+        match = _PROGRESS_PATTERN.match(value)
+        if match:
+            record.answered_questions = int(match.group(1))
+            record.total_questions = int(match.group(2))
+    elif key == "正确" and value.isdigit():
+        record.correct_answers = int(value)
+    else:
+        match = _ANSWER_PATTERN.match(line)
+        if match:
+            choice = match.group(2)
+            record.answers.append(
+                AnswerRecord(
+                    position=int(match.group(1)),
+                    question_id="",
+                    category="",
+                    selected_option=int(choice) - 1 if choice.isdigit() else None,
+                    correct_option=int(match.group(4)) - 1,
+                    is_correct=match.group(3) == "正确",
+                )
+            )
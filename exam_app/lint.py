@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import sqlite3
+import unicodedata
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from .columnar import COLUMNAR_SUFFIX, ColumnarError, ColumnarTable
+from .exam import OPTION_NUMBERS
+from .question_bank import JSONL_SUFFIXES, SQLITE_SUFFIXES, QuestionBankError, question_from_record, question_to_record
+from .questions import QUESTION_BANK, Question
+from .search import normalize_text
+
+SHINGLE_SIZE = 2
+SIGNATURE_SIZE = 64
+BAND_ROWS = 4
+HASH_PRIME = (1 << 31) - 1
+HASH_CHUNK = 1 << 16
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+DEFAULT_MIN_EXPLANATION_OVERLAP = 0.1
+MISMATCH_RATIO = 4.0
+MAX_BUCKET_PAIRS = 64
+RARE_GRAMS = 8
+ERROR = "error"
+WARNING = "warning"
+SEVERITY_LABELS = {ERROR: "错误", WARNING: "警告"}
+
+
+@dataclass
+class LintIssue:
+    severity: str
+    code: str
+    question_ids: List[str]
+    message: str
+    location: str = ""
+
+    def format(self) -> str:
+        where = f"（{self.location}）" if self.location else ""
+        return f"[{SEVERITY_LABELS[self.severity]}] {'、'.join(self.question_ids)}{where}：{self.message}"
+
+
+@dataclass
+class LintReport:
+    questions: int
+    issues: List[LintIssue] = field(default_factory=list)
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for issue in self.issues if issue.severity == ERROR)
+
+    @property
+    def warnings(self) -> int:
+        return sum(1 for issue in self.issues if issue.severity == WARNING)
+
+
+def lint_bank(
+    path: Optional[Union[str, Path]] = None,
+    *,
+    duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+    min_explanation_overlap: float = DEFAULT_MIN_EXPLANATION_OVERLAP,
+) -> LintReport:
+    return lint_records(
+        iter_bank_records(path),
+        duplicate_threshold=duplicate_threshold,
+        min_explanation_overlap=min_explanation_overlap,
+    )
+
+
+def lint_records(
+    records: Iterable[Tuple[str, Any]],
+    *,
+    duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+    min_explanation_overlap: float = DEFAULT_MIN_EXPLANATION_OVERLAP,
+) -> LintReport:
+    report = LintReport(questions=0)
+    questions: List[Question] = []
+    seen: Dict[str, str] = {}
+    for location, record in records:
+        report.questions += 1
+        try:
+            if not isinstance(record, Mapping):
+                raise QuestionBankError("不是有效的题目记录")
+            question = question_from_record(record)
+        except QuestionBankError as error:
+            question_id = str(record.get("id", "?")) if isinstance(record, Mapping) else "?"
+            report.issues.append(LintIssue(ERROR, "invalid-record", [question_id], str(error), location))
+            continue
+        first = seen.get(question.id)
+        if first is not None:
+            report.issues.append(
+                LintIssue(ERROR, "duplicate-id", [question.id], f"题目编号与{first}重复。", location)
+            )
+            continue
+        seen[question.id] = location
+        report.issues.extend(_structural_issues(question, location))
+        questions.append(question)
+    report.issues.extend(_near_duplicates(questions, duplicate_threshold))
+    report.issues.extend(_explanation_mismatches(questions, min_explanation_overlap))
+    return report
+
+
+def iter_bank_records(path: Optional[Union[str, Path]] = None) -> Iterator[Tuple[str, Any]]:
+    # Raw records rather than a QuestionBank: a bank with duplicate ids or
+    # broken lines does not load, and those are exactly what lint reports.
+    if path is None:
+        for index, question in enumerate(QUESTION_BANK, start=1):
+            yield f"内置题库第{index}题", question_to_record(question)
+        return
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in JSONL_SUFFIXES:
+        with path.open("r", encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield f"第{number}行", record
+        return
+    if suffix == COLUMNAR_SUFFIX:
+        try:
+            table = ColumnarTable(path)
+        except ColumnarError as error:
+            raise QuestionBankError(str(error)) from error
+        for row in range(len(table)):
+            yield f"第{row + 1}题", question_to_record(table.question(row))
+        return
+    if suffix in SQLITE_SUFFIXES:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(
+                "SELECT id, category, prompt, options, correct_option, explanation FROM questions ORDER BY position"
+            )
+            for number, row in enumerate(rows, start=1):
+                try:
+                    options = json.loads(row[3])
+                except ValueError:
+                    options = None
+                yield f"第{number}条记录", {
+                    "id": row[0],
+                    "category": row[1],
+                    "prompt": row[2],
+                    "options": options,
+                    "correct_option": row[4],
+                    "explanation": row[5],
+                }
+        finally:
+            connection.close()
+        return
+    raise QuestionBankError(f"无法识别的题库格式：{path}")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    # Chinese has no word boundaries, so overlapping character n-grams of
+    # the text with punctuation and spacing removed stand in for words.
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[index : index + size] for index in range(len(normalized) - size + 1)}
+
+
+def _structural_issues(question: Question, location: str) -> List[LintIssue]:
+    issues: List[LintIssue] = []
+
+    def report(severity: str, code: str, message: str) -> None:
+        issues.append(LintIssue(severity, code, [question.id], message, location))
+
+    if not question.prompt.strip():
+        report(ERROR, "empty-prompt", "题干为空。")
+    if not 2 <= len(question.options) <= len(OPTION_NUMBERS):
+        report(ERROR, "option-count", f"共有{len(question.options)}个选项，应为2到{len(OPTION_NUMBERS)}个。")
+    if not 0 <= question.correct_option < len(question.options):
+        report(ERROR, "answer-range", f"正确答案编号{question.correct_option}超出选项范围。")
+    if any(not option.strip() for option in question.options):
+        report(ERROR, "empty-option", "存在空白选项。")
+    normalized = [unicodedata.normalize("NFKC", option).strip().lower() for option in question.options]
+    if len(set(normalized)) != len(normalized):
+        report(WARNING, "duplicate-option", "存在内容相同的选项。")
+    if not question.explanation.strip():
+        report(WARNING, "empty-explanation", "缺少解析。")
+    return issues
+
+
+def _near_duplicates(questions: Sequence[Question], threshold: float) -> List[LintIssue]:
+    sets = [shingles(question.prompt) for question in questions]
+    usable = [index for index, grams in enumerate(sets) if grams]
+    if len(usable) < 2:
+        return []
+    np = _require_numpy()
+    signatures = _minhash(np, [sets[index] for index in usable])
+    parents = list(range(len(questions)))
+    similarity: Dict[int, float] = {}
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for first, second in _candidate_pairs(np, signatures):
+        left, right = usable[first], usable[second]
+        score = _jaccard(sets[left], sets[right])
+        if score < threshold:
+            continue
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parents[root_right] = root_left
+            similarity[root_left] = min(score, similarity.get(root_left, 1.0), similarity.pop(root_right, 1.0))
+    groups: Dict[int, List[str]] = {}
+    for index in range(len(questions)):
+        root = find(index)
+        if root != index or root in similarity:
+            groups.setdefault(root, []).append(questions[index].id)
+    return [
+        LintIssue(
+            WARNING,
+            "near-duplicate",
+            ids,
+            f"题干高度相似（相似度不低于{similarity[root]:.2f}），可能是重复题目。",
+        )
+        for root, ids in groups.items()
+        if len(ids) > 1
+    ]
+
+
+def _minhash(np: Any, sets: Sequence[Set[str]]) -> Any:
+    rng = random.Random(0)
+    multipliers = np.asarray([rng.randrange(1, HASH_PRIME) for _ in range(SIGNATURE_SIZE)], dtype=np.int64)
+    increments = np.asarray([rng.randrange(0, HASH_PRIME) for _ in range(SIGNATURE_SIZE)], dtype=np.int64)
+    lengths = np.asarray([len(grams) for grams in sets], dtype=np.int64)
+    values = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % HASH_PRIME for grams in sets for gram in grams),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    signatures = np.empty((len(sets), SIGNATURE_SIZE), dtype=np.int64)
+    # All permutations are applied to every n-gram at once, a batch of
+    # questions at a time, and reduced to per-question minimums.
+    start = 0
+    while start < len(sets):
+        stop = start + 1
+        while stop < len(sets) and offsets[stop] - offsets[start] < HASH_CHUNK:
+            stop += 1
+        end = offsets[stop] if stop < len(sets) else len(values)
+        hashed = (values[offsets[start] : end, None] * multipliers + increments) % HASH_PRIME
+        signatures[start:stop] = np.minimum.reduceat(hashed, offsets[start:stop] - offsets[start], axis=0)
+        start = stop
+    return signatures
+
+
+def _candidate_pairs(np: Any, signatures: Any) -> Set[Tuple[int, int]]:
+    # Locality-sensitive hashing: questions that agree on every row of some
+    # band land in the same bucket and become candidates, so only similar
+    # prompts are ever compared.
+    pairs: Set[Tuple[int, int]] = set()
+    for start in range(0, SIGNATURE_SIZE, BAND_ROWS):
+        band = np.ascontiguousarray(signatures[:, start : start + BAND_ROWS])
+        keys = band.view(np.dtype((np.void, band.dtype.itemsize * band.shape[1]))).ravel()
+        _, buckets = np.unique(keys, return_inverse=True)
+        buckets = buckets.ravel()
+        shared = np.flatnonzero(np.bincount(buckets)[buckets] > 1)
+        order = shared[np.argsort(buckets[shared], kind="stable")]
+        sorted_buckets = buckets[order]
+        boundaries = np.flatnonzero(np.diff(sorted_buckets)) + 1
+        for members in np.split(order, boundaries):
+            if len(members) < 2:
+                continue
+            members = members.tolist()
+            if len(members) * (len(members) - 1) // 2 <= MAX_BUCKET_PAIRS:
+                pairs.update((a, b) for position, a in enumerate(members) for b in members[position + 1 :])
+            else:
+                # A huge bucket is one big cluster; linking each member to
+                # the first keeps the work linear.
+                pairs.update((members[0], other) for other in members[1:])
+    return pairs
+
+
+def _explanation_mismatches(questions: Sequence[Question], min_overlap: float) -> List[LintIssue]:
+    contexts = [shingles(" ".join([question.prompt, *question.options])) for question in questions]
+    frequency: Counter = Counter(gram for grams in contexts for gram in grams)
+    scale = len(questions)
+    weights: Dict[str, float] = {}
+
+    def weigh(grams: Set[str]) -> Dict[str, float]:
+        for gram in grams:
+            if gram not in weights:
+                weights[gram] = math.log(1 + scale / (1 + frequency.get(gram, 0)))
+        return {gram: weights[gram] for gram in grams}
+
+    def overlap(explanation: Dict[str, float], mass: float, candidate: int) -> float:
+        context = contexts[candidate]
+        return sum(value for gram, value in explanation.items() if gram in context) / mass
+
+    suspects: List[Tuple[int, Dict[str, float], float, float, List[str]]] = []
+    for index, question in enumerate(questions):
+        grams = shingles(question.explanation)
+        if not grams:
+            continue
+        explanation = weigh(grams)
+        mass = sum(explanation.values())
+        own = overlap(explanation, mass, index)
+        if own < min_overlap:
+            rare = sorted((gram for gram in grams if 0 < frequency[gram] <= RARE_GRAMS), key=frequency.__getitem__)
+            suspects.append((index, explanation, mass, own, rare[:RARE_GRAMS]))
+    # Explanations paraphrase, so a low score alone is weak evidence. The
+    # strong signal is another question that fits far better; only questions
+    # sharing one of the explanation's rarest n-grams can be that question.
+    wanted = {gram for *_, rare in suspects for gram in rare}
+    postings: Dict[str, List[int]] = {}
+    if wanted:
+        for index, grams in enumerate(contexts):
+            for gram in wanted.intersection(grams):
+                postings.setdefault(gram, []).append(index)
+    issues: List[LintIssue] = []
+    for index, explanation, mass, own, rare in suspects:
+        candidates = {other for gram in rare for other in postings.get(gram, ()) if other != index}
+        scores = {other: overlap(explanation, mass, other) for other in candidates}
+        best = max(scores, key=scores.__getitem__, default=None)
+        if best is not None and scores[best] >= max(2 * min_overlap, MISMATCH_RATIO * own):
+            message = f"解析与本题关联度很低（{own:.2f}），更像是{questions[best].id}的解析（{scores[best]:.2f}）。"
+        elif own == 0:
+            message = "解析与题干和选项没有任何共同内容。"
+        else:
+            continue
+        issues.append(LintIssue(WARNING, "explanation-mismatch", [questions[index].id], message))
+    return issues
+
+
+def _jaccard(left: Set[str], right: Set[str]) -> float:
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+
+def _require_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise RuntimeError("题库检查需要安装 numpy 库：pip install numpy") from None
+    return numpy
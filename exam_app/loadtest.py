@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import gc
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from .adaptive import AdaptivePool
+from .bench import ANSWER_PROMPT, TimedExamEngine, percentile
+from .console import ScriptedIO
+from .exam import OPTION_NUMBERS
+from .journal import JournalStore
+from .question_bank import QuestionBank
+from .questions import Category
+from .results import ResultStore
+from .tts import FakeTextToSpeech
+
+DEFAULT_CANDIDATES = (10, 50, 100)
+DEFAULT_THINK_MEDIAN = 5.0
+DEFAULT_THINK_SIGMA = 0.8
+DEFAULT_TIME_SCALE = 1.0
+MEMORY_SAMPLE_INTERVAL = 0.05
+SPEECH_SHUTDOWN_TIMEOUT = 5.0
+
+
+@dataclass
+class LoadStepResult:
+    candidates: int
+    seconds: float
+    questions: int
+    questions_per_second: float
+    turnaround_p50_ms: float
+    turnaround_p99_ms: float
+    save_p50_ms: float
+    save_p99_ms: float
+    memory_per_session_kb: float
+    errors: int
+
+
+class VirtualCandidateIO(ScriptedIO):
+    """Plays a script like ScriptedIO, but pauses before each answer for a
+    sampled think time and records how long the engine took to present the
+    next question after the previous answer."""
+
+    def __init__(self, inputs: Iterator[str], think: Callable[[], float]) -> None:
+        super().__init__(inputs)
+        self._think = think
+        self._answered_at: Optional[float] = None
+        self.answers = 0
+        self.turnaround: List[float] = []
+
+    def read(self, prompt: str) -> str:
+        if prompt == ANSWER_PROMPT:
+            if self._answered_at is not None:
+                self.turnaround.append(time.perf_counter() - self._answered_at)
+            time.sleep(self._think())
+        value = super().read(prompt)
+        self._answered_at = None
+        if prompt == ANSWER_PROMPT:
+            self.answers += 1
+            self._answered_at = time.perf_counter()
+        return value
+
+
+def candidate_script(bank: QuestionBank, name: str, rng: random.Random, questions: Optional[int]) -> Iterator[str]:
+    # A full exam by default; with a question count, a practice round of
+    # that size in a random subject, which suits banks too large to sit.
+    choices = OPTION_NUMBERS[: min(len(question.options) for question in bank)]
+    yield name
+    if questions is None:
+        yield "1"
+        count = len(bank)
+    else:
+        categories = [category for category in Category if bank.count_for_category(category)]
+        category = rng.choice(categories)
+        yield "2"
+        yield str(list(Category).index(category) + 1)
+        yield str(questions)
+        count = min(questions, bank.count_for_category(category))
+    for _ in range(count):
+        yield rng.choice(choices)
+    yield "Q"
+
+
+def run_load_step(
+    bank: QuestionBank,
+    candidates: int,
+    *,
+    store: ResultStore,
+    journals: JournalStore,
+    adaptive_pool: Optional[AdaptivePool] = None,
+    think_median: float = DEFAULT_THINK_MEDIAN,
+    think_sigma: float = DEFAULT_THINK_SIGMA,
+    time_scale: float = DEFAULT_TIME_SCALE,
+    speech_delay: float = 0.0,
+    questions: Optional[int] = None,
+    seed: int = 0,
+) -> LoadStepResult:
+    """Run ``candidates`` concurrent sessions, one thread each as in the
+    exam server, and measure them. Think times are log-normal around
+    ``think_median`` seconds; ``time_scale`` shrinks them for quick runs."""
+    rng = random.Random(seed)
+    think_mu = math.log(max(think_median, 1e-6))
+    ramp = think_median * time_scale
+    # Measured from before the sessions are built, so their engines and
+    # speech workers count towards the memory per session.
+    gc.collect()
+    baseline = current_rss()
+    sessions: List[_VirtualSession] = []
+    for index in range(candidates):
+        candidate_rng = random.Random(rng.random())
+        io = VirtualCandidateIO(
+            candidate_script(bank, f"虚拟考生{seed}-{index + 1}", candidate_rng, questions),
+            lambda candidate_rng=candidate_rng: candidate_rng.lognormvariate(think_mu, think_sigma) * time_scale,
+        )
+        speaker = FakeTextToSpeech(speech_delay)
+        engine = TimedExamEngine(bank, speaker, io, store, adaptive_pool, journals)
+        # Arrivals are spread over one think time rather than all at once.
+        sessions.append(_VirtualSession(engine, io, speaker, rng.uniform(0.0, ramp)))
+    monitor = _PeakMonitor(baseline)
+    started = time.perf_counter()
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    seconds = time.perf_counter() - started
+    peak = monitor.stop()
+    turnaround = [value for session in sessions for value in session.io.turnaround]
+    saves = [value for session in sessions for value in session.engine.save_seconds]
+    answered = sum(session.io.answers for session in sessions)
+    return LoadStepResult(
+        candidates=candidates,
+        seconds=seconds,
+        questions=answered,
+        questions_per_second=answered / seconds if seconds > 0 else 0.0,
+        turnaround_p50_ms=percentile(turnaround, 0.50) * 1000,
+        turnaround_p99_ms=percentile(turnaround, 0.99) * 1000,
+        save_p50_ms=percentile(saves, 0.50) * 1000,
+        save_p99_ms=percentile(saves, 0.99) * 1000,
+        memory_per_session_kb=max(0, peak - baseline) / 1024 / max(1, candidates),
+        errors=sum(1 for session in sessions if session.error is not None),
+    )
+
+
+def run_load_test(
+    bank: QuestionBank,
+    steps: Sequence[int] = DEFAULT_CANDIDATES,
+    *,
+    think_median: float = DEFAULT_THINK_MEDIAN,
+    think_sigma: float = DEFAULT_THINK_SIGMA,
+    time_scale: float = DEFAULT_TIME_SCALE,
+    speech_delay: float = 0.0,
+    questions: Optional[int] = None,
+    seed: int = 0,
+    report: Optional[Callable[[LoadStepResult], None]] = None,
+) -> List[LoadStepResult]:
+    results: List[LoadStepResult] = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultStore(Path(directory) / "loadtest.sqlite3")
+        journals = JournalStore(Path(directory) / "journals")
+        # Shared by every session, as in the exam server.
+        adaptive_pool = AdaptivePool.from_bank(bank)
+        try:
+            for step, candidates in enumerate(steps):
+                result = run_load_step(
+                    bank,
+                    candidates,
+                    store=store,
+                    journals=journals,
+                    adaptive_pool=adaptive_pool,
+                    think_median=think_median,
+                    think_sigma=think_sigma,
+                    time_scale=time_scale,
+                    speech_delay=speech_delay,
+                    questions=questions,
+                    seed=seed + step,
+                )
+                results.append(result)
+                if report is not None:
+                    report(result)
+        finally:
+            store.close()
+    return results
+
+
+def format_load_header() -> str:
+    return (
+        f"{'sessions':>8} {'seconds':>8} {'answers':>8} {'q/s':>8} {'p50 ms':>9} {'p99 ms':>9}"
+        f" {'save p50':>9} {'save p99':>9} {'KB/session':>10} {'errors':>6}"
+    )
+
+
+def format_load_step(result: LoadStepResult) -> str:
+    return (
+        f"{result.candidates:>8} {result.seconds:>8.1f} {result.questions:>8} {result.questions_per_second:>8.1f}"
+        f" {result.turnaround_p50_ms:>9.3f} {result.turnaround_p99_ms:>9.3f}"
+        f" {result.save_p50_ms:>9.3f} {result.save_p99_ms:>9.3f}"
+        f" {result.memory_per_session_kb:>10.1f} {result.errors:>6}"
+    )
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes, or 0 where unknown."""
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Peak rather than current size, in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class _VirtualSession:
+    def __init__(self, engine: TimedExamEngine, io: VirtualCandidateIO, speaker: FakeTextToSpeech, delay: float):
+        self.engine = engine
+        self.io = io
+        self.speaker = speaker
+        self.error: Optional[BaseException] = None
+        self._delay = delay
+        self._thread = threading.Thread(target=self._run, name="virtual-candidate", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def join(self) -> None:
+        self._thread.join()
+
+    def _run(self) -> None:
+        time.sleep(self._delay)
+        try:
+            self.engine.run()
+        except EOFError:
+            pass
+        except Exception as error:
+            self.error = error
+        finally:
+            self.speaker.close(timeout=SPEECH_SHUTDOWN_TIMEOUT)
+
+
+class _PeakMonitor:
+    def __init__(self, baseline: int) -> None:
+        self.peak = baseline
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stopped.set()
+        self._thread.join()
+        return self.peak
+
+    def _run(self) -> None:
+        while not self._stopped.wait(MEMORY_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss())
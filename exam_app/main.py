@@ -1,29 +1,416 @@
 from __future__ import annotations
 
+import argparse
+import json
+import math
+import sqlite3
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence
+
 if __package__ in (None, ""):
     import os
     import sys
 
-    current_directory = os.path.dirname(os.path.abspath(__file__))
-    if current_directory not in sys.path:
-        sys.path.insert(0, current_directory)
+    # Run as a script: import the sibling modules as the package they belong
+    # to, so that relative imports work here and inside the modules.
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if package_parent not in sys.path:
+        sys.path.insert(0, package_parent)
+    __package__ = "exam_app"
+
+# Only what the interactive exam needs is imported up front; each subcommand
+# imports its own modules, so starting an exam does not pay for asyncio,
+# multiprocessing pools or NumPy.
+from .audio_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, AudioCache
+from .exam import build_exam_engine, spoken_phrases
+from .journal import DEFAULT_JOURNAL_DIR, JournalStore
+from .metrics import MetricsExporter
+from .question_bank import QuestionBank, QuestionBankError, load_bank, parse_category, write_jsonl, write_sqlite
+from .questions import Category
+from .results import DEFAULT_RESULT_DB, ResultStore
+from .search import DEFAULT_SEARCH_LIMIT, search_index_for
+from .tts import PROCESS_BACKEND, SPEECH_BACKENDS, build_tts
+
+if TYPE_CHECKING:
+    from .papers import PaperSpec
+
+SPEECH_SHUTDOWN_TIMEOUT = 2.0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="exam_app", description="盲人大学生计算机基础无障碍考试系统")
+    parser.add_argument("--bank", help="外部题库文件（.jsonl、SQLite 或 .qcol 列式文件），默认使用内置题库")
+    parser.add_argument("--results", default=str(DEFAULT_RESULT_DB), help="成绩数据库路径")
+    parser.add_argument("--journal-dir", default=str(DEFAULT_JOURNAL_DIR), help="答题过程日志目录，用于意外中断后继续作答")
+    parser.add_argument("--metrics-file", help="定期写入 Prometheus 文本格式性能指标的文件路径")
+    parser.add_argument("--metrics-port", type=int, help="在本机该端口的 /metrics 地址提供性能指标")
+    parser.add_argument(
+        "--speech-backend",
+        choices=sorted(SPEECH_BACKENDS),
+        default=PROCESS_BACKEND,
+        help="语音合成方式：process 在独立进程中运行 pyttsx3，出错后自动重启；inline 在本进程中运行",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    serve = subparsers.add_parser("serve", help="启动多考生并发的考试服务")
+    serve.add_argument("--host", help="监听地址")
+    serve.add_argument("--port", type=int, help="监听端口")
+    serve.add_argument("--unix", dest="unix_path", help="改用Unix套接字路径监听")
+    serve.add_argument("--max-sessions", type=int, help="同时进行的最大考生会话数")
+    hall = subparsers.add_parser("hall", help="以多进程方式启动考场服务，工作进程崩溃后自动重启")
+    hall.add_argument("--host", help="监听地址")
+    hall.add_argument("--port", type=int, help="监听端口")
+    hall.add_argument("--unix", dest="unix_path", help="改用Unix套接字路径监听")
+    hall.add_argument("--workers", type=int, help="工作进程数，默认等于CPU核数")
+    hall.add_argument("--sessions-per-worker", type=int, help="每个工作进程同时接待的最大考生数")
+    prewarm = subparsers.add_parser("prewarm", help="预先合成菜单与题库语音并写入缓存")
+    prewarm.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="语音缓存目录")
+    prewarm.add_argument(
+        "--max-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="语音缓存容量上限（MB）",
+    )
+    analyze = subparsers.add_parser("analyze", help="对成绩数据库中的作答记录进行题目质量分析")
+    analyze.add_argument("--items-csv", default="item_analysis.csv", help="逐题统计结果的CSV输出路径")
+    analyze.add_argument("--categories-csv", default="category_analysis.csv", help="各科目信度的CSV输出路径")
+    report = subparsers.add_parser("report", help="为成绩数据库中的每场答题生成无障碍成绩报告与班级分科目汇总")
+    report.add_argument("output", help="报告输出目录")
+    report.add_argument("--title", help="只为指定名称的考试生成报告")
+    report.add_argument("--formats", help="报告格式，以逗号分隔，可选 text、csv、html")
+    report.add_argument("--workers", type=int, help="并行生成报告的进程数，默认与CPU核数相同")
+    report.add_argument("--chunk-size", type=int, help="每个进程每批处理的答题记录数")
+    legacy = subparsers.add_parser("import-legacy", help="增量导入旧版 score_records.txt 成绩记录")
+    legacy.add_argument("source", nargs="?", help="旧版成绩记录文本文件")
+    legacy.add_argument("--checkpoint", help="成绩数据库中记录导入进度所用的名称，默认按源文件路径区分")
+    grade = subparsers.add_parser("grade", help="按题库答案批量评阅纸质或其他系统的答题卡")
+    grade.add_argument("sheets", help="答题卡文件（.csv 或 .jsonl）")
+    grade.add_argument("--title", help="答题卡未注明考试名称时使用的名称")
+    grade.add_argument("--chunk-size", type=int, help="每批评阅的答题卡数量")
+    papers = subparsers.add_parser("generate-papers", help="批量生成符合科目配额与难度要求的试卷")
+    papers.add_argument("output", help="试卷输出文件（JSON Lines）")
+    papers.add_argument("--count", type=int, default=100, help="生成试卷的份数")
+    papers.add_argument("--seed", default="0", help="随机种子，相同种子生成相同的试卷")
+    papers.add_argument("--per-category", type=int, default=4, help="未单独指定配额的科目每卷题数")
+    papers.add_argument(
+        "--quota",
+        action="append",
+        default=[],
+        metavar="科目=题数",
+        help="单独指定某个科目的题数，例如 --quota Word操作=5，可重复使用",
+    )
+    papers.add_argument("--difficulty", type=float, help="每卷平均难度的目标值")
+    papers.add_argument("--tolerance", type=float, help="平均难度允许的偏差")
+    papers.add_argument("--max-overlap", type=float, help="相邻座位试卷在每个科目中允许重复的题目比例")
+    sit = subparsers.add_parser("sit-paper", help="使用预先生成的试卷进行考试")
+    sit.add_argument("papers", help="generate-papers 生成的试卷文件")
+    sit.add_argument("--seat", type=int, required=True, help="座位号，即试卷编号")
+    bench = subparsers.add_parser("bench", help="使用模拟考生与模拟语音测量考试引擎的性能")
+    bench.add_argument("--sizes", type=int, nargs="+", help="参与测试的模拟题库规模")
+    bench.add_argument("--speech-delay", type=float, default=0.0, help="模拟语音每条播报耗时（秒）")
+    bench.add_argument("--repeat", type=int, help="每种题库规模重复完整考试的次数")
+    bench.add_argument("--json", dest="json_path", help="将测试结果另存为JSON文件，便于比较")
+    bench.add_argument("--startup", action="store_true", help="改为测量程序启动到首屏输出的耗时")
+    bench.add_argument("--init-delay", type=float, help="启动测试中使用模拟语音引擎，并模拟其初始化耗时（秒）；默认使用真实的 pyttsx3")
+    loadtest = subparsers.add_parser("loadtest", help="模拟多名考生同时答题，测量考试服务在不同并发规模下的表现")
+    loadtest.add_argument("--candidates", type=int, nargs="+", help="依次测试的同时在线考生人数")
+    loadtest.add_argument("--think-median", type=float, help="模拟考生每题思考时间的中位数（秒）")
+    loadtest.add_argument("--think-sigma", type=float, help="思考时间对数正态分布的离散程度")
+    loadtest.add_argument("--time-scale", type=float, help="思考时间的缩放系数，小于1可加快测试，但相应放大每名考生的负载")
+    loadtest.add_argument("--speech-delay", type=float, default=0.0, help="模拟语音每条播报耗时（秒）")
+    loadtest.add_argument("--questions", type=int, help="每名考生随机选一个科目练习的题数；默认参加完整考试")
+    loadtest.add_argument("--json", dest="json_path", help="将测试结果另存为JSON文件，便于比较")
+    lint = subparsers.add_parser("lint-bank", help="检查题库中的格式错误、近似重复题目与解析不符的题目")
+    lint.add_argument("--threshold", type=float, help="判定题干近似重复的相似度下限（0到1）")
+    lint.add_argument("--min-explanation-overlap", type=float, help="解析与题目内容关联度低于该值时进一步检查是否张冠李戴")
+    search = subparsers.add_parser("search", help="按关键词检索题库中的题目")
+    search.add_argument("query", help="检索关键词")
+    search.add_argument("--limit", type=int, default=DEFAULT_SEARCH_LIMIT, help="最多列出的题目数量")
+    export = subparsers.add_parser("export-bank", help="将当前题库导出为 .jsonl 或 SQLite 文件")
+    export.add_argument("output", help="导出文件路径，按扩展名选择格式")
+    return parser
+
+
+def build_paper_spec(args: argparse.Namespace) -> PaperSpec:
+    from .papers import PaperGenerationError, PaperSpec
+
+    quotas = {category: args.per_category for category in Category}
+    for item in args.quota:
+        name, separator, amount = item.partition("=")
+        if not separator or not amount.strip().isdigit():
+            raise PaperGenerationError(f"无法识别的科目配额：{item}")
+        try:
+            quotas[parse_category(name.strip())] = int(amount)
+        except QuestionBankError as error:
+            raise PaperGenerationError(str(error)) from None
+    return PaperSpec(
+        quotas=quotas,
+        target_difficulty=args.difficulty,
+        **given_options(args, tolerance="tolerance", max_overlap="max_overlap"),
+    )
+
+
+def given_options(args: argparse.Namespace, **names: str) -> Dict[str, Any]:
+    # Keyword arguments for the options given on the command line; the rest
+    # keep the defaults of the function they are passed to, so the parser
+    # can be built without importing every subcommand's module.
+    return {keyword: getattr(args, name) for keyword, name in names.items() if getattr(args, name) is not None}
+
+
+def start_metrics(args: argparse.Namespace) -> Optional[MetricsExporter]:
+    if not args.metrics_file and args.metrics_port is None:
+        return None
+    return MetricsExporter(textfile=args.metrics_file, port=args.metrics_port).start()
+
+
+def export_bank(bank: QuestionBank, output: str) -> None:
+    from .columnar import COLUMNAR_SUFFIX, write_columnar
+
+    if output.lower().endswith((".db", ".sqlite", ".sqlite3")):
+        count = write_sqlite(bank, output)
+    elif output.lower().endswith(COLUMNAR_SUFFIX):
+        count = write_columnar(bank, output)
+    else:
+        count = write_jsonl(bank, output)
+    print(f"已导出{count}道题到 {output}。")
+
+
+def analyze_results(results_path: str, items_csv: str, categories_csv: str) -> None:
+    from .analytics import analyze, load_responses, write_category_csv, write_item_csv
+
+    store = ResultStore(results_path)
+    try:
+        analysis = analyze(load_responses(store))
+    finally:
+        store.close()
+    write_item_csv(analysis, items_csv)
+    write_category_csv(analysis, categories_csv)
+    print(f"共分析{analysis.candidates}场答题、{analysis.responses}条作答、{len(analysis.items)}道题。")
+    for category in analysis.categories:
+        alpha = "无法计算" if math.isnan(category.alpha) else f"{category.alpha:.3f}"
+        print(f"{category.category}：{category.items}道题，完整作答{category.complete_candidates}场，信度系数{alpha}")
+    print(f"逐题统计已写入 {items_csv}，科目信度已写入 {categories_csv}。")
+
+
+def prewarm_audio(bank: QuestionBank, cache_dir: str, max_mb: int, backend: str = PROCESS_BACKEND) -> None:
+    cache = AudioCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
+    speaker = build_tts(cache, backend=backend)
+    try:
+        if not speaker.wait_ready():
+            print("未检测到pyttsx3语音库，无法预先合成语音。")
+            return
+        rendered = speaker.prewarm(spoken_phrases(bank))
+        print(f"已合成{rendered}条语音，缓存中共{len(cache)}条，占用{cache.total_bytes // 1024}KB。")
+    finally:
+        speaker.close()
+
+
+def run_lint(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    from .lint import lint_bank
+
+    try:
+        report = lint_bank(
+            args.bank,
+            **given_options(args, duplicate_threshold="threshold", min_explanation_overlap="min_explanation_overlap"),
+        )
+    except (OSError, sqlite3.Error, QuestionBankError, RuntimeError) as error:
+        parser.exit(1, f"无法检查题库：{error}\n")
+    for issue in report.issues:
+        print(issue.format())
+    print(f"共检查{report.questions}道题，发现{report.errors}个错误、{report.warnings}个警告。")
+    if report.errors:
+        parser.exit(1)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "lint-bank":
+        # Checked before loading: a bank with duplicate ids does not load.
+        run_lint(parser, args)
+        return
+    try:
+        bank = load_bank(args.bank)
+    except (OSError, QuestionBankError) as error:
+        parser.error(f"无法加载题库：{error}")
+    if args.command == "serve":
+        from .server import run_server
+
+        exporter = start_metrics(args)
+        try:
+            run_server(
+                bank=bank,
+                results_path=args.results,
+                journal_dir=args.journal_dir,
+                unix_path=args.unix_path,
+                **given_options(args, host="host", port="port", max_sessions="max_sessions"),
+            )
+        finally:
+            if exporter is not None:
+                exporter.close()
+        return
+    if args.command == "hall":
+        from .hall import run_hall
+
+        try:
+            run_hall(
+                args.bank,
+                bank=bank,
+                results_path=args.results,
+                journal_dir=args.journal_dir,
+                unix_path=args.unix_path,
+                workers=args.workers,
+                **given_options(args, host="host", port="port", sessions_per_worker="sessions_per_worker"),
+            )
+        except OSError as error:
+            parser.error(f"无法启动考场：{error}")
+        return
+    if args.command == "prewarm":
+        prewarm_audio(bank, args.cache_dir, args.max_mb, args.speech_backend)
+        return
+    if args.command == "analyze":
+        try:
+            analyze_results(args.results, args.items_csv, args.categories_csv)
+        except RuntimeError as error:
+            parser.exit(1, f"{error}\n")
+        return
+    if args.command == "report":
+        from .reports import generate_reports
+
+        options = given_options(args, chunk_size="chunk_size")
+        if args.formats is not None:
+            options["formats"] = [name.strip() for name in args.formats.split(",") if name.strip()]
+        try:
+            generated = generate_reports(
+                args.results,
+                args.output,
+                bank_path=args.bank,
+                title=args.title,
+                workers=args.workers,
+                **options,
+            )
+        except (OSError, ValueError) as error:
+            parser.exit(1, f"生成成绩报告失败：{error}\n")
+        print(f"已生成{generated.sessions}份成绩报告，保存到 {args.output}。")
+        for item in generated.categories:
+            print(f"{item.category}：作答{item.answered}题，答对{item.correct}题，正确率约为{round(item.accuracy * 100)}%。")
+        return
+    if args.command == "import-legacy":
+        from .legacy import import_legacy
+
+        store = ResultStore(args.results)
+        try:
+            outcome = import_legacy(store, checkpoint_name=args.checkpoint, **given_options(args, path="source"))
+        except (OSError, sqlite3.Error) as error:
+            parser.exit(1, f"无法导入旧版成绩记录：{error}\n")
+        finally:
+            store.close()
+        for problem in outcome.rejected:
+            print(f"已跳过{problem}。")
+        print(f"新导入{outcome.imported}条记录，跳过{outcome.skipped}条无法识别的记录。")
+        return
+    if args.command == "grade":
+        from .grading import GradingError, grade_file
+
+        store = ResultStore(args.results)
+        try:
+            graded = grade_file(store, args.sheets, bank, **given_options(args, title="title", chunk_size="chunk_size"))
+        except (OSError, GradingError, RuntimeError) as error:
+            parser.exit(1, f"批量阅卷失败：{error}\n")
+        finally:
+            store.close()
+        print(
+            f"已评阅{graded.graded}份答题卡，跳过{graded.skipped}份无法识别的答题卡；"
+            f"共{graded.answers}道题，答对率{graded.accuracy * 100:.1f}%。"
+        )
+        return
+    if args.command == "generate-papers":
+        from .papers import PaperGenerationError, generate_papers, write_papers
+
+        try:
+            count = write_papers(generate_papers(bank, build_paper_spec(args), args.count, seed=args.seed), args.output)
+        except PaperGenerationError as error:
+            parser.exit(1, f"{error}\n")
+        print(f"已生成{count}份试卷，保存到 {args.output}。")
+        return
+    if args.command == "sit-paper":
+        from .papers import load_paper
 
-    from exam import build_exam_engine
-    from tts import build_tts
-else:
-    from .exam import build_exam_engine
-    from .tts import build_tts
+        try:
+            paper = load_paper(args.papers, args.seat)
+        except (OSError, ValueError) as error:
+            parser.exit(1, f"无法读取试卷：{error}\n")
+        missing = [question_id for question_id in paper.question_ids if question_id not in bank]
+        if missing:
+            parser.exit(1, f"试卷中的题目不在当前题库中：{'、'.join(missing[:5])}\n")
+    if args.command == "bench":
+        from .bench import format_report, format_startup_report, run_benchmarks, run_startup_benchmark
 
+        if args.startup:
+            startup = run_startup_benchmark(init_delay=args.init_delay)
+            print(format_startup_report(startup))
+            records = [asdict(startup)]
+        else:
+            options = given_options(args, sizes="sizes", repeat="repeat")
+            results = run_benchmarks(speech_delay=args.speech_delay, **options)
+            print(format_report(results))
+            records = [asdict(result) for result in results]
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as file:
+                json.dump(records, file, ensure_ascii=False, indent=2)
+        return
+    if args.command == "loadtest":
+        from .loadtest import format_load_header, format_load_step, run_load_test
 
-def main() -> None:
-    speaker = build_tts()
-    engine = build_exam_engine(speaker)
+        print(format_load_header(), flush=True)
+        results = run_load_test(
+            bank,
+            speech_delay=args.speech_delay,
+            questions=args.questions,
+            report=lambda result: print(format_load_step(result), flush=True),
+            **given_options(
+                args,
+                steps="candidates",
+                think_median="think_median",
+                think_sigma="think_sigma",
+                time_scale="time_scale",
+            ),
+        )
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as file:
+                json.dump([asdict(result) for result in results], file, ensure_ascii=False, indent=2)
+        return
+    if args.command == "search":
+        try:
+            hits = search_index_for(bank).search(args.query, args.limit)
+        except RuntimeError as error:
+            parser.exit(1, f"{error}\n")
+        if not hits:
+            print("没有找到相关题目。")
+        for hit in hits:
+            question = bank.get(hit.question_id)
+            print(f"{hit.question_id}\t{hit.score:.2f}\t[{question.category.value}] {question.prompt}")
+        return
+    if args.command == "export-bank":
+        export_bank(bank, args.output)
+        return
+    exporter = start_metrics(args)
+    speaker = build_tts(backend=args.speech_backend)
+    store = ResultStore(args.results)
+    engine = build_exam_engine(speaker, bank=bank, store=store, journals=JournalStore(args.journal_dir))
     try:
-        engine.run()
+        if args.command == "sit-paper":
+            engine.run_paper(paper)
+        else:
+            engine.run()
     except KeyboardInterrupt:
         print("\n已退出考试系统。")
     except EOFError:
         print("\n检测到输入结束，已退出考试系统。")
+    finally:
+        speaker.close(timeout=SPEECH_SHUTDOWN_TIMEOUT)
+        store.close()
+        if exporter is not None:
+            exporter.close()
 
 
 if __name__ == "__main__":
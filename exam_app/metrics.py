@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+THINK_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+DEFAULT_EXPORT_INTERVAL = 15.0
+DEFAULT_METRICS_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def collect(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_format_value(self._value)}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self._bounds, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(total)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Union[Counter, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name, documentation)
+        if not isinstance(metric, Counter):
+            raise ValueError(f"指标{name}已被注册为其他类型。")
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, documentation, buckets)
+        if not isinstance(metric, Histogram):
+            raise ValueError(f"指标{name}已被注册为其他类型。")
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write beside the target and rename so a scraper never reads a
+        # half-written file.
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_text(self.render(), encoding="utf-8")
+        os.replace(temporary, path)
+
+
+REGISTRY = MetricsRegistry()
+
+DISPLAY_SECONDS = REGISTRY.histogram("exam_display_seconds", "向考生输出一条信息（含加入语音队列）所用的时间。")
+INPUT_THINK_SECONDS = REGISTRY.histogram(
+    "exam_input_think_seconds",
+    "从出现输入提示到考生提交输入的时间。",
+    THINK_BUCKETS,
+)
+INPUT_SYSTEM_SECONDS = REGISTRY.histogram("exam_input_system_seconds", "两次输入之间系统处理与输出所用的时间。")
+SPEECH_QUEUE_WAIT_SECONDS = REGISTRY.histogram("exam_speech_queue_wait_seconds", "播报文本在语音队列中等待的时间。")
+SPEECH_SYNTHESIS_SECONDS = REGISTRY.histogram("exam_speech_synthesis_seconds", "语音引擎合成并播放一条文本的时间。")
+SPEECH_DROPPED = REGISTRY.counter("exam_speech_dropped_total", "语音队列已满时被丢弃的文本条数。")
+SPEECH_CANCELLED = REGISTRY.counter("exam_speech_cancelled_total", "因考生已作答而取消的待播报文本条数。")
+SPEECH_FAILURES = REGISTRY.counter("exam_speech_failures_total", "语音引擎出错而未能读出的文本条数。")
+SPEECH_RESTARTS = REGISTRY.counter("exam_speech_restarts_total", "语音进程退出后重新启动的次数。")
+SAVE_SECONDS = REGISTRY.histogram("exam_save_seconds", "保存一次答题成绩所用的时间。")
+SAVE_FAILURES = REGISTRY.counter("exam_save_failures_total", "保存成绩失败的次数。")
+
+
+class MetricsExporter:
+    def __init__(
+        self,
+        registry: MetricsRegistry = REGISTRY,
+        *,
+        textfile: Optional[Union[str, Path]] = None,
+        port: Optional[int] = None,
+        host: str = DEFAULT_METRICS_HOST,
+        interval: float = DEFAULT_EXPORT_INTERVAL,
+    ) -> None:
+        self._registry = registry
+        self._textfile = Path(textfile) if textfile else None
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._server: Optional[Any] = None
+        if port is not None:
+            # http.server is slow to import and only needed for the endpoint.
+            import http.server
+
+            self._server = http.server.ThreadingHTTPServer((host, port), _handler_for(registry))
+            self._server.daemon_threads = True
+
+    @property
+    def address(self) -> Optional[tuple]:
+        return self._server.server_address if self._server is not None else None
+
+    def start(self) -> "MetricsExporter":
+        if self._server is not None:
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        if self._textfile is not None:
+            self._writer = threading.Thread(target=self._write_loop, name="metrics-textfile", daemon=True)
+            self._writer.start()
+        return self
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._writer is not None:
+            self._writer.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _write_loop(self) -> None:
+        while True:
+            stopping = self._stopped.wait(self._interval)
+            try:
+                self._registry.write_textfile(self._textfile)
+            except OSError:
+                pass
+            if stopping:
+                return
+
+
+def _handler_for(registry: MetricsRegistry) -> type:
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    return MetricsHandler
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from .question_bank import QuestionBank
+from .questions import Category
+
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MAX_OVERLAP = 0.2
+DEFAULT_NEIGHBOURS = 1
+CANDIDATE_FACTOR = 4
+MAX_ATTEMPTS = 20
+MAX_SWAPS = 200
+
+
+class PaperGenerationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PaperSpec:
+    quotas: Mapping[Category, int]
+    target_difficulty: Optional[float] = None
+    tolerance: float = DEFAULT_TOLERANCE
+    max_overlap: float = DEFAULT_MAX_OVERLAP
+    neighbours: int = DEFAULT_NEIGHBOURS
+
+    @property
+    def size(self) -> int:
+        return sum(self.quotas.values())
+
+
+@dataclass
+class Paper:
+    number: int
+    seed: str
+    question_ids: List[str]
+    mean_difficulty: float = 0.0
+    categories: Dict[str, int] = field(default_factory=dict)
+
+    def to_record(self) -> Dict[str, object]:
+        return {
+            "number": self.number,
+            "seed": self.seed,
+            "question_ids": self.question_ids,
+            "mean_difficulty": round(self.mean_difficulty, 4),
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_record(cls, record: Mapping[str, object]) -> "Paper":
+        return cls(
+            number=int(record["number"]),
+            seed=str(record["seed"]),
+            question_ids=[str(question_id) for question_id in record["question_ids"]],
+            mean_difficulty=float(record.get("mean_difficulty", 0.0)),
+            categories=dict(record.get("categories", {})),
+        )
+
+
+class PaperGenerator:
+    def __init__(self, bank: QuestionBank, spec: PaperSpec, *, seed: Union[int, str] = 0) -> None:
+        for category, quota in spec.quotas.items():
+            available = bank.count_for_category(category)
+            if quota > available:
+                raise PaperGenerationError(f"{category.value}只有{available}道题，无法满足每卷{quota}题的要求。")
+        self._bank = bank
+        self._spec = spec
+        self._seed = str(seed)
+        self._difficulty = self._difficulties() if spec.target_difficulty is not None else {}
+        self._recent: Deque[Dict[Category, List[str]]] = deque(maxlen=max(1, spec.neighbours))
+        self._fingerprints: Set[Tuple[str, ...]] = set()
+
+    def generate(self, count: int, *, start: int = 1) -> Iterator[Paper]:
+        for number in range(start, start + count):
+            yield self._next_paper(number)
+
+    def _next_paper(self, number: int) -> Paper:
+        blocked: Dict[Category, Set[str]] = {
+            category: set().union(*(paper.get(category, ()) for paper in self._recent)) for category in self._spec.quotas
+        }
+        reason = "多次生成均与已有试卷重复，请扩充题库或调整题量。"
+        reuse = False
+        for attempt in range(MAX_ATTEMPTS):
+            paper_seed = f"{self._seed}:{number}:{attempt}"
+            rng = random.Random(paper_seed)
+            selected, spares = self._select(rng, blocked, reuse)
+            if self._spec.target_difficulty is not None and not self._balance(selected, spares):
+                reason = f"无法使平均难度接近{self._spec.target_difficulty}，请放宽难度偏差或扩充题库。"
+                continue
+            question_ids = [question_id for ids in selected.values() for question_id in ids]
+            fingerprint = tuple(sorted(question_ids))
+            if fingerprint in self._fingerprints:
+                # In a small bank the fresh questions of every category may be
+                # exactly an earlier paper; use the allowed overlap to differ.
+                reuse = True
+                continue
+            self._fingerprints.add(fingerprint)
+            self._recent.append({category: list(ids) for category, ids in selected.items()})
+            rng.shuffle(question_ids)
+            return Paper(
+                number=number,
+                seed=paper_seed,
+                question_ids=question_ids,
+                mean_difficulty=self._mean_difficulty(question_ids),
+                categories={category.value: len(ids) for category, ids in selected.items()},
+            )
+        raise PaperGenerationError(f"第{number}份试卷{reason}")
+
+    def _select(
+        self,
+        rng: random.Random,
+        blocked: Mapping[Category, Set[str]],
+        reuse: bool = False,
+    ) -> Tuple[Dict[Category, List[str]], Dict[Category, List[str]]]:
+        selected: Dict[Category, List[str]] = {}
+        spares: Dict[Category, List[str]] = {}
+        for category, quota in self._spec.quotas.items():
+            if quota <= 0:
+                continue
+            pool = self._bank.ids_for_category(category)
+            taken = blocked.get(category, set())
+            # Only a bounded random window of the category is examined, so
+            # the cost per paper does not grow with the size of the bank.
+            window = min(len(pool), quota * CANDIDATE_FACTOR + len(taken))
+            candidates = rng.sample(pool, k=window)
+            fresh = [question_id for question_id in candidates if question_id not in taken]
+            reused = [question_id for question_id in candidates if question_id in taken]
+            allowance = min(math.ceil(quota * self._spec.max_overlap), len(reused))
+            keep = quota - rng.randint(0, allowance) if reuse else quota
+            chosen = fresh[:keep]
+            shortfall = quota - len(chosen)
+            if shortfall > allowance:
+                raise PaperGenerationError(
+                    f"{category.value}题量不足，相邻座位的试卷无法满足重复率不超过"
+                    f"{round(self._spec.max_overlap * 100)}%的要求。"
+                )
+            chosen.extend(reused[:shortfall])
+            selected[category] = chosen
+            spares[category] = fresh[keep:]
+        return selected, spares
+
+    def _balance(self, selected: Dict[Category, List[str]], spares: Dict[Category, List[str]]) -> bool:
+        target = self._spec.target_difficulty
+        size = sum(len(ids) for ids in selected.values())
+        if not size or target is None:
+            return True
+        total = sum(self._difficulty[question_id] for ids in selected.values() for question_id in ids)
+        for _ in range(MAX_SWAPS):
+            gap = total / size - target
+            if abs(gap) <= self._spec.tolerance:
+                return True
+            direction = 1.0 if gap > 0 else -1.0
+            best: Optional[Tuple[float, Category, int, int]] = None
+            for category, ids in selected.items():
+                spare = spares.get(category)
+                if not spare:
+                    continue
+                # Swap out the item pulling hardest away from the target for
+                # the spare that pulls hardest towards it.
+                out_index = max(range(len(ids)), key=lambda index: direction * self._difficulty[ids[index]])
+                in_index = min(range(len(spare)), key=lambda index: direction * self._difficulty[spare[index]])
+                change = self._difficulty[spare[in_index]] - self._difficulty[ids[out_index]]
+                improvement = abs(gap) - abs(gap + change / size)
+                if improvement > 0 and (best is None or improvement > best[0]):
+                    best = (improvement, category, out_index, in_index)
+            if best is None:
+                return False
+            _, category, out_index, in_index = best
+            ids, spare = selected[category], spares[category]
+            total += self._difficulty[spare[in_index]] - self._difficulty[ids[out_index]]
+            ids[out_index], spare[in_index] = spare[in_index], ids[out_index]
+        return abs(total / size - target) <= self._spec.tolerance
+
+    def _difficulties(self) -> Dict[str, float]:
+        difficulty: Dict[str, float] = {}
+        for category in self._spec.quotas:
+            for question in self._bank.questions(self._bank.ids_for_category(category)):
+                difficulty[question.id] = question.difficulty
+        return difficulty
+
+    def _mean_difficulty(self, question_ids: List[str]) -> float:
+        if not question_ids:
+            return 0.0
+        if self._difficulty:
+            return sum(self._difficulty[question_id] for question_id in question_ids) / len(question_ids)
+        return sum(self._bank.get(question_id).difficulty for question_id in question_ids) / len(question_ids)
+
+
+def generate_papers(
+    bank: QuestionBank,
+    spec: PaperSpec,
+    count: int,
+    *,
+    seed: Union[int, str] = 0,
+) -> Iterator[Paper]:
+    return PaperGenerator(bank, spec, seed=seed).generate(count)
+
+
+def write_papers(papers: Iterable[Paper], path: Union[str, Path]) -> int:
+    # Papers are written to a temporary file that replaces the output only
+    # once all of them were generated, so a failed run keeps the old papers.
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    count = 0
+    try:
+        with temporary.open("w", encoding="utf-8") as file:
+            for paper in papers:
+                file.write(json.dumps(paper.to_record(), ensure_ascii=False))
+                file.write("\n")
+                count += 1
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return count
+
+
+def load_paper(path: Union[str, Path], number: int) -> Paper:
+    with Path(path).open("r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if int(record["number"]) == number:
+                return Paper.from_record(record)
+    raise PaperGenerationError(f"试卷文件中没有第{number}号试卷。")
@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import sqlite3
+import threading
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .columnar import COLUMNAR_SUFFIX, ColumnarError, ColumnarTable, write_columnar
+from .questions import QUESTION_BANK, Category, Question
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+INDEX_SUFFIX = ".idx.json"
+
+IndexEntry = Tuple[str, Category, Tuple[str, ...]]
+_CATEGORY_LOOKUP: Dict[Any, Category] = {
+    **{category: category for category in Category},
+    **{category.value: category for category in Category},
+    **{category.name: category for category in Category},
+}
+QuestionLoader = Callable[[str], Question]
+
+
+class QuestionBankError(ValueError):
+    pass
+
+
+class BankIndex:
+    def __init__(
+        self,
+        ids: List[str],
+        by_category: Dict[Category, List[int]],
+        by_tag: Dict[str, List[int]],
+    ) -> None:
+        self.ids = ids
+        self.positions: Dict[str, int] = dict(zip(ids, range(len(ids))))
+        if len(self.positions) != len(ids):
+            duplicates = sorted({question_id for question_id in ids if ids.count(question_id) > 1})
+            raise QuestionBankError(f"题库中存在重复的题目编号：{'、'.join(duplicates)}")
+        self.by_category = {category: by_category.get(category, []) for category in Category}
+        self.by_tag = by_tag
+
+    @classmethod
+    def build(cls, entries: Iterable[IndexEntry]) -> "BankIndex":
+        ids: List[str] = []
+        by_category: Dict[Category, List[int]] = {category: [] for category in Category}
+        by_tag: Dict[str, List[int]] = {}
+        for position, (question_id, category, tags) in enumerate(entries):
+            ids.append(question_id)
+            by_category[category].append(position)
+            for tag in tags:
+                by_tag.setdefault(tag, []).append(position)
+        return cls(ids, by_category, by_tag)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "ids": self.ids,
+            "categories": {category.value: positions for category, positions in self.by_category.items()},
+            "tags": self.by_tag,
+        }
+
+    @classmethod
+    def from_json(cls, payload: Mapping[str, Any]) -> "BankIndex":
+        return cls(
+            list(payload["ids"]),
+            {parse_category(value): list(positions) for value, positions in payload["categories"].items()},
+            {str(tag): list(positions) for tag, positions in payload["tags"].items()},
+        )
+
+
+class QuestionBank:
+    def __init__(
+        self,
+        index: BankIndex,
+        loader: QuestionLoader,
+        *,
+        source: str = "内置题库",
+        cache: bool = True,
+    ) -> None:
+        self._index = index
+        self._loader = loader
+        self._source = source
+        self._cache = cache
+        self._category_ids: Dict[Category, List[str]] = {}
+        self._tag_ids: Dict[str, List[str]] = {}
+        self._loaded: Dict[str, Question] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_questions(cls, questions: Iterable[Question], *, source: str = "内置题库") -> "QuestionBank":
+        questions = list(questions)
+        index = BankIndex.build((q.id, q.category, tuple(q.tags)) for q in questions)
+        bank = cls(index, _missing_question, source=source)
+        bank._loaded.update((q.id, q) for q in questions)
+        return bank
+
+    @classmethod
+    def from_jsonl(cls, path: Union[str, Path]) -> "QuestionBank":
+        source = _JsonlSource(Path(path))
+        return cls(source.index(), source.load, source=str(path))
+
+    @classmethod
+    def from_sqlite(cls, path: Union[str, Path]) -> "QuestionBank":
+        source = _SqliteSource(Path(path))
+        return cls(source.index(), source.load, source=str(path))
+
+    @classmethod
+    def from_columnar(cls, path: Union[str, Path]) -> "QuestionBank":
+        try:
+            table = ColumnarTable(path)
+        except ColumnarError as error:
+            raise QuestionBankError(str(error)) from error
+        index = BankIndex.build(
+            (view.id, view.category, view.tags) for view in map(table.question, range(len(table)))
+        )
+        positions = index.positions
+        # Questions are views onto the mapped file, cheap enough to create on
+        # every lookup rather than keep.
+        return cls(
+            index,
+            lambda question_id: table.question(positions[question_id]),
+            source=str(path),
+            cache=False,
+        )
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @property
+    def ids(self) -> Sequence[str]:
+        return self._index.ids
+
+    @property
+    def tags(self) -> Sequence[str]:
+        return sorted(self._index.by_tag)
+
+    def __len__(self) -> int:
+        return len(self._index.ids)
+
+    def __contains__(self, question_id: object) -> bool:
+        return question_id in self._index.positions
+
+    def __iter__(self) -> Iterator[Question]:
+        for question_id in self._index.ids:
+            yield self.get(question_id)
+
+    def ids_for_category(self, category: Category) -> Sequence[str]:
+        question_ids = self._category_ids.get(category)
+        if question_ids is None:
+            ids = self._index.ids
+            question_ids = [ids[position] for position in self._index.by_category[category]]
+            self._category_ids[category] = question_ids
+        return question_ids
+
+    def count_for_category(self, category: Category) -> int:
+        return len(self._index.by_category[category])
+
+    def sample_ids(self, category: Category, amount: int, rng: random.Random) -> List[str]:
+        positions = self._index.by_category[category]
+        ids = self._index.ids
+        return [ids[position] for position in rng.sample(positions, k=min(amount, len(positions)))]
+
+    def ids_for_tag(self, tag: str) -> Sequence[str]:
+        question_ids = self._tag_ids.get(tag)
+        if question_ids is None:
+            ids = self._index.ids
+            question_ids = [ids[position] for position in self._index.by_tag.get(tag, ())]
+            self._tag_ids[tag] = question_ids
+        return question_ids
+
+    def get(self, question_id: str) -> Question:
+        question = self._loaded.get(question_id)
+        if question is not None:
+            return question
+        if question_id not in self._index.positions:
+            raise KeyError(question_id)
+        if not self._cache:
+            return self._loader(question_id)
+        with self._lock:
+            question = self._loaded.get(question_id)
+            if question is None:
+                question = self._loader(question_id)
+                self._loaded[question_id] = question
+        return question
+
+    def questions(self, question_ids: Iterable[str]) -> List[Question]:
+        return [self.get(question_id) for question_id in question_ids]
+
+
+def load_bank(path: Optional[Union[str, Path]] = None) -> QuestionBank:
+    if path is None:
+        return QuestionBank.from_questions(QUESTION_BANK)
+    suffix = Path(path).suffix.lower()
+    if suffix in JSONL_SUFFIXES:
+        return QuestionBank.from_jsonl(path)
+    if suffix in SQLITE_SUFFIXES:
+        return QuestionBank.from_sqlite(path)
+    if suffix == COLUMNAR_SUFFIX:
+        return QuestionBank.from_columnar(path)
+    raise QuestionBankError(f"无法识别的题库格式：{path}")
+
+
+def compile_columnar(path: Union[str, Path], bank: Optional[Iterable[Question]] = None) -> Path:
+    """Columnar copy of a bank file, kept next to it and rebuilt when the
+    bank changes, for processes that should share one copy of the text.
+    Returns the bank file itself when the copy cannot be written there."""
+    path = Path(path)
+    if path.suffix.lower() == COLUMNAR_SUFFIX:
+        return path
+    stat = path.stat()
+    target = path.with_name(path.name + COLUMNAR_SUFFIX)
+    fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+    try:
+        if ColumnarTable(target).fingerprint == fingerprint:
+            return target
+    except (OSError, ColumnarError):
+        pass
+    try:
+        write_columnar(bank if bank is not None else load_bank(path), target, fingerprint=fingerprint)
+    except OSError:
+        return path
+    return target
+
+
+def question_to_record(question: Question) -> Dict[str, Any]:
+    return {
+        "id": question.id,
+        "category": question.category.value,
+        "prompt": question.prompt,
+        "options": list(question.options),
+        "correct_option": question.correct_option,
+        "explanation": question.explanation,
+        "tags": list(question.tags),
+        "difficulty": question.difficulty,
+        "discrimination": question.discrimination,
+    }
+
+
+def question_from_record(record: Mapping[str, Any]) -> Question:
+    try:
+        return Question(
+            id=str(record["id"]),
+            category=parse_category(record["category"]),
+            prompt=str(record["prompt"]),
+            options=[str(option) for option in record["options"]],
+            correct_option=int(record["correct_option"]),
+            explanation=str(record.get("explanation", "")),
+            tags=tuple(str(tag) for tag in record.get("tags", ())),
+            difficulty=float(record.get("difficulty", 0.0)),
+            discrimination=float(record.get("discrimination", 1.0)),
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        raise QuestionBankError(f"题目记录格式错误：{error}") from error
+
+
+def parse_category(value: Any) -> Category:
+    category = _CATEGORY_LOOKUP.get(value)
+    if category is None and isinstance(value, str):
+        category = _CATEGORY_LOOKUP.get(value.upper())
+    if category is None:
+        raise QuestionBankError(f"未知的科目：{value}")
+    return category
+
+
+def write_jsonl(questions: Iterable[Question], path: Union[str, Path]) -> int:
+    count = 0
+    with Path(path).open("w", encoding="utf-8") as file:
+        for question in questions:
+            file.write(json.dumps(question_to_record(question), ensure_ascii=False))
+            file.write("\n")
+            count += 1
+    return count
+
+
+def write_sqlite(questions: Iterable[Question], path: Union[str, Path]) -> int:
+    connection = sqlite3.connect(str(path))
+    try:
+        with connection:
+            _create_sqlite_schema(connection)
+            connection.execute("DELETE FROM questions")
+            count = 0
+            for position, question in enumerate(questions):
+                record = question_to_record(question)
+                connection.execute(
+                    "INSERT INTO questions (id, position, category, prompt, options, correct_option, explanation, tags,"
+                    " difficulty, discrimination) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record["id"],
+                        position,
+                        record["category"],
+                        record["prompt"],
+                        json.dumps(record["options"], ensure_ascii=False),
+                        record["correct_option"],
+                        record["explanation"],
+                        json.dumps(record["tags"], ensure_ascii=False),
+                        record["difficulty"],
+                        record["discrimination"],
+                    ),
+                )
+                count += 1
+        return count
+    finally:
+        connection.close()
+
+
+def _missing_question(question_id: str) -> Question:
+    raise KeyError(question_id)
+
+
+def _create_sqlite_schema(connection: sqlite3.Connection) -> None:
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS questions (
+            id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_option INTEGER NOT NULL,
+            explanation TEXT NOT NULL DEFAULT '',
+            tags TEXT NOT NULL DEFAULT '[]',
+            difficulty REAL NOT NULL DEFAULT 0.0,
+            discrimination REAL NOT NULL DEFAULT 1.0
+        );
+        CREATE INDEX IF NOT EXISTS questions_position ON questions (position);
+        """
+    )
+
+
+class _JsonlSource:
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._offsets: List[int] = []
+        self._positions: Dict[str, int] = {}
+        self._file: Optional[BinaryIO] = None
+        self._lock = threading.Lock()
+
+    def index(self) -> BankIndex:
+        stat = self._path.stat()
+        index_path = self._path.with_name(self._path.name + INDEX_SUFFIX)
+        cached = self._read_index(index_path, stat)
+        if cached is not None:
+            index, self._offsets = cached
+        else:
+            index = self._scan()
+            self._write_index(index_path, stat, index)
+        self._positions = index.positions
+        return index
+
+    def load(self, question_id: str) -> Question:
+        offset = self._offsets[self._positions[question_id]]
+        with self._lock:
+            if self._file is None:
+                self._file = self._path.open("rb")
+            self._file.seek(offset)
+            line = self._file.readline()
+        return question_from_record(json.loads(line))
+
+    def _scan(self) -> BankIndex:
+        entries: List[IndexEntry] = []
+        with self._path.open("rb") as file:
+            offset = 0
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                        entries.append(
+                            (
+                                str(record["id"]),
+                                parse_category(record["category"]),
+                                tuple(str(tag) for tag in record.get("tags", ())),
+                            )
+                        )
+                    except (ValueError, KeyError, TypeError) as error:
+                        raise QuestionBankError(f"{self._path} 第{number}行格式错误：{error}") from error
+                    self._offsets.append(offset)
+                offset += len(line)
+        return BankIndex.build(entries)
+
+    @staticmethod
+    def _read_index(index_path: Path, stat: os.stat_result) -> Optional[Tuple[BankIndex, List[int]]]:
+        try:
+            payload = json.loads(index_path.read_text(encoding="utf-8"))
+            if payload.get("size") != stat.st_size or payload.get("mtime_ns") != stat.st_mtime_ns:
+                return None
+            return BankIndex.from_json(payload), list(payload["offsets"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_index(self, index_path: Path, stat: os.stat_result, index: BankIndex) -> None:
+        payload = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "offsets": self._offsets, **index.to_json()}
+        try:
+            index_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        except OSError:
+            pass
+
+
+class _SqliteSource:
+    def __init__(self, path: Path) -> None:
+        if not path.exists():
+            raise QuestionBankError(f"找不到题库文件：{path}")
+        self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(questions)")}
+        # Banks written before IRT parameters existed fall back to the defaults.
+        self._parameter_columns = (
+            "difficulty, discrimination" if {"difficulty", "discrimination"} <= columns else "0.0, 1.0"
+        )
+
+    def index(self) -> BankIndex:
+        with self._lock:
+            rows = self._connection.execute("SELECT id, category, tags FROM questions ORDER BY position").fetchall()
+        return BankIndex.build(
+            (question_id, parse_category(category), tuple(json.loads(tags)) if tags != "[]" else ())
+            for question_id, category, tags in rows
+        )
+
+    def load(self, question_id: str) -> Question:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, category, prompt, options, correct_option, explanation, tags,"
+                f" {self._parameter_columns} FROM questions WHERE id = ?",
+                (question_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(question_id)
+        return question_from_record(
+            {
+                "id": row[0],
+                "category": row[1],
+                "prompt": row[2],
+                "options": json.loads(row[3]),
+                "correct_option": row[4],
+                "explanation": row[5],
+                "tags": json.loads(row[6]),
+                "difficulty": row[7],
+                "discrimination": row[8],
+            }
+        )
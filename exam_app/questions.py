@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
 
 
 class Category(str, Enum):
@@ -20,6 +20,9 @@ class Question:
     options: List[str]
     correct_option: int
     explanation: str
+    tags: Tuple[str, ...] = ()
+    difficulty: float = 0.0
+    discrimination: float = 1.0
 
 
 QUESTION_BANK: Sequence[Question] = (
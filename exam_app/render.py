@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import textwrap
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Mapping, MutableMapping, Sequence, Tuple
+
+from .question_bank import QuestionBank
+from .questions import Question
+
+
+@dataclass(frozen=True)
+class TextBlock:
+    lines: Tuple[str, ...]
+    utterance: str
+
+
+@dataclass(frozen=True)
+class RenderedQuestion:
+    question: TextBlock
+    choices: Mapping[str, int]
+    answer: TextBlock
+    feedback: TextBlock
+    explanation: TextBlock
+    review_correct: TextBlock
+    review_incorrect: TextBlock
+
+
+class QuestionRenderer:
+    def __init__(self, width: int, numbering: Sequence[str]) -> None:
+        self._width = width
+        self._numbering = tuple(numbering)
+        self._cache: Dict[str, RenderedQuestion] = {}
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    def render(self, question: Question) -> RenderedQuestion:
+        rendered = self._cache.get(question.id)
+        if rendered is None:
+            rendered = self._cache[question.id] = self._compile(question)
+        return rendered
+
+    def block(self, text: str) -> TextBlock:
+        lines = tuple(textwrap.fill(line, width=self._width) for line in text.splitlines())
+        return TextBlock(lines=lines, utterance=text.replace("\n", "。"))
+
+    def _compile(self, question: Question) -> RenderedQuestion:
+        options = [f"{self._numbering[index]}. {option}" for index, option in enumerate(question.options)]
+        correct_number = self._numbering[question.correct_option]
+        correct_text = question.options[question.correct_option]
+        return RenderedQuestion(
+            question=TextBlock(
+                lines=self.block("\n".join([question.prompt, *options])).lines,
+                utterance="。".join([question.prompt, *options]),
+            ),
+            choices={label: index for index, label in enumerate(self._numbering[: len(question.options)])},
+            answer=self.block(f"正确答案：{correct_number}. {correct_text}"),
+            feedback=self.block(f"正确答案是选项{correct_number}：{correct_text}"),
+            explanation=self.block(question.explanation),
+            review_correct=self.block(f"[正确] {question.prompt}"),
+            review_incorrect=self.block(f"[错误] {question.prompt}"),
+        )
+
+
+_RENDERERS: MutableMapping[QuestionBank, Dict[Tuple[int, Tuple[str, ...]], QuestionRenderer]] = (
+    weakref.WeakKeyDictionary()
+)
+_RENDERERS_LOCK = threading.Lock()
+
+
+def renderer_for(bank: QuestionBank, width: int, numbering: Sequence[str]) -> QuestionRenderer:
+    # Every engine on the same bank shares one cache, so a question is
+    # compiled at most once per bank, width and numbering.
+    key = (width, tuple(numbering))
+    with _RENDERERS_LOCK:
+        renderers = _RENDERERS.setdefault(bank, {})
+        renderer = renderers.get(key)
+        if renderer is None:
+            renderer = renderers[key] = QuestionRenderer(width, numbering)
+    return renderer
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import csv
+import html
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .exam import DISPLAY_WIDTH, OPTION_NUMBERS
+from .question_bank import QuestionBank, load_bank
+from .questions import Category
+from .render import QuestionRenderer, renderer_for
+from .results import ResultStore, SessionRecord
+
+DEFAULT_REPORT_CHUNK = 500
+TEXT_FORMAT = "text"
+CSV_FORMAT = "csv"
+HTML_FORMAT = "html"
+REPORT_FORMATS = (TEXT_FORMAT, CSV_FORMAT, HTML_FORMAT)
+SESSION_FIELDS = (
+    "session_id",
+    "candidate",
+    "title",
+    "started_at",
+    "finished_at",
+    "total_questions",
+    "answered_questions",
+    "correct_answers",
+    "accuracy",
+)
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+@dataclass
+class CategoryRollup:
+    category: str
+    sessions: int = 0
+    answered: int = 0
+    correct: int = 0
+
+    @property
+    def accuracy(self) -> float:
+        if self.answered == 0:
+            return 0.0
+        return self.correct / self.answered
+
+    def merge(self, other: "CategoryRollup") -> None:
+        self.sessions += other.sessions
+        self.answered += other.answered
+        self.correct += other.correct
+
+
+@dataclass
+class ChunkReport:
+    rows: List[List[str]] = field(default_factory=list)
+    links: List[Tuple[str, str]] = field(default_factory=list)
+    categories: Dict[str, CategoryRollup] = field(default_factory=dict)
+
+
+@dataclass
+class ReportResult:
+    sessions: int
+    categories: List[CategoryRollup]
+
+
+def generate_reports(
+    results_path: Union[str, Path],
+    output_dir: Union[str, Path],
+    *,
+    bank_path: Optional[str] = None,
+    title: Optional[str] = None,
+    formats: Sequence[str] = REPORT_FORMATS,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_REPORT_CHUNK,
+) -> ReportResult:
+    """Render a report for every session in the result database, in
+    parallel, and a class rollup by category.
+
+    The parent only walks session ids and hands out id ranges; each worker
+    reads its range from the database, writes the per-student files and
+    returns the CSV rows and partial rollups. At most two ranges per worker
+    are in flight, so memory stays flat however long the history is."""
+    unknown = [name for name in formats if name not in REPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"不支持的报告格式：{'、'.join(unknown)}")
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    for name in (TEXT_FORMAT, HTML_FORMAT):
+        if name in formats:
+            (output / name).mkdir(exist_ok=True)
+    worker_count = max(1, workers or os.cpu_count() or 1)
+    store = ResultStore(results_path)
+    writers = _ReportWriters(output, formats)
+    categories: Dict[str, CategoryRollup] = {}
+    sessions = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=worker_count,
+            initializer=_init_worker,
+            initargs=(str(results_path), bank_path, str(output), tuple(formats), title),
+        ) as pool:
+            pending: Deque["Future[ChunkReport]"] = deque()
+            for first_id, last_id in _id_ranges(store, title, max(1, chunk_size)):
+                if len(pending) >= 2 * worker_count:
+                    sessions += _collect(pending.popleft().result(), writers, categories)
+                pending.append(pool.submit(_render_range, first_id, last_id))
+            while pending:
+                sessions += _collect(pending.popleft().result(), writers, categories)
+        rollup = _ordered_rollup(categories)
+        writers.finish(rollup, sessions)
+    finally:
+        writers.close()
+        store.close()
+    return ReportResult(sessions=sessions, categories=rollup)
+
+
+def _id_ranges(store: ResultStore, title: Optional[str], chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for ids in store.iter_session_ids(title=title, fetch_size=chunk_size):
+        yield ids[0], ids[-1]
+
+
+def _collect(report: ChunkReport, writers: "_ReportWriters", categories: Dict[str, CategoryRollup]) -> int:
+    # Chunks are collected in submission order, so the class files list
+    # sessions oldest first whatever order the workers finish in.
+    writers.write_chunk(report)
+    for name, rollup in report.categories.items():
+        categories.setdefault(name, CategoryRollup(name)).merge(rollup)
+    return len(report.rows)
+
+
+def _ordered_rollup(categories: Dict[str, CategoryRollup]) -> List[CategoryRollup]:
+    known = [category.value for category in Category]
+    order = {name: index for index, name in enumerate(known)}
+    return sorted(categories.values(), key=lambda rollup: (order.get(rollup.category, len(known)), rollup.category))
+
+
+class _ReportWriters:
+    """Class-wide files, appended to as chunks come back."""
+
+    def __init__(self, output: Path, formats: Sequence[str]) -> None:
+        self._output = output
+        self._formats = formats
+        self._sessions_file: Optional[IO[str]] = None
+        self._sessions_csv: Optional[Any] = None
+        self._index_file: Optional[IO[str]] = None
+        if CSV_FORMAT in formats:
+            self._sessions_file = (output / "sessions.csv").open("w", encoding="utf-8-sig", newline="")
+            self._sessions_csv = csv.writer(self._sessions_file)
+            self._sessions_csv.writerow(SESSION_FIELDS)
+        if HTML_FORMAT in formats:
+            self._index_file = (output / "index.html").open("w", encoding="utf-8")
+            self._index_file.write(_html_head("成绩报告目录"))
+            self._index_file.write('<h1>成绩报告目录</h1>\n<p><a href="summary.html">班级分科目汇总</a></p>\n<ol>\n')
+
+    def write_chunk(self, report: ChunkReport) -> None:
+        if self._sessions_csv is not None:
+            self._sessions_csv.writerows(report.rows)
+        if self._index_file is not None:
+            self._index_file.writelines(
+                f'<li><a href="{html.escape(href)}">{html.escape(label)}</a></li>\n' for href, label in report.links
+            )
+
+    def finish(self, rollup: List[CategoryRollup], sessions: int) -> None:
+        if self._index_file is not None:
+            self._index_file.write("</ol>\n</main>\n</body>\n</html>\n")
+            (self._output / "summary.html").write_text(_summary_html(rollup, sessions), encoding="utf-8")
+        if CSV_FORMAT in self._formats:
+            with (self._output / "categories.csv").open("w", encoding="utf-8-sig", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["category", "sessions", "answered", "correct", "accuracy"])
+                for item in rollup:
+                    writer.writerow([item.category, item.sessions, item.answered, item.correct, f"{item.accuracy:.4f}"])
+        if TEXT_FORMAT in self._formats:
+            (self._output / "summary.txt").write_text(_summary_text(rollup, sessions), encoding="utf-8")
+
+    def close(self) -> None:
+        for file in (self._sessions_file, self._index_file):
+            if file is not None:
+                file.close()
+
+
+_WORKER: Optional["_ReportWorker"] = None
+
+
+class _ReportWorker:
+    def __init__(
+        self,
+        results_path: str,
+        bank_path: Optional[str],
+        output: str,
+        formats: Sequence[str],
+        title: Optional[str],
+    ) -> None:
+        self.store = ResultStore(results_path)
+        self.bank = load_bank(bank_path)
+        self.renderer = renderer_for(self.bank, DISPLAY_WIDTH, OPTION_NUMBERS)
+        self.output = Path(output)
+        self.formats = formats
+        self.title = title
+        self.fragments: Dict[Tuple[str, bool], str] = {}
+
+
+def _init_worker(
+    results_path: str,
+    bank_path: Optional[str],
+    output: str,
+    formats: Sequence[str],
+    title: Optional[str],
+) -> None:
+    global _WORKER
+    _WORKER = _ReportWorker(results_path, bank_path, output, formats, title)
+
+
+def _render_range(first_id: int, last_id: int) -> ChunkReport:
+    worker = _WORKER
+    assert worker is not None
+    report = ChunkReport()
+    for record in worker.store.sessions_between(first_id, last_id, title=worker.title):
+        name = report_name(record)
+        totals = category_totals(record)
+        for category, (answered, correct) in totals.items():
+            rollup = report.categories.setdefault(category, CategoryRollup(category))
+            rollup.sessions += 1
+            rollup.answered += answered
+            rollup.correct += correct
+        if TEXT_FORMAT in worker.formats:
+            text = render_text(record, totals, worker.bank, worker.renderer)
+            (worker.output / TEXT_FORMAT / f"{name}.txt").write_text(text, encoding="utf-8")
+        if HTML_FORMAT in worker.formats:
+            page = render_html(record, totals, worker.bank, worker.renderer, worker.fragments)
+            (worker.output / HTML_FORMAT / f"{name}.html").write_text(page, encoding="utf-8")
+            report.links.append((f"{HTML_FORMAT}/{name}.html", _heading(record)))
+        report.rows.append(
+            [
+                str(record.session_id),
+                record.candidate,
+                record.title,
+                record.started_at.isoformat(timespec="seconds"),
+                record.finished_at.isoformat(timespec="seconds"),
+                str(record.total_questions),
+                str(record.answered_questions),
+                str(record.correct_answers),
+                f"{record.accuracy:.4f}",
+            ]
+        )
+    return report
+
+
+def report_name(record: SessionRecord) -> str:
+    candidate = _UNSAFE_NAME.sub("_", record.candidate).strip("._") or "考生"
+    return f"{record.session_id:08d}_{candidate}"
+
+
+def category_totals(record: SessionRecord) -> Dict[str, Tuple[int, int]]:
+    # Per category: answered and correct. A question left blank does not
+    # count as answered, as in the session totals.
+    totals: Dict[str, List[int]] = {}
+    for answer in record.answers:
+        counts = totals.setdefault(answer.category, [0, 0])
+        if answer.selected_option is not None:
+            counts[0] += 1
+        if answer.is_correct:
+            counts[1] += 1
+    return {category: (answered, correct) for category, (answered, correct) in totals.items()}
+
+
+def render_text(
+    record: SessionRecord,
+    totals: Dict[str, Tuple[int, int]],
+    bank: QuestionBank,
+    renderer: QuestionRenderer,
+) -> str:
+    # Plain lines in the order the exam engine reads a summary aloud, so a
+    # screen reader takes the file top to bottom.
+    lines = [
+        _heading(record),
+        f"完成时间：{record.finished_at:%Y年%m月%d日%H:%M}，用时{_duration(record)}秒。",
+        f"共计划{record.total_questions}题，实际作答{record.answered_questions}题，答对{record.correct_answers}题。",
+        f"正确率约为{round(record.accuracy * 100)}%。",
+    ]
+    if totals:
+        lines.append("分科目成绩：")
+        lines.extend(f"{category}：作答{answered}题，答对{correct}题。" for category, (answered, correct) in totals.items())
+    reviewed = [answer for answer in record.answers if answer.question_id in bank]
+    if reviewed:
+        lines.append("逐题回顾：")
+    for answer in reviewed:
+        rendered = renderer.render(bank.get(answer.question_id))
+        blocks = [rendered.review_correct if answer.is_correct else rendered.review_incorrect, rendered.answer]
+        if not answer.is_correct:
+            blocks.append(rendered.explanation)
+        for block in blocks:
+            lines.extend(block.lines)
+    return "\n".join(lines) + "\n"
+
+
+def render_html(
+    record: SessionRecord,
+    totals: Dict[str, Tuple[int, int]],
+    bank: QuestionBank,
+    renderer: QuestionRenderer,
+    fragments: Optional[Dict[Tuple[str, bool], str]] = None,
+) -> str:
+    # A class sees the same questions over and over; with a fragment cache
+    # each question is escaped once per outcome instead of once per student.
+    fragments = {} if fragments is None else fragments
+    escape = html.escape
+    parts = [
+        _html_head(_heading(record)),
+        f"<h1>{escape(_heading(record))}</h1>\n<ul>\n",
+        f"<li>完成时间：{record.finished_at:%Y年%m月%d日%H:%M}，用时{_duration(record)}秒。</li>\n",
+        f"<li>共计划{record.total_questions}题，实际作答{record.answered_questions}题，"
+        f"答对{record.correct_answers}题。</li>\n",
+        f"<li>正确率约为{round(record.accuracy * 100)}%。</li>\n</ul>\n",
+    ]
+    if totals:
+        parts.append(
+            "<h2>分科目成绩</h2>\n<table>\n<caption>分科目成绩</caption>\n"
+            '<thead><tr><th scope="col">科目</th><th scope="col">作答题数</th>'
+            '<th scope="col">答对题数</th></tr></thead>\n<tbody>\n'
+        )
+        parts.extend(
+            f'<tr><th scope="row">{escape(category)}</th><td>{answered}</td><td>{correct}</td></tr>\n'
+            for category, (answered, correct) in totals.items()
+        )
+        parts.append("</tbody>\n</table>\n")
+    reviewed = [answer for answer in record.answers if answer.question_id in bank]
+    if reviewed:
+        parts.append("<h2>逐题回顾</h2>\n<ol>\n")
+    for answer in reviewed:
+        key = (answer.question_id, answer.is_correct)
+        fragment = fragments.get(key)
+        if fragment is None:
+            fragment = fragments[key] = _review_fragment(bank, renderer, answer.question_id, answer.is_correct)
+        parts.append(fragment)
+    if reviewed:
+        parts.append("</ol>\n")
+    parts.append("</main>\n</body>\n</html>\n")
+    return "".join(parts)
+
+
+def _review_fragment(bank: QuestionBank, renderer: QuestionRenderer, question_id: str, is_correct: bool) -> str:
+    question = bank.get(question_id)
+    verdict = "正确" if is_correct else "错误"
+    parts = [
+        f"<li>\n<p>[{verdict}] {html.escape(question.prompt)}</p>\n",
+        f"<p>{html.escape(renderer.render(question).answer.utterance)}</p>\n",
+    ]
+    if not is_correct:
+        parts.append(f"<p>{html.escape(question.explanation)}</p>\n")
+    parts.append("</li>\n")
+    return "".join(parts)
+
+
+def _summary_text(rollup: Iterable[CategoryRollup], sessions: int) -> str:
+    lines = [f"班级分科目汇总：共{sessions}份答题记录。"]
+    lines.extend(
+        f"{item.category}：{item.sessions}份记录，作答{item.answered}题，答对{item.correct}题，"
+        f"正确率约为{round(item.accuracy * 100)}%。"
+        for item in rollup
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _summary_html(rollup: Iterable[CategoryRollup], sessions: int) -> str:
+    escape = html.escape
+    parts = [
+        _html_head("班级分科目汇总"),
+        f"<h1>班级分科目汇总</h1>\n<p>共{sessions}份答题记录。</p>\n",
+        "<table>\n<caption>各科目作答情况</caption>\n<thead><tr>"
+        '<th scope="col">科目</th><th scope="col">记录数</th><th scope="col">作答题数</th>'
+        '<th scope="col">答对题数</th><th scope="col">正确率</th></tr></thead>\n<tbody>\n',
+    ]
+    parts.extend(
+        f'<tr><th scope="row">{escape(item.category)}</th><td>{item.sessions}</td><td>{item.answered}</td>'
+        f"<td>{item.correct}</td><td>{round(item.accuracy * 100)}%</td></tr>\n"
+        for item in rollup
+    )
+    parts.append("</tbody>\n</table>\n</main>\n</body>\n</html>\n")
+    return "".join(parts)
+
+
+def _html_head(title: str) -> str:
+    return (
+        '<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8">\n'
+        f"<title>{html.escape(title)}</title>\n</head>\n<body>\n<main>\n"
+    )
+
+
+def _heading(record: SessionRecord) -> str:
+    return f"{record.candidate}同学“{record.title}”成绩报告"
+
+
+def _duration(record: SessionRecord) -> int:
+    return int((record.finished_at - record.started_at).total_seconds())
@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from .exam import ExamSummary
+
+DEFAULT_RESULT_DB = Path(__file__).resolve().parent / "score_records.sqlite3"
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_SAVE_TIMEOUT = 5.0
+DEFAULT_FETCH_SIZE = 10000
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    candidate TEXT NOT NULL,
+    title TEXT NOT NULL,
+    total_questions INTEGER NOT NULL,
+    answered_questions INTEGER NOT NULL,
+    correct_answers INTEGER NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_candidate ON sessions (candidate, id);
+CREATE TABLE IF NOT EXISTS answers (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    position INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    selected_option INTEGER,
+    correct_option INTEGER NOT NULL,
+    is_correct INTEGER NOT NULL,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+SESSION_COLUMNS = (
+    "id, candidate, title, total_questions, answered_questions, correct_answers, started_at, finished_at"
+)
+ANSWER_COLUMNS = "position, question_id, category, selected_option, correct_option, is_correct"
+
+Checkpoint = Tuple[str, int]
+
+
+class RecordRejectedError(ValueError):
+    pass
+
+
+@dataclass
+class AnswerRecord:
+    position: int
+    question_id: str
+    category: str
+    selected_option: Optional[int]
+    correct_option: int
+    is_correct: bool
+
+
+@dataclass
+class SessionRecord:
+    candidate: str
+    title: str
+    total_questions: int
+    answered_questions: int
+    correct_answers: int
+    started_at: datetime
+    finished_at: datetime
+    answers: List[AnswerRecord] = field(default_factory=list)
+    session_id: Optional[int] = None
+
+    @property
+    def accuracy(self) -> float:
+        if self.answered_questions == 0:
+            return 0.0
+        return self.correct_answers / self.answered_questions
+
+    @classmethod
+    def from_summary(cls, summary: "ExamSummary") -> "SessionRecord":
+        return cls(
+            candidate=summary.candidate,
+            title=summary.title,
+            total_questions=summary.total_questions,
+            answered_questions=summary.answered_questions,
+            correct_answers=summary.correct_answers,
+            started_at=summary.started_at,
+            finished_at=summary.finished_at,
+            answers=[
+                AnswerRecord(
+                    position=position,
+                    question_id=result.question.id,
+                    category=result.question.category.value,
+                    selected_option=result.selected_option,
+                    correct_option=result.question.correct_option,
+                    is_correct=result.is_correct,
+                )
+                for position, result in enumerate(summary.results, start=1)
+            ],
+        )
+
+
+@dataclass
+class QuestionStats:
+    question_id: str
+    attempts: int
+    correct: int
+
+    @property
+    def accuracy(self) -> float:
+        if self.attempts == 0:
+            return 0.0
+        return self.correct / self.attempts
+
+
+_WriteItem = Tuple[Optional[SessionRecord], Future, Optional[Checkpoint]]
+
+
+class ResultStore:
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_RESULT_DB,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self._path = Path(path)
+        self._batch_size = max(1, batch_size)
+        self._queue: "queue.Queue[Optional[_WriteItem]]" = queue.Queue()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+        self._reader().executescript(SCHEMA)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def submit(self, record: SessionRecord, *, checkpoint: Optional[Checkpoint] = None) -> "Future[int]":
+        # A (name, value) checkpoint is stored in the same transaction as the
+        # record, whether or not the record itself could be inserted.
+        return self._enqueue(record, checkpoint)
+
+    def save_checkpoint(self, name: str, value: int) -> "Future[None]":
+        return self._enqueue(None, (name, value))
+
+    def checkpoint(self, name: str) -> Optional[int]:
+        row = self._reader().execute("SELECT value FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return None if row is None else int(row[0])
+
+    def _enqueue(self, record: Optional[SessionRecord], checkpoint: Optional[Checkpoint]) -> Future:
+        future: Future = Future()
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("成绩库已关闭。")
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="result-writer", daemon=True)
+                self._writer.start()
+            self._queue.put((record, future, checkpoint))
+        return future
+
+    def save(self, summary: "ExamSummary", timeout: Optional[float] = DEFAULT_SAVE_TIMEOUT) -> bool:
+        try:
+            self.submit(SessionRecord.from_summary(summary)).result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            writer = self._writer
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+        self._close_reader()
+
+    def count_sessions(self, candidate: Optional[str] = None) -> int:
+        if candidate is None:
+            row = self._reader().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        else:
+            row = self._reader().execute("SELECT COUNT(*) FROM sessions WHERE candidate = ?", (candidate,)).fetchone()
+        return int(row[0])
+
+    def sessions(
+        self,
+        *,
+        candidate: Optional[str] = None,
+        title: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        before: Optional[int] = None,
+        with_answers: bool = False,
+    ) -> List[SessionRecord]:
+        # Newest first. Paging with "before", the smallest session id of the
+        # previous page, is a seek on (candidate, id) however deep the page;
+        # "offset" has to step over every skipped row.
+        clauses: List[str] = []
+        parameters: List[Any] = []
+        if candidate is not None:
+            clauses.append("candidate = ?")
+            parameters.append(candidate)
+        if title is not None:
+            clauses.append("title = ?")
+            parameters.append(title)
+        if before is not None:
+            clauses.append("id < ?")
+            parameters.append(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT {SESSION_COLUMNS} FROM sessions {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            (*parameters, limit, offset),
+        ).fetchall()
+        records = [_session_from_row(row) for row in rows]
+        if with_answers:
+            for record in records:
+                record.answers = self._answers(record.session_id)
+        return records
+
+    def latest_session(self, candidate: str) -> Optional[SessionRecord]:
+        records = self.sessions(candidate=candidate, limit=1, with_answers=True)
+        return records[0] if records else None
+
+    def session(self, session_id: int) -> Optional[SessionRecord]:
+        row = self._reader().execute(
+            f"SELECT {SESSION_COLUMNS} FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        record = _session_from_row(row)
+        record.answers = self._answers(session_id)
+        return record
+
+    def iter_session_ids(
+        self,
+        *,
+        title: Optional[str] = None,
+        fetch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[List[int]]:
+        # Oldest first, one keyset page at a time.
+        clause = "" if title is None else " AND title = ?"
+        last = 0
+        while True:
+            rows = self._reader().execute(
+                f"SELECT id FROM sessions WHERE id > ?{clause} ORDER BY id LIMIT ?",
+                (last, *(() if title is None else (title,)), fetch_size),
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [row[0] for row in rows]
+
+    def sessions_between(self, first_id: int, last_id: int, *, title: Optional[str] = None) -> List[SessionRecord]:
+        # Sessions with ids in [first_id, last_id], oldest first, with their
+        # answers read in one pass over the answers' primary key.
+        clause = "" if title is None else " AND title = ?"
+        rows = self._reader().execute(
+            f"SELECT {SESSION_COLUMNS} FROM sessions WHERE id BETWEEN ? AND ?{clause} ORDER BY id",
+            (first_id, last_id, *(() if title is None else (title,))),
+        ).fetchall()
+        records = {row[0]: _session_from_row(row) for row in rows}
+        answer_rows = self._reader().execute(
+            f"SELECT session_id, {ANSWER_COLUMNS} FROM answers WHERE session_id BETWEEN ? AND ?"
+            " ORDER BY session_id, position",
+            (first_id, last_id),
+        )
+        for row in answer_rows:
+            record = records.get(row[0])
+            if record is not None:
+                record.answers.append(_answer_from_row(row[1:]))
+        return list(records.values())
+
+    def question_results(self, question_id: str) -> List[AnswerRecord]:
+        rows = self._reader().execute(
+            f"SELECT {ANSWER_COLUMNS} FROM answers WHERE question_id = ?",
+            (question_id,),
+        ).fetchall()
+        return [_answer_from_row(row) for row in rows]
+
+    def question_stats(self, question_ids: Optional[Sequence[str]] = None) -> List[QuestionStats]:
+        query = "SELECT question_id, COUNT(*), SUM(is_correct) FROM answers"
+        parameters: Sequence[str] = ()
+        if question_ids is not None:
+            query += f" WHERE question_id IN ({', '.join('?' for _ in question_ids)})"
+            parameters = question_ids
+        rows = self._reader().execute(query + " GROUP BY question_id ORDER BY question_id", parameters).fetchall()
+        return [QuestionStats(question_id=row[0], attempts=row[1], correct=row[2] or 0) for row in rows]
+
+    def iter_answer_rows(self, *, fetch_size: int = DEFAULT_FETCH_SIZE) -> Iterator[List[Tuple[Any, ...]]]:
+        # Answers imported from the legacy text log carry no question id.
+        cursor = self._reader().execute(
+            f"SELECT session_id, {ANSWER_COLUMNS} FROM answers WHERE question_id != '' ORDER BY session_id"
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def iter_candidate_answers(
+        self,
+        candidate: str,
+        *,
+        fetch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[List[Tuple[str, str, str, int]]]:
+        # (finished_at, question_id, category, is_correct) in answer order,
+        # oldest session first.
+        cursor = self._reader().execute(
+            "SELECT s.finished_at, a.question_id, a.category, a.is_correct FROM sessions s"
+            " JOIN answers a ON a.session_id = s.id"
+            " WHERE s.candidate = ? AND a.question_id != '' ORDER BY s.id, a.position",
+            (candidate,),
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def _answers(self, session_id: Optional[int]) -> List[AnswerRecord]:
+        rows = self._reader().execute(
+            f"SELECT {ANSWER_COLUMNS} FROM answers WHERE session_id = ? ORDER BY position",
+            (session_id,),
+        ).fetchall()
+        return [_answer_from_row(row) for row in rows]
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self._path), timeout=BUSY_TIMEOUT_MS / 1000)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _close_reader(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                batch: List[_WriteItem] = []
+                # Group commit: everything that queued up while the previous
+                # transaction was running goes into the next one.
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self._batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stopping = True
+                if batch:
+                    self._commit(connection, batch)
+        finally:
+            connection.close()
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[_WriteItem]) -> None:
+        # Each record gets its own savepoint: a record the database rejects
+        # fails its own future and is left out, the rest of the group commits.
+        outcomes: List[Tuple[Future, Optional[int], Optional[BaseException]]] = []
+        try:
+            connection.execute("BEGIN")
+            for record, future, checkpoint in batch:
+                session_id: Optional[int] = None
+                error: Optional[BaseException] = None
+                if record is not None:
+                    connection.execute("SAVEPOINT record")
+                    try:
+                        session_id = _insert_session(connection, record)
+                    except sqlite3.Error as failure:
+                        connection.execute("ROLLBACK TO record")
+                        error = RecordRejectedError(str(failure))
+                    connection.execute("RELEASE record")
+                if checkpoint is not None:
+                    connection.execute("INSERT OR REPLACE INTO checkpoints (name, value) VALUES (?, ?)", checkpoint)
+                outcomes.append((future, session_id, error))
+            connection.commit()
+        except (sqlite3.Error, OSError) as error:
+            if connection.in_transaction:
+                connection.rollback()
+            for _, future, _ in batch:
+                future.set_exception(error)
+            return
+        for (record, _, _), (future, session_id, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+                continue
+            if record is not None:
+                record.session_id = session_id
+            future.set_result(session_id)
+
+
+def _insert_session(connection: sqlite3.Connection, record: SessionRecord) -> int:
+    cursor = connection.execute(
+        "INSERT INTO sessions (candidate, title, total_questions, answered_questions, correct_answers,"
+        " started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            record.candidate,
+            record.title,
+            record.total_questions,
+            record.answered_questions,
+            record.correct_answers,
+            record.started_at.isoformat(timespec="seconds"),
+            record.finished_at.isoformat(timespec="seconds"),
+        ),
+    )
+    session_id = int(cursor.lastrowid)
+    connection.executemany(
+        f"INSERT INTO answers (session_id, {ANSWER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                session_id,
+                answer.position,
+                answer.question_id,
+                answer.category,
+                answer.selected_option,
+                answer.correct_option,
+                int(answer.is_correct),
+            )
+            for answer in record.answers
+        ),
+    )
+    return session_id
+
+
+def _session_from_row(row: Sequence[Any]) -> SessionRecord:
+    return SessionRecord(
+        session_id=row[0],
+        candidate=row[1],
+        title=row[2],
+        total_questions=row[3],
+        answered_questions=row[4],
+        correct_answers=row[5],
+        started_at=datetime.fromisoformat(row[6]),
+        finished_at=datetime.fromisoformat(row[7]),
+    )
+
+
+def _answer_from_row(row: Sequence[Any]) -> AnswerRecord:
+    return AnswerRecord(
+        position=row[0],
+        question_id=row[1],
+        category=row[2],
+        selected_option=row[3],
+        correct_option=row[4],
+        is_correct=bool(row[5]),
+    )
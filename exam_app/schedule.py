@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .question_bank import QuestionBank
+from .questions import Category
+from .results import ResultStore
+
+if TYPE_CHECKING:
+    from .exam import QuestionResult
+
+RELEARN_DELAY = 10 * 60.0
+FIRST_INTERVAL = 24 * 3600.0
+SECOND_INTERVAL = 3 * 24 * 3600.0
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+LAPSE_PENALTY = 0.2
+COMPACT_SLACK = 64
+
+HeapEntry = Tuple[float, int, str]
+
+
+@dataclass
+class ReviewState:
+    question_id: str
+    category: str
+    due: float
+    interval: float
+    ease: float = DEFAULT_EASE
+    streak: int = 0
+    lapses: int = 0
+    entry: int = 0
+
+
+class ReviewSchedule:
+    """Spaced-repetition schedule of one candidate: a wrong answer comes back
+    within minutes, each correct one pushes the question further out.
+
+    Every category keeps a heap keyed by due time. Rescheduling pushes a new
+    entry and leaves the old one behind; stale entries are skipped when they
+    surface and dropped in bulk once they outnumber the live ones."""
+
+    def __init__(self, candidate: str) -> None:
+        self.candidate = candidate
+        self._states: Dict[str, ReviewState] = {}
+        self._heaps: Dict[str, List[HeapEntry]] = {}
+        self._seen: Counter = Counter()
+        self._entries = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, question_id: object) -> bool:
+        return question_id in self._states
+
+    @classmethod
+    def load(cls, store: ResultStore, candidate: str) -> "ReviewSchedule":
+        # The answer history in the result database is the schedule's
+        # persistent form, so it is replayed rather than stored twice.
+        schedule = cls(candidate)
+        for rows in store.iter_candidate_answers(candidate):
+            for finished_at, question_id, category, is_correct in rows:
+                when = datetime.fromisoformat(finished_at).timestamp()
+                schedule.record(question_id, category, bool(is_correct), when)
+        return schedule
+
+    def state(self, question_id: str) -> Optional[ReviewState]:
+        return self._states.get(question_id)
+
+    def record_result(self, result: "QuestionResult", when: Optional[float] = None) -> ReviewState:
+        return self.record(result.question.id, result.question.category.value, result.is_correct, when)
+
+    def record(self, question_id: str, category: str, is_correct: bool, when: Optional[float] = None) -> ReviewState:
+        when = time.time() if when is None else when
+        state = self._states.get(question_id)
+        if state is None:
+            state = self._states[question_id] = ReviewState(question_id, category, when, 0.0)
+            self._seen[category] += 1
+        if is_correct:
+            state.streak += 1
+            if state.streak == 1:
+                state.interval = FIRST_INTERVAL
+            elif state.streak == 2:
+                state.interval = SECOND_INTERVAL
+            else:
+                state.interval *= state.ease
+        else:
+            state.streak = 0
+            state.lapses += 1
+            state.interval = RELEARN_DELAY
+            state.ease = max(MIN_EASE, state.ease - LAPSE_PENALTY)
+        state.due = when + state.interval
+        state.entry = next(self._entries)
+        heap = self._heaps.setdefault(state.category, [])
+        heapq.heappush(heap, (state.due, state.entry, question_id))
+        if len(heap) > 2 * self._seen[state.category] + COMPACT_SLACK:
+            self._compact(state.category)
+        return state
+
+    def due(self, category: Category, limit: int, now: Optional[float] = None) -> List[str]:
+        # The most overdue questions first; k items cost O(k log n).
+        now = time.time() if now is None else now
+        heap = self._heaps.get(category.value)
+        if not heap or limit <= 0:
+            return []
+        taken: List[HeapEntry] = []
+        while heap and len(taken) < limit and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self._is_live(entry):
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return [question_id for _, _, question_id in taken]
+
+    def select(
+        self,
+        bank: QuestionBank,
+        category: Category,
+        amount: int,
+        rng: random.Random,
+        now: Optional[float] = None,
+    ) -> Tuple[List[str], int]:
+        """Questions for a practice round and how many of them were due:
+        due reviews first, then questions never answered, then the reviews
+        coming up soonest."""
+        now = time.time() if now is None else now
+        chosen = [question_id for question_id in self.due(category, amount, now) if question_id in bank]
+        due_count = len(chosen)
+        if len(chosen) < amount:
+            chosen.extend(self._unseen(bank, category, amount - len(chosen), rng))
+        if len(chosen) < amount:
+            upcoming = self.due(category, due_count + amount - len(chosen), math.inf)[due_count:]
+            chosen.extend(question_id for question_id in upcoming if question_id in bank)
+        return chosen[:amount], due_count
+
+    def _unseen(self, bank: QuestionBank, category: Category, amount: int, rng: random.Random) -> List[str]:
+        # Oversample by the number already answered so the filtered sample
+        # still holds enough, without walking the whole category.
+        sample = bank.sample_ids(category, amount + self._seen[category.value], rng)
+        return [question_id for question_id in sample if question_id not in self._states][:amount]
+
+    def _is_live(self, entry: HeapEntry) -> bool:
+        state = self._states.get(entry[2])
+        return state is not None and state.entry == entry[1]
+
+    def _compact(self, category: str) -> None:
+        heap = [entry for entry in self._heaps[category] if self._is_live(entry)]
+        heapq.heapify(heap)
+        self._heaps[category] = heap
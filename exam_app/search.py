@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+import unicodedata
+import weakref
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, DefaultDict, List, MutableMapping, Optional
+
+from .question_bank import QuestionBank
+from .questions import Question
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SEARCH_INDEX_SUFFIX = ".search.npz"
+SEARCH_INDEX_VERSION = 1
+DEFAULT_SEARCH_LIMIT = 10
+BUILD_BATCH = 4096
+PROMPT_WEIGHT = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_MATCHED_TERMS = 0.5
+_NOISE = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    return _NOISE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def index_terms(text: str) -> List[str]:
+    # Single characters serve one-character queries; overlapping bigrams
+    # stand in for words, which Chinese text does not delimit.
+    normalized = normalize_text(text)
+    return [*normalized, *(normalized[index : index + 2] for index in range(len(normalized) - 1))]
+
+
+def query_terms(query: str) -> List[str]:
+    normalized = normalize_text(query)
+    if len(normalized) <= 1:
+        return [normalized] if normalized else []
+    return [normalized[index : index + 2] for index in range(len(normalized) - 1)]
+
+
+@dataclass
+class SearchHit:
+    question_id: str
+    score: float
+
+
+class SearchIndex:
+    """Inverted index over prompt, options and explanation, stored as sorted
+    terms with compressed-row postings so it loads and queries as arrays."""
+
+    def __init__(
+        self,
+        question_ids: List[str],
+        terms: "np.ndarray",
+        offsets: "np.ndarray",
+        documents: "np.ndarray",
+        frequencies: "np.ndarray",
+        lengths: "np.ndarray",
+    ) -> None:
+        np = _require_numpy()
+        self._question_ids = question_ids
+        self._terms = terms
+        self._offsets = offsets
+        self._documents = documents
+        self._frequencies = frequencies.astype(np.float32)
+        self._lengths = lengths.astype(np.float32)
+        self._average_length = float(self._lengths.mean()) if len(self._lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self._question_ids)
+
+    @classmethod
+    def build(cls, questions: List[Question]) -> "SearchIndex":
+        np = _require_numpy()
+        vocabulary: DefaultDict[str, int] = defaultdict()
+        # A new term is numbered as it is first seen, without a Python-level
+        # branch per term.
+        vocabulary.default_factory = vocabulary.__len__
+        term_parts: List["np.ndarray"] = []
+        document_parts: List["np.ndarray"] = []
+        frequency_parts: List["np.ndarray"] = []
+        lengths = np.zeros(len(questions), dtype=np.int32)
+        for start in range(0, len(questions), BUILD_BATCH):
+            term_ids: List[int] = []
+            documents: List[int] = []
+            frequencies: List[int] = []
+            for document in range(start, min(start + BUILD_BATCH, len(questions))):
+                question = questions[document]
+                counts = Counter(index_terms(question.prompt) * PROMPT_WEIGHT)
+                counts.update(index_terms(" ".join([*question.options, question.explanation])))
+                lengths[document] = sum(counts.values())
+                term_ids.extend(map(vocabulary.__getitem__, counts))
+                documents.extend([document] * len(counts))
+                frequencies.extend(counts.values())
+            term_parts.append(np.asarray(term_ids, dtype=np.int64))
+            document_parts.append(np.asarray(documents, dtype=np.int32))
+            frequency_parts.append(np.minimum(np.asarray(frequencies, dtype=np.int64), 65535).astype(np.uint16))
+        words = np.asarray(list(vocabulary), dtype="<U2")
+        # Renumber terms in sorted order so a query term is found by binary
+        # search, then group the postings by term.
+        ranks = np.empty(len(words), dtype=np.int64)
+        ranks[np.argsort(words, kind="stable")] = np.arange(len(words))
+        term_ids = ranks[np.concatenate(term_parts)] if term_parts else np.zeros(0, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(words)))
+        return cls(
+            [question.id for question in questions],
+            np.sort(words),
+            offsets,
+            np.concatenate(document_parts)[order] if document_parts else np.zeros(0, dtype=np.int32),
+            np.concatenate(frequency_parts)[order] if frequency_parts else np.zeros(0, dtype=np.uint16),
+            lengths,
+        )
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str) -> Optional["SearchIndex"]:
+        np = _require_numpy()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != SEARCH_INDEX_VERSION or str(data["fingerprint"]) != fingerprint:
+                    return None
+                return cls(
+                    data["question_ids"].tolist(),
+                    data["terms"],
+                    data["offsets"],
+                    data["documents"],
+                    data["frequencies"],
+                    data["lengths"],
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        np = _require_numpy()
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with temporary.open("wb") as file:
+            np.savez(
+                file,
+                version=np.asarray(SEARCH_INDEX_VERSION),
+                fingerprint=np.asarray(fingerprint),
+                question_ids=np.asarray(self._question_ids),
+                terms=self._terms,
+                offsets=self._offsets,
+                documents=self._documents,
+                frequencies=self._frequencies.astype(np.uint16),
+                lengths=self._lengths.astype(np.int32),
+            )
+        os.replace(temporary, path)
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[SearchHit]:
+        np = _require_numpy()
+        terms = Counter(query_terms(query))
+        if not terms or not len(self._terms) or limit <= 0:
+            return []
+        scores = np.zeros(len(self._question_ids), dtype=np.float32)
+        matches = np.zeros(len(self._question_ids), dtype=np.int32)
+        total = len(self._question_ids)
+        for term, repeats in terms.items():
+            position = int(np.searchsorted(self._terms, term))
+            if position >= len(self._terms) or self._terms[position] != term:
+                continue
+            start, end = self._offsets[position], self._offsets[position + 1]
+            documents = self._documents[start:end]
+            frequencies = self._frequencies[start:end]
+            idf = np.log(1 + (total - len(documents) + 0.5) / (len(documents) + 0.5))
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[documents] / self._average_length)
+            scores[documents] += repeats * idf * frequencies * (BM25_K1 + 1) / (frequencies + norms)
+            matches[documents] += 1
+        # A single shared bigram says little about a longer query, so a
+        # question has to contain at least half of its distinct terms.
+        matched = np.flatnonzero(matches >= max(1, math.ceil(len(terms) * MIN_MATCHED_TERMS)))
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+        return [SearchHit(self._question_ids[document], float(scores[document])) for document in matched]
+
+
+_INDEXES: MutableMapping[QuestionBank, SearchIndex] = weakref.WeakKeyDictionary()
+_INDEXES_LOCK = threading.Lock()
+
+
+def search_index_for(bank: QuestionBank) -> SearchIndex:
+    # One index per bank, shared by every session. A bank loaded from a file
+    # keeps its index beside it and rebuilds it when the file changes.
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(bank)
+        if index is None:
+            index = _INDEXES[bank] = _load_or_build(bank)
+    return index
+
+
+def _load_or_build(bank: QuestionBank) -> SearchIndex:
+    source = Path(bank.source)
+    try:
+        stat = source.stat() if source.is_file() else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return SearchIndex.build(list(bank))
+    path = source.with_name(source.name + SEARCH_INDEX_SUFFIX)
+    fingerprint = f"{len(bank)}:{stat.st_size}:{stat.st_mtime_ns}"
+    index = SearchIndex.load(path, fingerprint)
+    if index is None:
+        index = SearchIndex.build(list(bank))
+        try:
+            index.save(path, fingerprint)
+        except OSError:
+            pass
+    return index
+
+
+def _require_numpy() -> Any:
+    try:
+        import numpy  # type: ignore
+    except ImportError:
+        raise RuntimeError("题目检索需要安装 numpy 库：pip install numpy") from None
+    return numpy
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Set, Union
+
+from .adaptive import AdaptivePool
+from .exam import build_exam_engine
+from .journal import DEFAULT_JOURNAL_DIR, JournalStore
+from .question_bank import QuestionBank, load_bank
+from .results import DEFAULT_RESULT_DB, ResultStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 256
+LINE_ENDING = "\r\n"
+
+
+class StreamIO:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._loop = loop
+
+    def write(self, text: str) -> None:
+        self._send(text + LINE_ENDING)
+
+    def read(self, prompt: str) -> str:
+        self._send(prompt)
+        future = asyncio.run_coroutine_threadsafe(self._readline(), self._loop)
+        line = future.result()
+        if not line:
+            raise EOFError
+        return line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def _send(self, text: str) -> None:
+        if self._writer.is_closing():
+            raise EOFError
+        self._loop.call_soon_threadsafe(self._writer.write, text.encode("utf-8"))
+
+    async def _readline(self) -> bytes:
+        try:
+            await self._writer.drain()
+            return await self._reader.readline()
+        except (ConnectionError, ValueError):
+            return b""
+
+
+class ExamServer:
+    def __init__(
+        self,
+        bank: QuestionBank,
+        store: Optional[ResultStore] = None,
+        adaptive_pool: Optional[AdaptivePool] = None,
+        journals: Optional[JournalStore] = None,
+        *,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ) -> None:
+        self._bank = bank
+        self._store = store
+        self._adaptive_pool = adaptive_pool
+        self._journals = journals
+        self._max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="exam-session")
+        self._sessions: Set[asyncio.StreamReader] = set()
+        self._tasks: Set["asyncio.Future[None]"] = set()
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if len(self._sessions) >= self._max_sessions:
+            writer.write(("考场座位已满，请稍后再试。" + LINE_ENDING).encode("utf-8"))
+            await self._close_writer(writer)
+            return
+        loop = asyncio.get_running_loop()
+        io = StreamIO(reader, writer, loop)
+        self._sessions.add(reader)
+        task = loop.run_in_executor(
+            self._executor,
+            _run_session,
+            io,
+            self._bank,
+            self._store,
+            self._adaptive_pool,
+            self._journals,
+        )
+        self._tasks.add(task)
+        try:
+            await task
+        finally:
+            self._tasks.discard(task)
+            self._sessions.discard(reader)
+            await self._close_writer(writer)
+
+    async def shutdown(self) -> None:
+        for reader in list(self._sessions):
+            reader.feed_eof()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def _close_writer(self, writer: asyncio.StreamWriter) -> None:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def _run_session(
+    io: StreamIO,
+    bank: QuestionBank,
+    store: Optional[ResultStore],
+    adaptive_pool: Optional[AdaptivePool],
+    journals: Optional[JournalStore],
+) -> None:
+    engine = build_exam_engine(None, io, bank, store, adaptive_pool, journals)
+    try:
+        engine.run()
+    except EOFError:
+        pass
+
+
+async def serve_forever(
+    bank: Optional[QuestionBank] = None,
+    *,
+    results_path: Union[str, Path] = DEFAULT_RESULT_DB,
+    journal_dir: Union[str, Path] = DEFAULT_JOURNAL_DIR,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_path: Optional[str] = None,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+) -> None:
+    bank = bank if bank is not None else load_bank()
+    store = ResultStore(results_path)
+    # Item-information tables are built once and shared by every session.
+    adaptive_pool = await asyncio.to_thread(AdaptivePool.from_bank, bank, store.question_stats())
+    exam_server = ExamServer(bank, store, adaptive_pool, JournalStore(journal_dir), max_sessions=max_sessions)
+    if unix_path:
+        server = await asyncio.start_unix_server(exam_server.handle_connection, path=unix_path)
+        location = unix_path
+    else:
+        server = await asyncio.start_server(exam_server.handle_connection, host=host, port=port)
+        location = f"{host}:{port}"
+    print(f"考试服务已启动：{location}，最多同时接待{max_sessions}名考生。按Ctrl+C停止。")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await exam_server.shutdown()
+        store.close()
+
+
+def run_server(
+    bank: Optional[QuestionBank] = None,
+    *,
+    results_path: Union[str, Path] = DEFAULT_RESULT_DB,
+    journal_dir: Union[str, Path] = DEFAULT_JOURNAL_DIR,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_path: Optional[str] = None,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+) -> None:
+    try:
+        asyncio.run(
+            serve_forever(
+                bank,
+                results_path=results_path,
+                journal_dir=journal_dir,
+                host=host,
+                port=port,
+                unix_path=unix_path,
+                max_sessions=max_sessions,
+            )
+        )
+    except KeyboardInterrupt:
+        print("\n考试服务已停止。")
@@ -1,41 +1,328 @@
 from __future__ import annotations
 
 import threading
-from typing import Optional
+import time
+from collections import deque
+from concurrent.futures import Future
+from enum import IntEnum
+from pathlib import Path
+from typing import Callable, Deque, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from .audio_cache import AudioCache, AudioPlayer, find_audio_player
+from .metrics import (
+    SPEECH_CANCELLED,
+    SPEECH_DROPPED,
+    SPEECH_FAILURES,
+    SPEECH_QUEUE_WAIT_SECONDS,
+    SPEECH_SYNTHESIS_SECONDS,
+)
+from .tts_backends import (
+    DEFAULT_RATE,
+    DEFAULT_VOLUME,
+    BackendFactory,
+    FakeBackend,
+    SpeechBackend,
+    default_backend,
+    inline_backend,
+)
+
+DEFAULT_QUEUE_SIZE = 32
+PROCESS_BACKEND = "process"
+INLINE_BACKEND = "inline"
+SPEECH_BACKENDS = {PROCESS_BACKEND: default_backend, INLINE_BACKEND: inline_backend}
+MAX_COALESCED_CHARS = 400
+SENTENCE_ENDINGS = ("。", "！", "？", "：", "；", ".", "!", "?")
+
+T = TypeVar("T")
+
+
+class SpeechPriority(IntEnum):
+    ECHO = 0
+    MESSAGE = 1
+    FEEDBACK = 2
+    QUESTION = 3
+
+
+class _Utterance:
+    __slots__ = ("parts", "length", "priority", "epoch", "enqueued")
+
+    def __init__(self, text: str, priority: SpeechPriority, epoch: int) -> None:
+        self.parts = [text]
+        self.length = len(text)
+        self.priority = priority
+        self.epoch = epoch
+        self.enqueued = time.perf_counter()
 
 
 class TextToSpeech:
-    def __init__(self) -> None:
-        self._engine = self._init_engine()
-        self._lock = threading.Lock()
+    def __init__(
+        self,
+        *,
+        backend: Optional[BackendFactory] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        cache: Optional[AudioCache] = None,
+        player: Optional[AudioPlayer] = None,
+    ) -> None:
+        self._backend_factory = backend if backend is not None else default_backend
+        self._engine: Optional[SpeechBackend] = None
+        self._voice: Optional[str] = None
+        self._cache = cache
+        self._player = player
+        self._pending: Deque[_Utterance] = deque()
+        self._epoch = 0
+        self._tasks: Deque[Tuple[Callable[[], object], Future]] = deque()
+        self._queue_size = max(1, queue_size)
+        self._speaking = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._ready = threading.Event()
+        # Starting the backend can take seconds, so it happens on the worker
+        # while the first screen is already shown; speech requested in the
+        # meantime waits in the queue.
+        self._worker = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._worker.start()
 
     @property
     def available(self) -> bool:
-        return self._engine is not None
+        return self._engine is not None or not self._ready.is_set()
 
-    def speak(self, text: str) -> None:
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def busy(self) -> bool:
+        with self._condition:
+            return self._speaking or bool(self._pending)
+
+    def speak(self, text: str, priority: SpeechPriority = SpeechPriority.MESSAGE) -> None:
         if not self.available:
             return
         if not text:
             return
-        with self._lock:
+        with self._condition:
+            if self._closed:
+                return
+            last = self._pending[-1] if self._pending else None
+            if (
+                last is not None
+                and last.priority == priority
+                and last.epoch == self._epoch
+                and last.length + len(text) <= MAX_COALESCED_CHARS
+            ):
+                # Consecutive messages become one utterance, saving an engine
+                # round-trip and the pause that comes with it.
+                last.parts.append(text)
+                last.length += len(text)
+                return
+            if len(self._pending) >= self._queue_size and not self._evict(priority):
+                SPEECH_DROPPED.inc()
+                return
+            self._pending.append(_Utterance(text, priority, self._epoch))
+            self._condition.notify_all()
+
+    def advance(self, keep: SpeechPriority = SpeechPriority.MESSAGE) -> None:
+        """Start a new screen; pending speech below ``keep`` is stale."""
+        with self._condition:
+            self._epoch += 1
+            kept = deque(utterance for utterance in self._pending if utterance.priority >= keep)
+            if len(kept) < len(self._pending):
+                SPEECH_CANCELLED.inc(len(self._pending) - len(kept))
+                self._pending = kept
+            self._condition.notify_all()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        self._ready.wait(timeout)
+        return self._engine is not None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: (self._ready.is_set() and self._engine is None) or not (self._speaking or self._pending),
+                timeout,
+            )
+
+    def cancel(self) -> None:
+        with self._condition:
+            self._epoch += 1
+            if self._pending:
+                SPEECH_CANCELLED.inc(len(self._pending))
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def prewarm(self, texts: Iterable[str]) -> int:
+        if not self.wait_ready() or self._cache is None:
+            return 0
+        return self._call_on_worker(lambda: self._render_missing(texts))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+        self._worker.join(timeout)
+        if self._cache is not None:
+            self._cache.save()
+
+    def _evict(self, priority: SpeechPriority) -> bool:
+        # The queue is full: make room by dropping the oldest of the least
+        # important utterances, unless the new one matters even less.
+        victim = min(range(len(self._pending)), key=lambda index: self._pending[index].priority)
+        if self._pending[victim].priority > priority:
+            return False
+        del self._pending[victim]
+        SPEECH_DROPPED.inc()
+        return True
+
+    def _call_on_worker(self, function: Callable[[], T]) -> T:
+        future: Future = Future()
+        with self._condition:
+            if self._closed or self._engine is None:
+                raise RuntimeError("语音引擎不可用。")
+            self._tasks.append((function, future))
+            self._condition.notify_all()
+        return future.result()
+
+    def _run(self) -> None:
+        # pyttsx3 drivers are bound to the thread that created them, so the
+        # backend lives and dies on this worker thread.
+        engine = self._init_engine()
+        if engine is not None:
+            self._voice = engine.voice
+            if self._player is None and self._cache is not None:
+                self._player = find_audio_player()
+        with self._condition:
+            self._engine = engine
+            self._ready.set()
+            if engine is None:
+                self._pending.clear()
+                self._cancel_tasks()
+            self._condition.notify_all()
+        while self._engine is not None:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or bool(self._tasks or self._pending))
+                if self._closed:
+                    self._cancel_tasks()
+                    break
+                if self._tasks:
+                    function, future = self._tasks.popleft()
+                    utterance = None
+                else:
+                    utterance = self._pending.popleft()
+                self._speaking = True
+            if utterance is None:
+                try:
+                    future.set_result(function())
+                except Exception as error:
+                    future.set_exception(error)
+            else:
+                started = time.perf_counter()
+                SPEECH_QUEUE_WAIT_SECONDS.observe(started - utterance.enqueued)
+                try:
+                    self._say(utterance.parts)
+                except Exception:
+                    # A backend fault costs this utterance only; the process
+                    # backend restarts its worker for the next one.
+                    SPEECH_FAILURES.inc()
+                else:
+                    SPEECH_SYNTHESIS_SECONDS.observe(time.perf_counter() - started)
+            with self._condition:
+                self._speaking = False
+                self._condition.notify_all()
+        if engine is not None:
             try:
-                self._engine.say(text)
-                self._engine.runAndWait()
+                engine.close()
             except Exception:
-                self._engine = None
+                pass
 
-    def _init_engine(self) -> Optional[object]:
-        try:
-            import pyttsx3  # type: ignore
+    def _cancel_tasks(self) -> None:
+        while self._tasks:
+            _, future = self._tasks.popleft()
+            future.set_exception(RuntimeError("语音引擎不可用。"))
 
-            engine = pyttsx3.init()
-            engine.setProperty("rate", 165)
-            engine.setProperty("volume", 1.0)
-            return engine
+    def _say(self, parts: Sequence[str]) -> None:
+        # A coalesced utterance often mixes a pre-rendered question with a
+        # dynamic header: cached parts are played, and each run of uncached
+        # parts in between is synthesized as one sentence, keeping the order.
+        missing: List[str] = []
+        for part in parts:
+            path = self._cached_audio(part)
+            if path is not None:
+                if missing:
+                    self._engine.say(join_utterances(missing))
+                    missing = []
+                try:
+                    self._player(path)
+                    continue
+                except Exception:
+                    pass
+            missing.append(part)
+        if missing:
+            self._engine.say(join_utterances(missing))
+
+    def _cached_audio(self, text: str) -> Optional[Path]:
+        if self._cache is None or self._player is None:
+            return None
+        return self._cache.lookup(self._cache_key(text))
+
+    def _cache_key(self, text: str) -> str:
+        return AudioCache.make_key(text, self._voice, DEFAULT_RATE, DEFAULT_VOLUME)
+
+    def _render_missing(self, texts: Iterable[str]) -> int:
+        rendered = 0
+        for text in dict.fromkeys(texts):
+            if not text:
+                continue
+            key = self._cache_key(text)
+            if self._cache.lookup(key) is not None:
+                continue
+            try:
+                self._engine.save(text, str(self._cache.staging_path(key)))
+            except Exception:
+                SPEECH_FAILURES.inc()
+                continue
+            if self._cache.commit(key) is not None:
+                rendered += 1
+        self._cache.save()
+        return rendered
+
+    def _init_engine(self) -> Optional[SpeechBackend]:
+        try:
+            return self._backend_factory()
         except Exception:
             return None
 
 
-def build_tts() -> TextToSpeech:
-    return TextToSpeech()
+class FakeTextToSpeech(TextToSpeech):
+    """Speaker for headless runs: every utterance takes ``delay`` seconds and
+    starting the engine takes ``init_delay`` seconds."""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        *,
+        init_delay: float = 0.0,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        cache: Optional[AudioCache] = None,
+        player: Optional[AudioPlayer] = None,
+    ) -> None:
+        self._delay = max(0.0, delay)
+        self._init_delay = max(0.0, init_delay)
+        self.spoken: List[str] = []
+        super().__init__(backend=self._start_fake, queue_size=queue_size, cache=cache, player=player)
+
+    def _start_fake(self) -> SpeechBackend:
+        if self._init_delay:
+            time.sleep(self._init_delay)
+        return FakeBackend(self._delay, self.spoken)
+
+
+def join_utterances(parts: Sequence[str]) -> str:
+    if len(parts) == 1:
+        return parts[0]
+    return "".join(part if part.endswith(SENTENCE_ENDINGS) else part + "。" for part in parts)
+
+
+def build_tts(cache: Optional[AudioCache] = None, *, backend: str = PROCESS_BACKEND) -> TextToSpeech:
+    return TextToSpeech(backend=SPEECH_BACKENDS[backend], cache=cache if cache is not None else AudioCache())
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import multiprocessing
+import signal
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Callable, List, Optional, Protocol, Tuple
+
+from .metrics import SPEECH_RESTARTS
+
+DEFAULT_RATE = 165
+DEFAULT_VOLUME = 1.0
+DEFAULT_UTTERANCE_TIMEOUT = 120.0
+START_TIMEOUT = 30.0
+SHUTDOWN_TIMEOUT = 2.0
+MIN_UPTIME = 5.0
+RESTART_DELAY = 1.0
+
+
+class SpeechError(RuntimeError):
+    pass
+
+
+class SpeechBackend(Protocol):
+    """A speech synthesizer. Calls block until the text has been spoken or
+    saved, and come from a single thread, the speaker's worker."""
+
+    voice: Optional[str]
+
+    def say(self, text: str) -> None: ...
+
+    def save(self, text: str, path: str) -> None: ...
+
+    def close(self) -> None: ...
+
+
+BackendFactory = Callable[[], SpeechBackend]
+
+
+class Pyttsx3Backend:
+    def __init__(self, rate: int = DEFAULT_RATE, volume: float = DEFAULT_VOLUME) -> None:
+        import pyttsx3  # type: ignore
+
+        self._engine = pyttsx3.init()
+        self._engine.setProperty("rate", rate)
+        self._engine.setProperty("volume", volume)
+        try:
+            self.voice: Optional[str] = self._engine.getProperty("voice")
+        except Exception:
+            self.voice = None
+
+    def say(self, text: str) -> None:
+        self._engine.say(text)
+        self._engine.runAndWait()
+
+    def save(self, text: str, path: str) -> None:
+        self._engine.save_to_file(text, path)
+        self._engine.runAndWait()
+
+    def close(self) -> None:
+        try:
+            self._engine.stop()
+        except Exception:
+            pass
+
+
+class FakeBackend:
+    """Stand-in for headless runs and tests: every call takes ``delay``
+    seconds, spoken text is appended to ``spoken`` and saved files hold the
+    text itself."""
+
+    def __init__(self, delay: float = 0.0, spoken: Optional[List[str]] = None) -> None:
+        self.voice: Optional[str] = "fake"
+        self._delay = max(0.0, delay)
+        self.spoken = spoken if spoken is not None else []
+
+    def say(self, text: str) -> None:
+        if self._delay:
+            time.sleep(self._delay)
+        self.spoken.append(text)
+
+    def save(self, text: str, path: str) -> None:
+        if self._delay:
+            time.sleep(self._delay)
+        Path(path).write_bytes(text.encode("utf-8"))
+
+    def close(self) -> None:
+        pass
+
+
+class ProcessBackend:
+    """Runs another backend in a child process and talks to it over a pipe,
+    so synthesis does not hold the exam's GIL and a crashing or hung driver
+    takes one utterance with it rather than the speaker.
+
+    ``factory`` builds the real backend inside the child and must be
+    picklable, e.g. a class or a functools.partial. A dead child is
+    replaced on the next call; one that died young is given a pause first,
+    as the exam hall does with its workers."""
+
+    def __init__(self, factory: BackendFactory, *, timeout: float = DEFAULT_UTTERANCE_TIMEOUT) -> None:
+        self._factory = factory
+        self._timeout = timeout
+        # The speaker already runs threads; forking it could copy a held lock.
+        self._context = multiprocessing.get_context("spawn")
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._channel: Optional[Connection] = None
+        self._started_at = 0.0
+        self.voice: Optional[str] = None
+        self.restarts = 0
+        self._start()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process is not None else None
+
+    def say(self, text: str) -> None:
+        self._call(("say", text))
+
+    def save(self, text: str, path: str) -> None:
+        self._call(("save", text, path))
+
+    def close(self) -> None:
+        process, channel = self._process, self._channel
+        self._process = self._channel = None
+        if process is None or channel is None:
+            return
+        try:
+            channel.send(None)
+        except OSError:
+            pass
+        process.join(SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        channel.close()
+
+    def _call(self, request: Tuple[str, ...]) -> None:
+        if self._process is None or not self._process.is_alive():
+            self._restart()
+        assert self._channel is not None
+        try:
+            self._channel.send(request)
+            if not self._channel.poll(self._timeout):
+                self._discard()
+                raise SpeechError("语音进程长时间无响应。")
+            error = self._channel.recv()
+        except (EOFError, OSError) as failure:
+            self._discard()
+            raise SpeechError("语音进程意外退出。") from failure
+        if error is not None:
+            # The child exits after a failure; the next call starts a new one.
+            self._discard()
+            raise SpeechError(error)
+
+    def _start(self) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=_backend_main, args=(child, self._factory), name="tts-backend", daemon=True)
+        process.start()
+        child.close()
+        self._process, self._channel = process, parent
+        self._started_at = time.monotonic()
+        try:
+            if not parent.poll(START_TIMEOUT):
+                raise SpeechError("语音进程启动超时。")
+            ready, detail = parent.recv()
+        except (EOFError, OSError) as failure:
+            self._discard()
+            raise SpeechError("语音进程启动失败。") from failure
+        except SpeechError:
+            self._discard()
+            raise
+        if not ready:
+            self._discard()
+            raise SpeechError(detail)
+        self.voice = detail
+
+    def _restart(self) -> None:
+        self._discard()
+        if time.monotonic() - self._started_at < MIN_UPTIME:
+            # Do not spin when the child dies right after starting.
+            time.sleep(RESTART_DELAY)
+        self.restarts += 1
+        SPEECH_RESTARTS.inc()
+        self._start()
+
+    def _discard(self) -> None:
+        process, channel = self._process, self._channel
+        self._process = self._channel = None
+        if process is not None:
+            if process.is_alive():
+                process.kill()
+            process.join()
+        if channel is not None:
+            channel.close()
+
+
+def _backend_main(channel: Connection, factory: BackendFactory) -> None:
+    # Ctrl+C reaches the whole process group; the speaker shuts us down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        backend = factory()
+    except Exception as error:
+        channel.send((False, f"语音引擎初始化失败：{error}"))
+        return
+    channel.send((True, backend.voice))
+    try:
+        while True:
+            try:
+                request = channel.recv()
+            except EOFError:
+                return
+            if request is None:
+                return
+            try:
+                if request[0] == "say":
+                    backend.say(request[1])
+                else:
+                    backend.save(request[1], request[2])
+            except Exception as error:
+                # A driver that raised may be left in a bad state; exit and
+                # let the next utterance start from a fresh one.
+                channel.send(f"语音合成失败：{error}")
+                return
+            channel.send(None)
+    finally:
+        backend.close()
+
+
+def default_backend() -> SpeechBackend:
+    return ProcessBackend(Pyttsx3Backend)
+
+
+def inline_backend() -> SpeechBackend:
+    return Pyttsx3Backend()
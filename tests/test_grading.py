@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+from exam_app.grading import GradingError, GradingResult, _wait_all, grade_file
+from exam_app.question_bank import load_bank
+from exam_app.results import AnswerRecord, ResultStore, SessionRecord
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    yield store
+    store.close()
+
+
+def answer_key(bank, question_ids):
+    return {question_id: bank.get(question_id).correct_option for question_id in question_ids}
+
+
+def write_csv(path, header, rows):
+    with path.open("w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def test_csv_sheets_are_graded_against_the_bank(bank, store, tmp_path):
+    pytest.importorskip("numpy")
+    question_ids = ["basic-1", "word-1", "excel-1", "ppt-1"]
+    key = answer_key(bank, question_ids)
+    right = [str(key[question_id] + 1) for question_id in question_ids]
+    wrong = [str((key[question_id] + 1) % len(bank.get(question_id).options) + 1) for question_id in question_ids]
+    path = tmp_path / "sheets.csv"
+    write_csv(
+        path,
+        ["candidate", *question_ids],
+        [
+            ["张三", *right],
+            ["李四", *wrong[:2], "", "9"],
+            ["", *right],
+        ],
+    )
+    result = grade_file(store, path, bank, chunk_size=1)
+    assert (result.graded, result.skipped, result.answers, result.correct) == (2, 1, 8, 4)
+    full = store.latest_session("张三")
+    assert (full.total_questions, full.answered_questions, full.correct_answers) == (4, 4, 4)
+    partial = store.latest_session("李四")
+    # A blank cell and a mark beyond the options both count as no answer.
+    assert (partial.total_questions, partial.answered_questions, partial.correct_answers) == (4, 2, 0)
+    assert [answer.selected_option for answer in partial.answers][2:] == [None, None]
+
+
+def test_jsonl_sheets_skip_unknown_questions(bank, store, tmp_path):
+    pytest.importorskip("numpy")
+    key = answer_key(bank, ["basic-2", "excel-3"])
+    path = tmp_path / "sheets.jsonl"
+    lines = [
+        {"candidate": "张三", "answers": {question_id: option + 1 for question_id, option in key.items()}},
+        {"candidate": "李四", "answers": {"missing-1": 1}},
+        "not json",
+    ]
+    path.write_text("\n".join(json.dumps(line, ensure_ascii=False) for line in lines), encoding="utf-8")
+    result = grade_file(store, path, bank)
+    assert (result.graded, result.skipped, result.correct) == (1, 2, 2)
+
+
+def test_csv_with_an_unknown_question_column_is_refused(bank, store, tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "sheets.csv"
+    write_csv(path, ["candidate", "missing-1"], [["张三", "1"]])
+    with pytest.raises(GradingError):
+        grade_file(store, path, bank)
+
+
+def test_sheets_the_store_rejects_are_counted_as_skipped(store):
+    finished = datetime(2024, 5, 1, 9, 0)
+    answer = AnswerRecord(1, "basic-1", "计算机基础知识", 2, 2, True)
+    good = SessionRecord("张三", "批量阅卷", 1, 1, 1, finished, finished, [answer])
+    # Two answers at one position break the answers primary key.
+    bad = SessionRecord("李四", "批量阅卷", 2, 2, 2, finished, finished, [answer, answer])
+    result = GradingResult(graded=0, skipped=0, answers=0, correct=0)
+    pending = [(record, store.submit(record)) for record in (good, bad)]
+    _wait_all(pending, result)
+    assert (result.graded, result.skipped, result.answers, result.correct) == (1, 1, 1, 1)
+    assert pending == []
+    assert store.count_sessions() == 1
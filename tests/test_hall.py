@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import socket
+from datetime import datetime
+
+import pytest
+
+from exam_app.hall import ExamHall, RemoteResultStore
+from exam_app.results import AnswerRecord, ResultStore, SessionRecord
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="the hall tests listen on a Unix socket")
+
+
+def record(candidate: str) -> SessionRecord:
+    finished = datetime(2024, 5, 1, 9, 0)
+    answers = [AnswerRecord(1, "basic-1", "计算机基础知识", 2, 2, True)]
+    return SessionRecord(candidate, "综合考试", 1, 1, 1, finished, finished, answers)
+
+
+@pytest.fixture
+def hall(tmp_path):
+    hall = ExamHall(
+        results_path=tmp_path / "results.db",
+        journal_dir=tmp_path / "journals",
+        unix_path=str(tmp_path / "hall.sock"),
+        workers=2,
+        sessions_per_worker=1,
+    )
+    yield hall
+    hall._stop()
+
+
+def test_one_writer_commits_for_every_worker_slot(hall, tmp_path):
+    hall._writer = hall._start_writer()
+    stores = [RemoteResultStore(tmp_path / "results.db", channel) for channel in hall._worker_channels]
+    try:
+        ids = [store.submit(record(f"考生{slot}")).result(10) for slot, store in enumerate(stores)]
+    finally:
+        for store in stores:
+            store.close()
+    assert len(set(ids)) == 2
+    reader = ResultStore(tmp_path / "results.db")
+    try:
+        assert reader.count_sessions() == 2
+    finally:
+        reader.close()
+
+
+def test_a_torn_message_costs_only_its_slot_until_the_pipe_is_replaced(hall, tmp_path):
+    hall._writer = hall._start_writer()
+    # A worker killed mid-send leaves bytes that are not a whole message.
+    hall._worker_channels[0].send_bytes(b"\x80not a pickle")
+    other = RemoteResultStore(tmp_path / "results.db", hall._worker_channels[1])
+    try:
+        assert other.submit(record("李四")).result(10)
+    finally:
+        other.close()
+    hall._replace_channel(0)
+    replaced = RemoteResultStore(tmp_path / "results.db", hall._worker_channels[0])
+    try:
+        assert replaced.submit(record("张三")).result(10)
+    finally:
+        replaced.close()
+    assert hall._writer.is_alive()
+
+
+def test_a_killed_worker_is_restarted_and_takes_candidates(hall, tmp_path):
+    listener = hall._bind()
+    try:
+        hall._writer = hall._start_writer()
+        hall._start_worker(0, listener)
+        first = hall._workers[0]
+        first.kill()
+        first.join()
+        hall._supervise(listener)
+        assert hall.restarts == 1
+        assert hall._workers[0] is not first and hall._workers[0].is_alive()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(30)
+            client.connect(hall._unix_path)
+            assert client.recv(4096)
+    finally:
+        hall._stop()
+        listener.close()
+        os.unlink(hall._unix_path)
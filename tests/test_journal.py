@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from exam_app.console import ScriptedIO
+from exam_app.exam import ExamEngine
+from exam_app.journal import KIND_FIXED, JournalStore, read_journal
+from exam_app.papers import Paper
+from exam_app.question_bank import load_bank
+from exam_app.results import ResultStore
+
+CANDIDATE = "张三"
+
+
+def start(journals: JournalStore, question_ids=("basic-1", "basic-2", "basic-3")):
+    return journals.start(
+        candidate=CANDIDATE,
+        title="综合考试",
+        kind=KIND_FIXED,
+        immediate_feedback=False,
+        started_at=datetime(2024, 5, 1, 9, 30),
+        question_ids=question_ids,
+    )
+
+
+def test_claim_drops_a_torn_last_line_and_appends_after_it(tmp_path):
+    journals = JournalStore(tmp_path)
+    journal = start(journals)
+    journal.append(1, "basic-1", 2)
+    journal.append(2, "basic-2", 0)
+    journal.close()
+    # The process died halfway through writing the third answer.
+    with journal.path.open("ab") as file:
+        file.write(b'{"p": 3, "q": "ba')
+
+    (found,) = journals.interrupted(CANDIDATE)
+    claimed = journals.claim(found)
+    assert [(entry.position, entry.question_id, entry.selected_option) for entry in claimed.entries] == [
+        (1, "basic-1", 2),
+        (2, "basic-2", 0),
+    ]
+    assert claimed.journal.path.stat().st_size == claimed.valid_length
+    claimed.journal.append(3, "basic-3", 1)
+    claimed.journal.close()
+    assert [entry.position for entry in read_journal(found.path).entries] == [1, 2, 3]
+
+
+def test_a_claimed_journal_cannot_be_claimed_again(tmp_path):
+    journal = start(JournalStore(tmp_path))
+    journal.close()
+    first, second = JournalStore(tmp_path), JournalStore(tmp_path)
+    claimed = first.claim(first.interrupted(CANDIDATE)[0])
+    with pytest.raises(RuntimeError):
+        second.claim(second.interrupted(CANDIDATE)[0])
+    with pytest.raises(RuntimeError):
+        first.claim(claimed)
+    claimed.journal.close(remove=True)
+    assert first.interrupted(CANDIDATE) == []
+    assert second.interrupted(CANDIDATE) == []
+
+
+def test_a_running_session_is_not_offered_elsewhere(tmp_path):
+    journal = start(JournalStore(tmp_path))
+    other = JournalStore(tmp_path)
+    for found in other.interrupted(CANDIDATE):
+        with pytest.raises(RuntimeError):
+            other.claim(found)
+    journal.close(remove=True)
+
+
+def test_closing_keeps_the_journal_unless_it_is_removed(tmp_path):
+    journals = JournalStore(tmp_path)
+    start(journals).close()
+    (found,) = journals.interrupted(CANDIDATE)
+    journals.claim(found).journal.close(remove=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_interrupted_paper_is_resumed_where_it_stopped(tmp_path):
+    bank = load_bank()
+    paper = Paper(number=1, seed="0", question_ids=["basic-1", "word-1", "excel-1"])
+    store = ResultStore(tmp_path / "results.db")
+    journals = JournalStore(tmp_path / "journals")
+    try:
+        # The terminal closes after two answers.
+        with pytest.raises(EOFError):
+            ExamEngine(bank, io=ScriptedIO([CANDIDATE, "1", "2"]), store=store, journals=journals).run_paper(paper)
+        (path,) = journals.directory.iterdir()
+        with path.open("ab") as file:
+            file.write(b'{"p": 3')
+        ExamEngine(bank, io=ScriptedIO([CANDIDATE, "Y", "3"]), store=store, journals=journals).run_paper(paper)
+        record = store.latest_session(CANDIDATE)
+    finally:
+        store.close()
+    assert record.total_questions == 3
+    assert [answer.question_id for answer in record.answers] == paper.question_ids
+    assert [answer.selected_option for answer in record.answers] == [0, 1, 2]
+    assert list(journals.directory.iterdir()) == []
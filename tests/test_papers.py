@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from exam_app.papers import PaperGenerationError, PaperSpec, generate_papers, load_paper, write_papers
+from exam_app.question_bank import load_bank
+from exam_app.questions import Category
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+def default_spec(**options) -> PaperSpec:
+    # What generate-papers uses when only the output file is given.
+    return PaperSpec(quotas={category: 4 for category in Category}, **options)
+
+
+@pytest.mark.parametrize("count", [5, 30, 200])
+def test_defaults_work_on_the_built_in_bank(bank, count):
+    papers = list(generate_papers(bank, default_spec(), count))
+    assert [paper.number for paper in papers] == list(range(1, count + 1))
+    for paper in papers:
+        assert len(paper.question_ids) == len(set(paper.question_ids)) == 16
+        assert paper.categories == {category.value: 4 for category in Category}
+
+
+def test_neighbours_share_at_most_the_allowed_overlap_per_category(bank):
+    # 20% of four questions rounds up to one shared question per category.
+    papers = list(generate_papers(bank, default_spec(), 50, seed="overlap"))
+    for previous, current in zip(papers, papers[1:]):
+        shared = set(previous.question_ids) & set(current.question_ids)
+        for category in Category:
+            assert sum(bank.get(question_id).category == category for question_id in shared) <= 1
+
+
+def test_no_two_papers_are_the_same(bank):
+    papers = list(generate_papers(bank, default_spec(), 200))
+    assert len({tuple(sorted(paper.question_ids)) for paper in papers}) == len(papers)
+
+
+def test_same_seed_gives_the_same_papers(bank):
+    first = [paper.question_ids for paper in generate_papers(bank, default_spec(), 10, seed="a")]
+    second = [paper.question_ids for paper in generate_papers(bank, default_spec(), 10, seed="a")]
+    assert first == second
+
+
+def test_quota_larger_than_the_category_is_rejected(bank):
+    with pytest.raises(PaperGenerationError):
+        list(generate_papers(bank, PaperSpec(quotas={Category.WORD: 9}), 1))
+
+
+def test_overlap_that_cannot_be_met_is_reported(bank):
+    # Every Word question is on each paper, so neighbours cannot differ.
+    with pytest.raises(PaperGenerationError):
+        list(generate_papers(bank, PaperSpec(quotas={Category.WORD: 8}, max_overlap=0.5), 2))
+
+
+def test_written_papers_can_be_loaded_by_seat(bank, tmp_path):
+    path = tmp_path / "papers.jsonl"
+    papers = list(generate_papers(bank, default_spec(), 3))
+    assert write_papers(papers, path) == 3
+    assert load_paper(path, 2).question_ids == papers[1].question_ids
+    with pytest.raises(PaperGenerationError):
+        load_paper(path, 4)
+
+
+def test_failed_generation_keeps_the_existing_file(bank, tmp_path):
+    path = tmp_path / "papers.jsonl"
+    write_papers(generate_papers(bank, default_spec(), 3), path)
+    before = path.read_text(encoding="utf-8")
+    with pytest.raises(PaperGenerationError):
+        write_papers(generate_papers(bank, PaperSpec(quotas={Category.WORD: 8}, max_overlap=0.5), 2), path)
+    assert path.read_text(encoding="utf-8") == before
+    assert [json.loads(line)["number"] for line in before.splitlines()] == [1, 2, 3]
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from exam_app.results import AnswerRecord, RecordRejectedError, ResultStore, SessionRecord
+
+
+def record(candidate: str, positions=(1, 2)) -> SessionRecord:
+    finished = datetime(2024, 5, 1, 9, 0)
+    answers = [AnswerRecord(position, f"basic-{position}", "计算机基础知识", 0, 0, True) for position in positions]
+    return SessionRecord(candidate, "综合考试", len(answers), len(answers), len(answers), finished, finished, answers)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    yield store
+    store.close()
+
+
+def test_a_rejected_record_leaves_the_rest_of_the_group(store):
+    futures = [store.submit(record(f"考生{index}")) for index in range(4)]
+    # Two answers at the same position break the answers primary key.
+    futures.insert(2, store.submit(record("重复", positions=(1, 1)), checkpoint=("import", 42)))
+    with pytest.raises(RecordRejectedError):
+        futures[2].result()
+    assert all(isinstance(future.result(), int) for index, future in enumerate(futures) if index != 2)
+    assert store.count_sessions() == 4
+    assert store.count_sessions("重复") == 0
+    # The checkpoint goes in with the group even though its record did not.
+    assert store.checkpoint("import") == 42
+
+
+def test_records_and_checkpoints_survive_reopening(store, tmp_path):
+    session_id = store.submit(record("张三")).result()
+    store.save_checkpoint("import", 7).result()
+    store.close()
+    reopened = ResultStore(tmp_path / "results.db")
+    try:
+        saved = reopened.latest_session("张三")
+        assert saved.session_id == session_id
+        assert [answer.position for answer in saved.answers] == [1, 2]
+        assert reopened.checkpoint("import") == 7
+        assert reopened.checkpoint("missing") is None
+    finally:
+        reopened.close()
+
+
+def test_closed_store_refuses_writes(store):
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.submit(record("张三"))
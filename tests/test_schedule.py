@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime
+
+from exam_app.question_bank import load_bank
+from exam_app.questions import Category
+from exam_app.results import AnswerRecord, ResultStore, SessionRecord
+from exam_app.schedule import FIRST_INTERVAL, RELEARN_DELAY, ReviewSchedule
+
+DAY = 24 * 3600.0
+
+
+def test_most_overdue_questions_come_first():
+    schedule = ReviewSchedule("张三")
+    schedule.record("basic-1", Category.COMPUTER_BASICS.value, True, when=0.0)
+    schedule.record("basic-2", Category.COMPUTER_BASICS.value, False, when=100.0)
+    schedule.record("basic-3", Category.COMPUTER_BASICS.value, False, when=0.0)
+    assert schedule.due(Category.COMPUTER_BASICS, 10, now=RELEARN_DELAY + 100.0) == ["basic-3", "basic-2"]
+    assert schedule.due(Category.COMPUTER_BASICS, 10, now=FIRST_INTERVAL) == ["basic-3", "basic-2", "basic-1"]
+    assert schedule.due(Category.COMPUTER_BASICS, 1, now=FIRST_INTERVAL) == ["basic-3"]
+    assert schedule.due(Category.WORD, 10, now=FIRST_INTERVAL) == []
+
+
+def test_rescheduling_replaces_the_earlier_due_time():
+    schedule = ReviewSchedule("张三")
+    schedule.record("basic-1", Category.COMPUTER_BASICS.value, False, when=0.0)
+    schedule.record("basic-1", Category.COMPUTER_BASICS.value, True, when=RELEARN_DELAY)
+    assert schedule.due(Category.COMPUTER_BASICS, 10, now=RELEARN_DELAY * 2) == []
+    assert schedule.due(Category.COMPUTER_BASICS, 10, now=RELEARN_DELAY + DAY) == ["basic-1"]
+
+
+def test_correct_answers_push_a_question_further_out():
+    schedule = ReviewSchedule("张三")
+    intervals = [schedule.record("basic-1", Category.COMPUTER_BASICS.value, True, when=0.0).interval for _ in range(4)]
+    assert intervals == sorted(intervals) and len(set(intervals)) == 4
+    state = schedule.record("basic-1", Category.COMPUTER_BASICS.value, False, when=0.0)
+    assert (state.interval, state.streak, state.lapses) == (RELEARN_DELAY, 0, 1)
+
+
+def test_many_reschedules_keep_one_live_entry_per_question():
+    schedule = ReviewSchedule("张三")
+    for step in range(1000):
+        schedule.record(f"basic-{step % 3 + 1}", Category.COMPUTER_BASICS.value, step % 2 == 0, when=float(step))
+    assert sorted(schedule.due(Category.COMPUTER_BASICS, 10, now=float("inf"))) == ["basic-1", "basic-2", "basic-3"]
+
+
+def test_select_puts_due_reviews_before_unseen_questions():
+    bank = load_bank()
+    schedule = ReviewSchedule("张三")
+    schedule.record("word-3", Category.WORD.value, False, when=0.0)
+    schedule.record("word-5", Category.WORD.value, True, when=0.0)
+    chosen, due_count = schedule.select(bank, Category.WORD, 4, random.Random(0), now=RELEARN_DELAY)
+    assert due_count == 1
+    assert chosen[0] == "word-3"
+    assert len(set(chosen)) == 4 and "word-5" not in chosen
+    # Once every question was seen, the ones coming up soonest fill the round.
+    everything, _ = schedule.select(bank, Category.WORD, 8, random.Random(0), now=RELEARN_DELAY)
+    assert everything[0] == "word-3" and everything[-1] == "word-5"
+
+
+def test_schedule_is_replayed_from_the_result_database(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    try:
+        finished = datetime(2024, 5, 1, 9, 0)
+        answers = [
+            AnswerRecord(1, "basic-1", Category.COMPUTER_BASICS.value, 2, 2, True),
+            AnswerRecord(2, "basic-2", Category.COMPUTER_BASICS.value, 0, 1, False),
+        ]
+        store.submit(SessionRecord("张三", "综合考试", 2, 2, 1, finished, finished, answers)).result()
+        schedule = ReviewSchedule.load(store, "张三")
+    finally:
+        store.close()
+    now = finished.timestamp() + RELEARN_DELAY
+    assert schedule.due(Category.COMPUTER_BASICS, 10, now=now) == ["basic-2"]
+    assert len(schedule) == 2